@@ -0,0 +1,314 @@
+# benchmarks/bench_engines.py
+
+"""
+Recommendation Engine Micro-Benchmarks
+Per-call latency, throughput and memory of recommend_crop, get_crop_details,
+nutrition_plan, get_food_details and get_regional_nutrition_advisory across
+dataset sizes, plus golden-output checks.
+
+Each dataset size runs in a fresh interpreter (the engines load their data
+at import), pointed at scaled files from benchmarks/synthetic_data.py.
+
+Usage:
+    python -m benchmarks.bench_engines                        # base data only
+    python -m benchmarks.bench_engines --scales 8000,100000,1000000,10000000
+    python -m benchmarks.bench_engines --compare benchmarks/results/engines-<old>.json
+    python -m benchmarks.bench_engines --check-golden         # outputs must match golden file
+    python -m benchmarks.bench_engines --update-golden        # after an intended output change
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+
+GOLDEN_PATH = "benchmarks/golden/engine_outputs.json"
+RESULTS_DIR = "benchmarks/results"
+DATA_DIR = "benchmarks/.data"
+BASE_FARMER_ROWS = 8000
+BASE_CONSUMER_ROWS = 645
+
+# Only soil types present in the data: recommend_crop has no fallback for unknown soils
+SOIL_TYPES = ["Sandy", "Loamy", "Black", "Red", "Clayey", "loamy", "black"]
+CROPS = ["Maize", "Sugarcane", "Cotton", "Tobacco", "Paddy", "Barley", "Wheat", "Millets",
+         "Oil seeds", "Pulses", "Ground Nuts", "rice"]
+CONDITIONS = ["diabetes", "anemia", "hypertension", "general", "none"]
+DIETS = ["vegetarian", "non-vegetarian"]
+REGIONS = ["bihar", "Uttar Pradesh", "punjab", "kerala", "odisha", "atlantis"]
+FOODS = ["Scrambled Eggs (2 large)", "Whole Wheat Toast (1 slice)", "Club Sandwich",
+         "Baked Potato (medium)", "Lentil Soup (1 can)", "Greek Yogurt (plain 1 cup)", "Unknown Food"]
+
+
+def make_queries(count: int, seed: int) -> dict:
+    """Deterministic, realistic inputs for every engine."""
+    rng = random.Random(seed)
+
+    def climate():
+        return {
+            "temperature": round(rng.uniform(20, 40), 1),
+            "humidity": round(rng.uniform(40, 80), 1),
+            "moisture": round(rng.uniform(20, 70), 1),
+            "soil_type": rng.choice(SOIL_TYPES),
+            "nitrogen": float(rng.randint(0, 46)),
+            "phosphorous": float(rng.randint(0, 46)),
+            "potassium": float(rng.randint(0, 23)),
+        }
+
+    def profile():
+        return {
+            "age": rng.randint(8, 75),
+            "bmi": round(rng.uniform(16, 36), 1),
+            "condition": rng.choice(CONDITIONS),
+            "diet": rng.choice(DIETS),
+        }
+
+    return {
+        "recommend_crop": [{**climate(), "limit": rng.choice([3, 3, 5])} for _ in range(count)],
+        "get_crop_details": [{**climate(), "crop_name": rng.choice(CROPS)} for _ in range(count)],
+        "nutrition_plan": [{**profile(), "limit": rng.choice([4, 4, 8])} for _ in range(count)],
+        "get_food_details": [{**profile(), "food_name": rng.choice(FOODS)} for _ in range(count)],
+        "get_regional_nutrition_advisory": [rng.choice(REGIONS) for _ in range(count)],
+    }
+
+
+def engine_functions() -> dict:
+    from logic.crop_logic import recommend_crop, get_crop_details
+    from logic.nutrition_logic import nutrition_plan, get_food_details
+    from logic.nutrition_advisory import get_regional_nutrition_advisory
+
+    return {
+        "recommend_crop": recommend_crop,
+        "get_crop_details": get_crop_details,
+        "nutrition_plan": nutrition_plan,
+        "get_food_details": get_food_details,
+        "get_regional_nutrition_advisory": get_regional_nutrition_advisory,
+    }
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def max_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(usage / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def to_json_value(value):
+    """Round-trip through JSON so outputs compare the way clients see them."""
+    return json.loads(json.dumps(value, default=float))
+
+
+def run_worker(args) -> dict:
+    """Benchmark the engines in this process (data paths come from the environment)."""
+    started = time.perf_counter()
+    functions = engine_functions()
+    load_seconds = time.perf_counter() - started
+    rss_after_load = max_rss_mb()
+
+    queries = make_queries(args.queries, args.seed)
+    engines = {}
+
+    for name, func in functions.items():
+        inputs = queries[name]
+
+        for item in inputs[:args.warmup]:
+            func(item)
+
+        latencies = []
+        run_started = time.perf_counter()
+        for item in inputs:
+            call_started = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - call_started)
+        total = time.perf_counter() - run_started
+
+        # Allocation peak of a single call, measured separately so
+        # tracemalloc overhead does not distort the latencies above
+        tracemalloc.start()
+        func(inputs[0])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        latencies.sort()
+        engines[name] = {
+            "calls": len(latencies),
+            "mean_ms": round(total / len(latencies) * 1000, 4),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+            "throughput_per_s": round(len(latencies) / total, 1),
+            "peak_alloc_kb_per_call": round(peak / 1024, 1),
+        }
+
+    result = {
+        "load_seconds": round(load_seconds, 3),
+        "max_rss_mb_after_load": rss_after_load,
+        "max_rss_mb": max_rss_mb(),
+        "engines": engines,
+    }
+
+    if args.golden_outputs:
+        golden_queries = make_queries(args.golden_queries, 0)
+        result["outputs"] = {
+            name: [to_json_value(func(item)) for item in golden_queries[name]]
+            for name, func in functions.items()
+        }
+
+    return result
+
+
+def run_scale(args, farmer_rows: int, consumer_rows: int, golden: bool) -> dict:
+    """Benchmark one dataset size in a fresh interpreter."""
+    env = dict(os.environ)
+
+    if farmer_rows != BASE_FARMER_ROWS or consumer_rows != BASE_CONSUMER_ROWS:
+        from benchmarks.synthetic_data import scaled_paths
+        farmer_path, consumer_path = scaled_paths(DATA_DIR, farmer_rows, consumer_rows)
+        env["FARMER_DATA_PATH"] = farmer_path
+        env["CONSUMER_DATA_PATH"] = consumer_path
+
+    command = [
+        sys.executable, "-m", "benchmarks.bench_engines", "--worker",
+        "--queries", str(args.queries), "--warmup", str(args.warmup), "--seed", str(args.seed),
+        "--golden-queries", str(args.golden_queries)
+    ]
+    if golden:
+        command.append("--golden-outputs")
+
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark worker failed:\n{completed.stderr}")
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["farmer_rows"] = farmer_rows
+    result["consumer_rows"] = consumer_rows
+    return result
+
+
+def check_golden(outputs: dict) -> list:
+    """Return a list of (engine, query index) whose output differs from the golden file."""
+    with open(GOLDEN_PATH) as f:
+        golden = json.load(f)
+
+    mismatches = []
+    for name, expected in golden["outputs"].items():
+        actual = outputs.get(name, [])
+        for i, expected_output in enumerate(expected):
+            if i >= len(actual) or actual[i] != expected_output:
+                mismatches.append((name, i))
+    return mismatches
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def print_comparison(previous: dict, current: dict) -> None:
+    previous_runs = {(r["farmer_rows"], r["consumer_rows"]): r for r in previous["runs"]}
+
+    print(f"\nComparison with {previous.get('revision', '?')} ({previous.get('timestamp', '?')}):")
+    for run in current["runs"]:
+        before = previous_runs.get((run["farmer_rows"], run["consumer_rows"]))
+        if before is None:
+            continue
+        print(f"  {run['farmer_rows']:>10} farmer rows / {run['consumer_rows']} consumer rows")
+        for name, stats in run["engines"].items():
+            old = before["engines"].get(name)
+            if not old:
+                continue
+            change = (stats["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100 if old["p50_ms"] else 0.0
+            print(f"    {name:<34} p50 {old['p50_ms']:>9.3f} -> {stats['p50_ms']:>9.3f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NutriGrow recommendation engines")
+    parser.add_argument("--scales", default=str(BASE_FARMER_ROWS),
+                        help="Comma-separated farmer row counts (consumer data scales proportionally)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed calls per engine")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/engines-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--check-golden", action="store_true", help="Fail if base-data outputs differ from the golden file")
+    parser.add_argument("--update-golden", action="store_true", help="Rewrite the golden file from the current code")
+    parser.add_argument("--golden-queries", type=int, default=25)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--golden-outputs", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args)))
+        return
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    golden_needed = args.check_golden or args.update_golden
+    if golden_needed and BASE_FARMER_ROWS not in scales:
+        scales.insert(0, BASE_FARMER_ROWS)
+
+    runs = []
+    golden_outputs = None
+    for farmer_rows in scales:
+        consumer_rows = max(BASE_CONSUMER_ROWS, round(farmer_rows * BASE_CONSUMER_ROWS / BASE_FARMER_ROWS))
+        is_base = farmer_rows == BASE_FARMER_ROWS
+        print(f"Benchmarking {farmer_rows} farmer rows / {consumer_rows} consumer rows...", file=sys.stderr)
+        run = run_scale(args, farmer_rows, consumer_rows, golden=golden_needed and is_base)
+        if "outputs" in run:
+            golden_outputs = run.pop("outputs")
+        runs.append(run)
+
+        for name, stats in run["engines"].items():
+            print(f"  {name:<34} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  "
+                  f"{stats['throughput_per_s']:>10.1f}/s  {stats['peak_alloc_kb_per_call']:>9.1f} KB/call",
+                  file=sys.stderr)
+        print(f"  load {run['load_seconds']}s, max RSS {run['max_rss_mb']} MB", file=sys.stderr)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "queries": args.queries,
+        "runs": runs,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"engines-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+    if args.update_golden:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w") as f:
+            json.dump({"queries": args.golden_queries, "outputs": golden_outputs}, f, indent=1, ensure_ascii=False)
+        print(f"Golden outputs written to {GOLDEN_PATH}", file=sys.stderr)
+    elif args.check_golden:
+        mismatches = check_golden(golden_outputs)
+        if mismatches:
+            print(f"Golden check FAILED for {len(mismatches)} outputs: {mismatches[:10]}", file=sys.stderr)
+            sys.exit(1)
+        print("Golden check passed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# benchmarks/bench_serialization.py
+
+"""
+Response Serialization Benchmark
+Per-route cost of turning engine results into JSON bytes, for the
+encoding strategies the API has used or considered:
+
+- before:     FastAPI's jsonable_encoder, then Starlette's JSONResponse
+              (what routes returning a dict go through)
+- stdlib:     logic.serialization.dumps with the standard library
+- orjson:     logic.serialization.dumps with orjson (the default)
+- fragments:  orjson with the constant parts (notes, benefit and
+              recommendation lists) pre-encoded and spliced in
+- pydantic:   validating against the response model and dump_json, what
+              FastAPI does for routes that return a dict and declare one
+
+Every strategy except pydantic must produce the bytes of `before`.
+
+Usage:
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --queries 500 --output /tmp/serialization.json
+"""
+
+import os
+import sys
+import json
+import time
+import secrets
+import argparse
+
+from benchmarks.bench_engines import make_queries, engine_functions
+
+BATCH_ITEMS = 100
+
+# Constant values in each engine's result, by key path
+CONSTANT_PATHS = {
+    "recommend_crop": [("note",), ("diversity_score", "benefits")],
+    "get_crop_details": [("recommendations",)],
+    "nutrition_plan": [("note",)],
+    "get_food_details": [("note",)],
+    "get_regional_nutrition_advisory": [("awareness_note",)],
+}
+
+
+def response_models() -> dict:
+    from logic import response_models as m
+
+    return {
+        "recommend_crop": m.CropRecommendation,
+        "get_crop_details": m.CropDetailsResponse,
+        "nutrition_plan": m.NutritionPlan,
+        "get_food_details": m.FoodDetailsResponse,
+        "get_regional_nutrition_advisory": m.RegionalAdvisory,
+    }
+
+
+def make_splicer(paths, dumps):
+    """
+    Encoder that swaps the values at `paths` for pre-encoded bytes. orjson
+    3.9+ takes them as orjson.Fragment; older versions get a placeholder
+    string that is replaced in the output.
+    """
+    import orjson
+
+    native = getattr(orjson, "Fragment", None)
+    encoded = {}
+    token = "\x00fragment-" + secrets.token_hex(8) + "-"
+
+    def fragment(value):
+        key = value if isinstance(value, str) else tuple(value)
+        cached = encoded.get(key)
+        if cached is None:
+            contents = dumps(value)
+            placeholder = token + str(len(encoded))
+            cached = encoded[key] = (native(contents) if native else placeholder, dumps(placeholder), contents)
+        return cached
+
+    def encode(content):
+        if not isinstance(content, dict) or "error" in content:
+            return dumps(content)
+        content = dict(content)
+        replacements = []
+        for path in paths:
+            parent = content
+            for key in path[:-1]:
+                parent[key] = dict(parent[key])
+                parent = parent[key]
+            value, placeholder, contents = fragment(parent[path[-1]])
+            parent[path[-1]] = value
+            replacements.append((placeholder, contents))
+        out = dumps(content)
+        if not native:
+            for placeholder, contents in replacements:
+                out = out.replace(placeholder, contents)
+        return out
+
+    return encode
+
+
+def strategies(name: str) -> dict:
+    import logic.serialization as serialization
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+    from pydantic import TypeAdapter
+
+    def encoder(fast_json):
+        def encode(content):
+            saved, serialization.FAST_JSON = serialization.FAST_JSON, fast_json
+            try:
+                return serialization.dumps(content)
+            finally:
+                serialization.FAST_JSON = saved
+        return encode
+
+    adapter = TypeAdapter(response_models()[name])
+    found = {
+        "before": lambda content: JSONResponse(jsonable_encoder(content)).body,
+        "stdlib": encoder(False),
+    }
+    if serialization.orjson is not None:
+        found["orjson"] = encoder(True)
+        found["fragments"] = make_splicer(CONSTANT_PATHS[name], encoder(True))
+    found["pydantic"] = lambda content: adapter.dump_json(adapter.validate_python(content))
+    return found
+
+
+def time_per_call(func, contents, repeat: int) -> float:
+    """Best of `repeat` passes over all contents, in microseconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for content in contents:
+            func(content)
+        best = min(best, time.perf_counter() - started)
+    return best / len(contents) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding of the engine routes' responses")
+    parser.add_argument("--queries", type=int, default=200, help="Engine results encoded per route")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    functions = engine_functions()
+    queries = make_queries(args.queries, args.seed)
+
+    results = {}
+    for name, func in functions.items():
+        contents = [func(item) for item in queries[name]]
+        routes = {name: contents}
+        if name != "get_regional_nutrition_advisory":
+            # Batch responses wrap many results in {"results": [...]}
+            routes[f"{name}/batch"] = [{"results": (contents * BATCH_ITEMS)[:BATCH_ITEMS]}]
+
+        for route, route_contents in routes.items():
+            encoders = strategies(name)
+            if route.endswith("/batch"):
+                encoders.pop("fragments", None)
+                encoders.pop("pydantic")
+            reference = [encoders["before"](content) for content in route_contents]
+            row = {}
+            for strategy, encode in encoders.items():
+                identical = strategy == "pydantic" or all(
+                    encode(content) == expected for content, expected in zip(route_contents, reference))
+                row[strategy] = {
+                    "us_per_call": round(time_per_call(encode, route_contents, args.repeat), 2),
+                    "identical": identical,
+                }
+            results[route] = row
+
+    strategy_names = ["before", "stdlib", "orjson", "fragments", "pydantic"]
+    print(f"{'route':<40}" + "".join(f"{s:>12}" for s in strategy_names) + "   (us per response)")
+    for route, row in results.items():
+        cells = []
+        for strategy in strategy_names:
+            if strategy not in row:
+                cells.append(f"{'-':>12}")
+            else:
+                mark = "" if row[strategy]["identical"] else "!"
+                cells.append(f"{row[strategy]['us_per_call']:>11.1f}{mark or ' '}")
+        print(f"{route:<40}" + "".join(cells))
+    if any(not cell["identical"] for row in results.values() for cell in row.values()):
+        print("! output differs from `before`", file=sys.stderr)
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/check_sessions.py
+
+"""
+Session Follow-up Check
+Runs short /ask-ai conversations against the stub LLM backend and checks
+how handle_session_question resolves follow-ups: a follow-up that names
+nothing new reuses the session's subject or condition (and its cached
+output), one that names a new subject or condition is answered for it.
+
+Usage:
+    LLM_BACKEND=stub python -m benchmarks.check_sessions
+"""
+
+import os
+import sys
+
+os.environ.setdefault("LLM_BACKEND", "stub")
+
+from logic.ai_sessions import session_store
+from logic.ask_ai_logic import handle_session_question
+
+# (turns, checks on the last turn's response)
+CONVERSATIONS = [
+    (["Tell me about wheat", "what about maize?"],
+     {"cached": False, "subject": "Maize"}),
+    (["Tell me about wheat", "why is that?"],
+     {"subject": "Wheat"}),
+    (["What should I eat for anemia?", "what about diabetes?"],
+     {"cached": False, "condition": "diabetes"}),
+    (["What should I eat for anemia?", "what about that?"],
+     {"cached": True, "condition": "anemia"}),
+]
+
+
+def last_turn(questions):
+    session = session_store.create()
+    for question in questions:
+        response = handle_session_question(session, question)
+    response["subject"] = session.last_subject
+    response["condition"] = session.entities.get("condition")
+    return response
+
+
+def main():
+    failures = []
+    for questions, expected in CONVERSATIONS:
+        response = last_turn(questions)
+        for key, value in expected.items():
+            if response[key] != value:
+                failures.append(f"{' -> '.join(questions)}: {key} is {response[key]!r}, expected {value!r}")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+    print(f"Session check passed ({len(CONVERSATIONS)} conversations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+# benchmarks/load_test.py
+
+"""
+End-to-End HTTP Load Test
+Boots the API under uvicorn with the stub LLM backend and replays a weighted
+mix of the six public routes at several concurrency levels and worker counts.
+
+Clients are closed-loop: each connection sends its next request as soon as
+the previous response arrives, over a keep-alive HTTP/1.1 connection. Load
+is generated by separate client processes so the generator itself is not
+the bottleneck on multi-core hosts.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --workers 1,4 --concurrency 8,32,128 --duration 30
+    python -m benchmarks.load_test --mix recommend-crop=5,ask-ai=1 --llm-latency lognormal:400:0.5
+    python -m benchmarks.load_test --compare benchmarks/results/load-<old>.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from collections import defaultdict
+
+from benchmarks.bench_engines import RESULTS_DIR, make_queries, percentile, git_revision
+
+# Default share of traffic per route, roughly what the web client sends
+DEFAULT_MIX = {
+    "recommend-crop": 30,
+    "crop-details": 15,
+    "nutrition-plan": 25,
+    "food-details": 15,
+    "region-nutrition-advisory": 10,
+    "ask-ai": 5,
+}
+
+QUESTIONS = [
+    "What crops should I grow in this weather?",
+    "What foods are good for anemia?",
+    "Suggest a diet for diabetes",
+    "Why is wheat good for my region?",
+    "Which crop is best for my loamy soil?",
+    "What should I eat to gain weight?",
+    "Tell me about the nutrition problems in my region",
+    "Explain the recommendation",
+]
+
+PAYLOAD_POOL_SIZE = 500
+
+
+def build_payloads(seed: int) -> dict:
+    """Pre-encoded request bodies per route, so clients only pick and send."""
+    queries = make_queries(PAYLOAD_POOL_SIZE, seed)
+    rng = random.Random(seed)
+
+    ask_ai = []
+    for crop_input, profile in zip(queries["recommend_crop"], queries["nutrition_plan"]):
+        context = {
+            "climate": {"temperature": crop_input["temperature"], "humidity": crop_input["humidity"]},
+            "soil_type": crop_input["soil_type"],
+            "age": profile["age"],
+            "bmi": profile["bmi"],
+            "diet": profile["diet"],
+            "region": rng.choice(["bihar", "punjab", "kerala", "odisha"]),
+        }
+        ask_ai.append({"question": rng.choice(QUESTIONS), "context": context})
+
+    bodies = {
+        "recommend-crop": queries["recommend_crop"],
+        "crop-details": queries["get_crop_details"],
+        "nutrition-plan": queries["nutrition_plan"],
+        "food-details": queries["get_food_details"],
+        "region-nutrition-advisory": [{"region": r} for r in queries["get_regional_nutrition_advisory"]],
+        "ask-ai": ask_ai,
+    }
+    return {route: [json.dumps(body).encode() for body in items] for route, items in bodies.items()}
+
+
+def parse_mix(text: str) -> dict:
+    if not text:
+        return dict(DEFAULT_MIX)
+
+    mix = {}
+    for part in text.split(","):
+        route, _, weight = part.partition("=")
+        route = route.strip().lstrip("/")
+        if route not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown route '{route}' in --mix (choose from {', '.join(DEFAULT_MIX)})")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, workers: int, args) -> subprocess.Popen:
+    """Boot uvicorn with the stub LLM and wait until it answers."""
+    env = dict(os.environ)
+    env.update({
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": args.llm_latency,
+        "ENVIRONMENT": env.get("ENVIRONMENT", "development"),
+        "ASK_AI_JOBS_DB": os.path.join(args.data_dir, f"load_jobs_{port}.sqlite3"),
+    })
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    server = subprocess.Popen(command, env=env)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1) as s:
+                s.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                if s.recv(64).startswith(b"HTTP/1.1 200"):
+                    return server
+        except OSError:
+            pass
+        time.sleep(0.2)
+
+    server.terminate()
+    raise RuntimeError("Server did not become ready within 60s")
+
+
+def stop_server(server: subprocess.Popen) -> None:
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+async def send_request(reader, writer, path: str, body: bytes):
+    """Send one POST over a keep-alive connection; return the status code."""
+    writer.write(
+        f"POST /{path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by server")
+    status = int(status_line.split()[1])
+
+    length = 0
+    close = False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            close = True
+
+    await reader.readexactly(length)
+    return status, close
+
+
+async def client_loop(port, payloads, routes, weights, rng, warmup_until, stop_at, samples, statuses):
+    reader = writer = None
+    while time.monotonic() < stop_at:
+        route = rng.choices(routes, weights)[0]
+        body = rng.choice(payloads[route])
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            status, close = await send_request(reader, writer, route, body)
+        except (OSError, ConnectionError, ValueError, IndexError, asyncio.IncompleteReadError):
+            status, close = "connection_error", True
+        elapsed = time.monotonic() - started
+
+        if started >= warmup_until:
+            samples[route].append(elapsed)
+            statuses[route][str(status)] += 1
+
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+def run_client_process(port, connections, mix, seed, warmup, duration, queue):
+    """Entry point of one load-generating process."""
+    payloads = build_payloads(seed)
+    routes = list(mix)
+    weights = [mix[r] for r in routes]
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+
+    async def main():
+        now = time.monotonic()
+        await asyncio.gather(*[
+            client_loop(port, payloads, routes, weights, random.Random(seed * 1000 + i),
+                        now + warmup, now + warmup + duration, samples, statuses)
+            for i in range(connections)
+        ])
+
+    asyncio.run(main())
+    queue.put((dict(samples), {route: dict(codes) for route, codes in statuses.items()}))
+
+
+def summarize(samples: dict, statuses: dict, duration: float) -> dict:
+    routes = {}
+    total_requests = total_errors = 0
+
+    for route in sorted(set(samples) | set(statuses)):
+        latencies = sorted(samples.get(route, []))
+        codes = statuses.get(route, {})
+        requests = sum(codes.values())
+        errors = sum(count for code, count in codes.items() if not code.startswith("2"))
+        total_requests += requests
+        total_errors += errors
+        routes[route] = {
+            "requests": requests,
+            "throughput_per_s": round(requests / duration, 1),
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "status_counts": dict(sorted(codes.items())),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        }
+
+    all_latencies = sorted(x for values in samples.values() for x in values)
+    return {
+        "requests": total_requests,
+        "throughput_per_s": round(total_requests / duration, 1),
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 2) if all_latencies else None,
+        "p95_ms": round(percentile(all_latencies, 0.95) * 1000, 2) if all_latencies else None,
+        "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 2) if all_latencies else None,
+        "routes": routes,
+    }
+
+
+def run_level(port: int, concurrency: int, mix: dict, args) -> dict:
+    """Drive the server with `concurrency` connections spread over client processes."""
+    processes = max(1, min(args.client_processes, concurrency))
+    queue = multiprocessing.Queue()
+    clients = []
+    for i in range(processes):
+        connections = concurrency // processes + (1 if i < concurrency % processes else 0)
+        process = multiprocessing.Process(
+            target=run_client_process,
+            args=(port, connections, mix, args.seed + i, args.warmup, args.duration, queue)
+        )
+        process.start()
+        clients.append(process)
+
+    samples = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    for _ in clients:
+        client_samples, client_statuses = queue.get()
+        for route, values in client_samples.items():
+            samples[route].extend(values)
+        for route, codes in client_statuses.items():
+            for code, count in codes.items():
+                statuses[route][code] += count
+    for process in clients:
+        process.join()
+
+    return summarize(samples, statuses, args.duration)
+
+
+def print_comparison(previous: dict, current: dict) -> None:
+    previous_runs = {(r["workers"], r["concurrency"]): r for r in previous["runs"]}
+
+    print(f"\nComparison with {previous.get('revision', '?')} ({previous.get('timestamp', '?')}):")
+    for run in current["runs"]:
+        before = previous_runs.get((run["workers"], run["concurrency"]))
+        if before is None:
+            continue
+        change = ((run["throughput_per_s"] - before["throughput_per_s"]) / before["throughput_per_s"] * 100
+                  if before["throughput_per_s"] else 0.0)
+        print(f"  workers={run['workers']} concurrency={run['concurrency']}: "
+              f"{before['throughput_per_s']:.1f} -> {run['throughput_per_s']:.1f} req/s ({change:+.1f}%), "
+              f"p99 {before['p99_ms']} -> {run['p99_ms']} ms, "
+              f"errors {before['error_rate']:.2%} -> {run['error_rate']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test for the NutriGrow API")
+    parser.add_argument("--workers", default="1", help="Comma-separated uvicorn worker counts")
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated open connections")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per level")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each level")
+    parser.add_argument("--mix", help="route=weight list, e.g. recommend-crop=3,ask-ai=1 (default: typical mix)")
+    parser.add_argument("--llm-latency", default="lognormal:400:0.5", help="LLM_STUB_LATENCY for the server")
+    parser.add_argument("--client-processes", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--data-dir", default="benchmarks/.data")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<timestamp>.json)")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    worker_counts = [int(w) for w in args.workers.split(",") if w.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    runs = []
+    for workers in worker_counts:
+        port = free_port()
+        print(f"Starting server with {workers} worker(s) on port {port}...", file=sys.stderr)
+        server = start_server(port, workers, args)
+        try:
+            for concurrency in levels:
+                result = run_level(port, concurrency, mix, args)
+                runs.append({"workers": workers, "concurrency": concurrency, **result})
+                print(f"  concurrency {concurrency:>4}: {result['throughput_per_s']:>8.1f} req/s  "
+                      f"p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                      f"errors {result['error_rate']:.2%}", file=sys.stderr)
+        finally:
+            stop_server(server)
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "llm_latency": args.llm_latency,
+        "mix": mix,
+        "runs": runs,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/synthetic_data.py
+
+"""
+Synthetic Dataset Generator
+Scales farmer_data.csv and consumer_data.csv to any row count.
+
+Rows are bootstrapped from the real datasets, so the joint distribution of
+soil, crop, fertilizer, climate and NPK (and the nutrient profiles of food
+categories) is preserved. Continuous columns get a small jitter clipped to
+the observed range and rounded to the original precision, so the synthetic
+rows are not exact duplicates. Synthetic foods get a numbered variant
+suffix so food names stay unique.
+
+Usage:
+    python -m benchmarks.synthetic_data --farmer-rows 1000000 --consumer-rows 100000 --out benchmarks/.data
+"""
+
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+
+FARMER_SOURCE = "data/farmer_data.csv"
+CONSUMER_SOURCE = "data/consumer_data.csv"
+CHUNK_ROWS = 1_000_000
+
+# column -> (jitter standard deviation, decimals)
+FARMER_JITTER = {
+    "Temperature": (0.5, 2),
+    "Humidity": (1.0, 2),
+    "Moisture": (1.0, 2),
+    "Nitrogen": (1.0, 0),
+    "Potassium": (0.5, 0),
+    "Phosphorous": (1.0, 0),
+}
+
+# Relative jitter applied to nutrient columns of synthetic foods
+CONSUMER_RELATIVE_JITTER = 0.05
+CONSUMER_NUMERIC = [
+    "Calories (kcal)", "Protein (g)", "Carbohydrates (g)", "Fat (g)", "Fiber (g)",
+    "Sugars (g)", "Sodium (mg)", "Cholesterol (mg)", "Water_Intake (ml)"
+]
+
+
+def load_farmer_source() -> pd.DataFrame:
+    source = pd.read_csv(FARMER_SOURCE)
+    source.columns = source.columns.str.strip()
+    return source
+
+
+def load_consumer_source() -> pd.DataFrame:
+    source = pd.read_csv(CONSUMER_SOURCE, engine="python", on_bad_lines="skip")
+    source.columns = source.columns.str.strip()
+    return source
+
+
+def synthesize_farmer(source: pd.DataFrame, rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Bootstrap `rows` farmer observations from the source dataset."""
+    sample = source.iloc[rng.integers(0, len(source), rows)].reset_index(drop=True)
+
+    for column, (sigma, decimals) in FARMER_JITTER.items():
+        low, high = source[column].min(), source[column].max()
+        values = sample[column].to_numpy(dtype=float) + rng.normal(0, sigma, rows)
+        values = np.clip(np.round(values, decimals), low, high)
+        sample[column] = values.astype(source[column].dtype) if decimals == 0 else values
+
+    return sample[source.columns]
+
+
+def synthesize_consumer(source: pd.DataFrame, rows: int, rng: np.random.Generator, start: int) -> pd.DataFrame:
+    """
+    Bootstrap `rows` foods from the source dataset.
+
+    Args:
+        start: index of the first synthetic row, used for unique variant names
+    """
+    sample = source.iloc[rng.integers(0, len(source), rows)].reset_index(drop=True)
+
+    for column in CONSUMER_NUMERIC:
+        if column not in sample:
+            continue
+        factor = 1 + rng.normal(0, CONSUMER_RELATIVE_JITTER, rows)
+        values = np.clip(sample[column].to_numpy(dtype=float) * factor, 0, None)
+        decimals = 0 if pd.api.types.is_integer_dtype(source[column]) else 1
+        values = np.round(values, decimals)
+        sample[column] = values.astype(source[column].dtype) if decimals == 0 else values
+
+    variant = pd.Series(np.arange(start, start + rows)).astype(str)
+    sample["Food_Item"] = sample["Food_Item"].str.cat(variant, sep=" #")
+    return sample[source.columns]
+
+
+def write_scaled(source: pd.DataFrame, rows: int, path: str, synthesize) -> str:
+    """
+    Write the source rows followed by synthetic rows up to `rows` in total.
+    Generation is chunked so 10M+ row files fit in memory.
+
+    Args:
+        synthesize: function(chunk_rows, start_row) -> DataFrame
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    keep = source.iloc[:min(rows, len(source))]
+    keep.to_csv(path, index=False)
+
+    written = len(keep)
+    while written < rows:
+        chunk = min(CHUNK_ROWS, rows - written)
+        synthesize(chunk, written).to_csv(path, mode="a", header=False, index=False)
+        written += chunk
+
+    return path
+
+
+def scaled_paths(out_dir: str, farmer_rows: int, consumer_rows: int, seed: int = 42, force: bool = False):
+    """
+    Return (farmer_path, consumer_path) for the requested sizes, generating
+    the files if they do not exist yet. The real datasets are always the
+    first rows of the scaled files.
+    """
+    farmer_path = os.path.join(out_dir, f"farmer_{farmer_rows}_s{seed}.csv")
+    consumer_path = os.path.join(out_dir, f"consumer_{consumer_rows}_s{seed}.csv")
+
+    if force or not os.path.exists(farmer_path):
+        farmer = load_farmer_source()
+        rng = np.random.default_rng(seed)
+        write_scaled(farmer, farmer_rows, farmer_path, lambda n, start: synthesize_farmer(farmer, n, rng))
+
+    if force or not os.path.exists(consumer_path):
+        consumer = load_consumer_source()
+        rng = np.random.default_rng(seed + 1)
+        write_scaled(consumer, consumer_rows, consumer_path, lambda n, start: synthesize_consumer(consumer, n, rng, start))
+
+    return farmer_path, consumer_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaled synthetic NutriGrow datasets")
+    parser.add_argument("--farmer-rows", type=int, default=100_000)
+    parser.add_argument("--consumer-rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="benchmarks/.data")
+    parser.add_argument("--force", action="store_true", help="Regenerate files that already exist")
+    args = parser.parse_args()
+
+    farmer_path, consumer_path = scaled_paths(args.out, args.farmer_rows, args.consumer_rows, args.seed, args.force)
+    print(f"Farmer data:   {farmer_path}")
+    print(f"Consumer data: {consumer_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# logic/admission.py
+
+"""
+Admission Control
+Per-endpoint-class concurrency limits, bounded queues and load shedding.
+
+Every HTTP route is assigned to an endpoint class (e.g. "deterministic",
+"llm", "bulk"). Each class has its own pool of execution slots and its own
+queue, so a burst of slow LLM requests cannot take the threadpool away from
+the cheap deterministic endpoints. When a class's queue is full, or the
+expected wait exceeds its latency target, requests are rejected right away
+with 503 and a Retry-After header instead of piling up.
+
+WebSocket sessions bypass the HTTP middleware, so each session turn takes
+a slot of its class through admission_controller instead.
+"""
+
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from logic import metrics
+
+
+class EndpointClass:
+    """
+    Admission settings and live state for one class of endpoints.
+
+    Args:
+        name: class name used in metrics
+        priority: lower number = more important
+        concurrency: requests of this class executing at once
+        max_queue: requests allowed to wait for a slot
+        target_wait: seconds a request may wait before it is shed
+    """
+
+    def __init__(self, name: str, priority: int, concurrency: int, max_queue: int, target_wait: float):
+        self.name = name
+        self.priority = priority
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.target_wait = target_wait
+        self.active = 0
+        self.waiters = deque()
+        # Exponentially weighted service time in seconds
+        self.service_time = 0.05
+
+    @classmethod
+    def from_env(cls, name: str, priority: int, concurrency: int, max_queue: int, target_wait_ms: float):
+        """Build a class whose defaults can be overridden with ADMISSION_<NAME>_* variables."""
+        prefix = f"ADMISSION_{name.upper()}_"
+        return cls(
+            name,
+            priority,
+            int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+            int(os.getenv(prefix + "QUEUE", str(max_queue))),
+            float(os.getenv(prefix + "TARGET_MS", str(target_wait_ms))) / 1000
+        )
+
+    def expected_wait(self) -> float:
+        """Estimated seconds a newly queued request would wait for a slot."""
+        return (len(self.waiters) + 1) / self.concurrency * self.service_time
+
+    def stats(self) -> Dict[str, float]:
+        """Current slot and queue usage."""
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "concurrency": self.concurrency,
+            "max_queue": self.max_queue,
+            "expected_wait_ms": round(self.expected_wait() * 1000, 1)
+        }
+
+
+class AdmissionController:
+    """
+    Slot accounting across a set of endpoint classes, shared by the HTTP
+    middleware and by WebSocket turns (which the middleware does not see).
+
+    Args:
+        classes: endpoint classes by name
+    """
+
+    def __init__(self, classes: Dict[str, EndpointClass]):
+        self.classes = classes
+
+    @asynccontextmanager
+    async def admit(self, endpoint_class: EndpointClass):
+        """
+        Hold a slot of the class for the duration of the block.
+
+        Yields:
+            float: seconds spent queueing, or None if the work is shed and
+            must not run
+        """
+        wait = await self.acquire(endpoint_class)
+        if wait is None:
+            metrics.inc("admission_requests_total", endpoint_class=endpoint_class.name, outcome="rejected")
+            yield None
+            return
+
+        metrics.inc("admission_requests_total", endpoint_class=endpoint_class.name, outcome="admitted")
+        metrics.inc("admission_queue_wait_seconds_total", wait, endpoint_class=endpoint_class.name)
+        started = time.monotonic()
+        try:
+            yield wait
+        finally:
+            elapsed = time.monotonic() - started
+            endpoint_class.service_time = 0.9 * endpoint_class.service_time + 0.1 * elapsed
+            self.release(endpoint_class)
+
+    def higher_priority_queued(self, endpoint_class: EndpointClass) -> bool:
+        return any(
+            other.waiters for other in self.classes.values()
+            if other.priority < endpoint_class.priority
+        )
+
+    async def acquire(self, endpoint_class: EndpointClass) -> Optional[float]:
+        """
+        Wait for a slot.
+
+        Returns:
+            float: seconds spent queueing, or None if the request is shed
+        """
+        if endpoint_class.active < endpoint_class.concurrency and not endpoint_class.waiters:
+            endpoint_class.active += 1
+            return 0.0
+
+        # Shed fast: full queue, expected wait over target, or more important work waiting
+        if (len(endpoint_class.waiters) >= endpoint_class.max_queue
+                or endpoint_class.expected_wait() > endpoint_class.target_wait
+                or self.higher_priority_queued(endpoint_class)):
+            return None
+
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        endpoint_class.waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), endpoint_class.target_wait)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the timeout fired
+                return time.monotonic() - started
+            endpoint_class.waiters.remove(waiter)
+            waiter.cancel()
+            return None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(endpoint_class)
+            elif waiter in endpoint_class.waiters:
+                endpoint_class.waiters.remove(waiter)
+            raise
+
+        return time.monotonic() - started
+
+    def release(self, endpoint_class: EndpointClass) -> None:
+        """Hand the slot to the next waiter, or free it."""
+        while endpoint_class.waiters:
+            waiter = endpoint_class.waiters.popleft()
+            if not waiter.done():
+                # Slot ownership passes directly to the waiter; active stays the same
+                waiter.set_result(True)
+                return
+        endpoint_class.active -= 1
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying admission control to HTTP requests.
+
+    Args:
+        app: ASGI application
+        classes: endpoint classes by name
+        routes: path -> class name; a path ending in "/" also matches everything below it.
+                Unmatched paths are not limited.
+    """
+
+    def __init__(self, app, classes: Dict[str, EndpointClass], routes: Dict[str, str]):
+        self.app = app
+        self.classes = classes
+        self.controller = AdmissionController(classes)
+        self.exact_routes = {path: name for path, name in routes.items() if not path.endswith("/") or path == "/"}
+        self.prefix_routes = sorted(
+            ((path, name) for path, name in routes.items() if path.endswith("/") and path != "/"),
+            key=lambda item: -len(item[0])
+        )
+
+    def classify(self, path: str) -> Optional[EndpointClass]:
+        name = self.exact_routes.get(path)
+        if name is None:
+            name = next((n for prefix, n in self.prefix_routes if path.startswith(prefix)), None)
+        return self.classes.get(name) if name else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint_class = self.classify(scope["path"])
+        if endpoint_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        async with self.controller.admit(endpoint_class) as wait:
+            if wait is None:
+                retry_after = max(1, math.ceil(endpoint_class.expected_wait()))
+                response = JSONResponse(
+                    {"detail": f"Server busy ({endpoint_class.name} requests), please retry later"},
+                    status_code=503,
+                    headers={"Retry-After": str(retry_after)}
+                )
+                await response(scope, receive, send)
+                return
+
+            async def send_with_wait(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-queue-wait-ms", f"{wait * 1000:.1f}".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_with_wait)
+
+
+# Deterministic endpoints are the most important and must stay fast during
+# LLM incidents; bulk job submissions are shed first.
+ENDPOINT_CLASSES = {
+    "deterministic": EndpointClass.from_env("deterministic", 0, concurrency=16, max_queue=256, target_wait_ms=1000),
+    "batch": EndpointClass.from_env("batch", 1, concurrency=4, max_queue=32, target_wait_ms=10000),
+    "llm": EndpointClass.from_env("llm", 1, concurrency=16, max_queue=64, target_wait_ms=5000),
+    "bulk": EndpointClass.from_env("bulk", 2, concurrency=2, max_queue=8, target_wait_ms=2000),
+}
+
+
+def admission_stats() -> Dict[str, Dict[str, float]]:
+    """Live slot and queue usage per endpoint class."""
+    return {name: endpoint_class.stats() for name, endpoint_class in ENDPOINT_CLASSES.items()}
+
+
+# Admission for work outside HTTP requests, against the same slots and queues
+admission_controller = AdmissionController(ENDPOINT_CLASSES)
@@ -0,0 +1,347 @@
+# logic/ai_jobs.py
+
+"""
+Bulk AI Question Jobs
+Asynchronous processing of large batches of /ask-ai questions.
+
+Jobs and their per-question results are stored in a local SQLite file, so
+submitted work survives a restart. A pool of worker threads claims pending
+questions and answers them through the normal AI pipeline at "bulk" LLM
+priority, which keeps their share of the LLM backend bounded and lets
+interactive requests go first (see PriorityLimiter in logic/llm_backend.py).
+
+Several server processes may share the file. A worker claims an item with
+a lease (an owner id unique to the claim and an expiry time). The leases of
+the items being answered are renewed every JOB_LEASE_SECONDS / 3, but only
+for JOB_MAX_RUN_SECONDS after the claim, so an item whose worker thread is
+hung expires like one whose process stopped; expired items are claimed
+again by any worker, and the late result of the old claim is discarded.
+"""
+
+import os
+import json
+import time
+import logging
+import uuid
+import socket
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from logic import metrics
+from logic.llm_backend import llm_priority
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.getenv("ASK_AI_JOBS_DB", "data/ask_ai_jobs.sqlite3")
+JOB_WORKERS = int(os.getenv("ASK_AI_JOB_WORKERS", "4"))
+JOB_MAX_ITEMS = int(os.getenv("ASK_AI_JOB_MAX_ITEMS", "10000"))
+# Seconds a claimed question stays reserved for its worker without a renewal
+JOB_LEASE_SECONDS = float(os.getenv("ASK_AI_JOB_LEASE_SECONDS", "60"))
+# Seconds after its claim that a question's lease stops being renewed
+JOB_MAX_RUN_SECONDS = float(os.getenv("ASK_AI_JOB_MAX_RUN_SECONDS", "600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    question TEXT NOT NULL,
+    context TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_expires REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status);
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class JobQueue:
+    """
+    SQLite-backed job store with an in-process worker pool.
+
+    Args:
+        db_path: SQLite file holding jobs and results
+        workers: number of worker threads answering questions
+    """
+
+    def __init__(self, db_path: str, workers: int):
+        self.db_path = db_path
+        self.workers = workers
+        self.threads = []
+        self.stopping = threading.Event()
+        self.wakeup = threading.Condition()
+        self.initialized = False
+        self.init_lock = threading.Lock()
+        # Prefix of this queue's lease owner ids, unique across processes and restarts
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Claims being answered: owner id -> (job_id, idx, claimed at)
+        self.active: Dict[str, tuple] = {}
+        self.active_lock = threading.Lock()
+
+    def _init_db(self) -> None:
+        with self.init_lock:
+            if self.initialized:
+                return
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = _connect(self.db_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(SCHEMA)
+                columns = {row["name"] for row in conn.execute("PRAGMA table_info(job_items)")}
+                # Files created before leases were added
+                for column, kind in (("owner", "TEXT"), ("lease_expires", "REAL")):
+                    if column not in columns:
+                        conn.execute(f"ALTER TABLE job_items ADD COLUMN {column} {kind}")
+            finally:
+                conn.close()
+            self.initialized = True
+
+    def submit(self, items: List[Dict[str, Any]], metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Store a new job.
+
+        Args:
+            items: list of {"question": str, "context": dict}
+            metadata: optional free-form dict stored with the job
+
+        Returns:
+            dict: job summary (see get)
+        """
+        if not items:
+            raise ValueError("A job needs at least one question")
+        if len(items) > JOB_MAX_ITEMS:
+            raise ValueError(f"A job can contain at most {JOB_MAX_ITEMS} questions")
+
+        self._init_db()
+        job_id = uuid.uuid4().hex
+        conn = _connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (id, created_at, status, total, metadata) VALUES (?, ?, 'pending', ?, ?)",
+                (job_id, time.time(), len(items), json.dumps(metadata or {}))
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, question, context, status) VALUES (?, ?, ?, ?, 'pending')",
+                [(job_id, i, item["question"], json.dumps(item.get("context") or {})) for i, item in enumerate(items)]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        metrics.inc("ask_ai_jobs_submitted_total")
+        metrics.inc("ask_ai_job_items_submitted_total", len(items))
+        with self.wakeup:
+            self.wakeup.notify_all()
+
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job status and progress, or None if the job does not exist."""
+        self._init_db()
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+
+        done = row["completed"] + row["failed"]
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "total": row["total"],
+            "completed": row["completed"],
+            "failed": row["failed"],
+            "progress": round(done / row["total"] * 100, 1),
+            "created_at": row["created_at"],
+            "finished_at": row["finished_at"],
+            "metadata": json.loads(row["metadata"] or "{}")
+        }
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """Per-question results of a job, in submission order."""
+        self._init_db()
+        conn = _connect(self.db_path)
+        try:
+            rows = conn.execute(
+                "SELECT idx, question, status, result, error FROM job_items "
+                "WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?",
+                (job_id, limit, offset)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {
+                "index": row["idx"],
+                "question": row["question"],
+                "status": row["status"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+                "error": row["error"]
+            }
+            for row in rows
+        ]
+
+    def start(self) -> None:
+        """
+        Start the worker threads and the lease heartbeat. Work interrupted
+        in a stopped process is picked up once its lease expires.
+        """
+        if self.threads:
+            return
+
+        self._init_db()
+        self.stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ask-ai-job-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        heartbeat = threading.Thread(target=self._heartbeat, name="ask-ai-job-leases", daemon=True)
+        heartbeat.start()
+        self.threads.append(heartbeat)
+
+    def stop(self, timeout: float = 5) -> None:
+        """Ask workers to finish their current question and exit."""
+        self.stopping.set()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _claim(self, conn: sqlite3.Connection) -> Tuple[Optional[sqlite3.Row], str]:
+        """Lease the next pending or expired question; returns it and the claim's owner id."""
+        owner = f"{self.owner}:{uuid.uuid4().hex[:8]}"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            # Rows running without a lease were claimed before leases existed
+            row = conn.execute(
+                "SELECT job_id, idx, question, context, status FROM job_items "
+                "WHERE status = 'pending' OR (status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)) "
+                "ORDER BY rowid LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE job_items SET status = 'running', owner = ?, lease_expires = ? WHERE job_id = ? AND idx = ?",
+                    (owner, now + JOB_LEASE_SECONDS, row["job_id"], row["idx"])
+                )
+                with self.active_lock:
+                    self.active[owner] = (row["job_id"], row["idx"], now)
+                if row["status"] == "running":
+                    metrics.inc("ask_ai_job_leases_reclaimed_total")
+                conn.execute("UPDATE jobs SET status = 'running' WHERE id = ? AND status = 'pending'", (row["job_id"],))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            with self.active_lock:
+                self.active.pop(owner, None)
+            raise
+        return row, owner
+
+    def _finish(self, conn: sqlite3.Connection, owner: str, job_id: str, idx: int,
+                result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        with self.active_lock:
+            self.active.pop(owner, None)
+        counter = "failed" if error else "completed"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            updated = conn.execute(
+                "UPDATE job_items SET status = ?, result = ?, error = ?, lease_expires = NULL "
+                "WHERE job_id = ? AND idx = ? AND status = 'running' AND owner = ?",
+                (counter, json.dumps(result) if result is not None else None, error, job_id, idx, owner)
+            ).rowcount
+            if not updated:
+                # The lease expired and another worker claimed the item
+                conn.execute("COMMIT")
+                return
+            conn.execute(f"UPDATE jobs SET {counter} = {counter} + 1 WHERE id = ?", (job_id,))
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', finished_at = ? WHERE id = ? AND completed + failed >= total",
+                (time.time(), job_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        metrics.inc("ask_ai_job_items_processed_total", status=counter)
+
+    def _heartbeat(self) -> None:
+        """
+        Renew the leases of questions this queue's workers are answering,
+        up to JOB_MAX_RUN_SECONDS after each claim.
+        """
+        conn = _connect(self.db_path)
+        try:
+            while not self.stopping.wait(JOB_LEASE_SECONDS / 3):
+                now = time.time()
+                with self.active_lock:
+                    renew = [
+                        (now + JOB_LEASE_SECONDS, job_id, idx, owner)
+                        for owner, (job_id, idx, claimed) in self.active.items()
+                        if now - claimed < JOB_MAX_RUN_SECONDS
+                    ]
+                try:
+                    conn.executemany(
+                        "UPDATE job_items SET lease_expires = ? "
+                        "WHERE job_id = ? AND idx = ? AND owner = ? AND status = 'running'",
+                        renew
+                    )
+                except sqlite3.Error as e:
+                    logger.warning("Job lease renewal error: %s", e)
+        finally:
+            conn.close()
+
+    def _run(self) -> None:
+        from logic.ask_ai_logic import handle_ai_question
+
+        llm_priority.set("bulk")
+        conn = _connect(self.db_path)
+
+        try:
+            while not self.stopping.is_set():
+                row, owner = self._claim(conn)
+                if row is None:
+                    # Other server processes may add work too, so poll as well
+                    with self.wakeup:
+                        self.wakeup.wait(1.0)
+                    continue
+
+                result, error = None, None
+                try:
+                    # Coalesces only with other bulk questions (see handle_ai_question)
+                    result = handle_ai_question(row["question"], json.loads(row["context"]))
+                except Exception as e:
+                    error = str(e) or e.__class__.__name__
+
+                self._finish(conn, owner, row["job_id"], row["idx"], result, error)
+        finally:
+            conn.close()
+
+
+job_queue = JobQueue(JOBS_DB_PATH, JOB_WORKERS)
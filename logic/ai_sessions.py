@@ -0,0 +1,149 @@
+# logic/ai_sessions.py
+
+"""
+Conversation Sessions
+Server-side state for multi-turn /ask-ai conversations.
+
+A session keeps the conversation context, the entities resolved in earlier
+turns and a small cache of structured outputs, so follow-up questions can
+be answered without resending context or recomputing unchanged results.
+Sessions expire after an idle TTL; the store also enforces a session count
+and an approximate memory cap, evicting least recently used sessions first.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from logic import metrics
+
+SESSION_IDLE_TTL = float(os.getenv("ASK_AI_SESSION_TTL", "1800"))
+SESSION_MAX_COUNT = int(os.getenv("ASK_AI_SESSION_MAX", "1000"))
+SESSION_MAX_BYTES = int(os.getenv("ASK_AI_SESSION_MAX_BYTES", str(50 * 1024 * 1024)))
+SESSION_MAX_OUTPUTS = int(os.getenv("ASK_AI_SESSION_MAX_OUTPUTS", "16"))
+
+
+class AISession:
+    """State of one conversation."""
+
+    def __init__(self, session_id: str, context: Optional[Dict[str, Any]] = None):
+        self.id = session_id
+        self.context = dict(context or {})
+        self.last_intent = None
+        self.last_subject = None
+        self.entities = {}
+        self.outputs = OrderedDict()
+        self.turns = 0
+        self.last_seen = time.monotonic()
+        self.size_at_save = 0
+        self.lock = threading.Lock()
+
+    def update_context(self, updates: Dict[str, Any]) -> None:
+        """Merge context updates into the stored context (nested dicts are merged too)."""
+        for key, value in (updates or {}).items():
+            if isinstance(value, dict) and isinstance(self.context.get(key), dict):
+                self.context[key] = {**self.context[key], **value}
+            else:
+                self.context[key] = value
+
+    def get_output(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached structured output for a key, if present."""
+        output = self.outputs.get(key)
+        if output is not None:
+            self.outputs.move_to_end(key)
+        metrics.inc("ask_ai_session_output_cache_total", result="hit" if output is not None else "miss")
+        return output
+
+    def put_output(self, key: str, output: Dict[str, Any]) -> None:
+        """Cache a structured output, keeping at most SESSION_MAX_OUTPUTS."""
+        self.outputs[key] = output
+        self.outputs.move_to_end(key)
+        while len(self.outputs) > SESSION_MAX_OUTPUTS:
+            self.outputs.popitem(last=False)
+
+    def estimate_size(self) -> int:
+        """Approximate memory footprint in bytes (serialized size of the state)."""
+        state = [self.context, self.entities, self.last_subject, list(self.outputs.values())]
+        return len(json.dumps(state, default=str))
+
+
+class SessionStore:
+    """
+    In-process session store with idle expiry and LRU eviction.
+
+    Args:
+        idle_ttl: seconds of inactivity after which a session expires
+        max_sessions: maximum number of live sessions
+        max_bytes: approximate cap on the total size of all sessions
+    """
+
+    def __init__(self, idle_ttl: float, max_sessions: int, max_bytes: int):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def create(self, context: Optional[Dict[str, Any]] = None) -> AISession:
+        """Start a new session."""
+        session = AISession(uuid.uuid4().hex, context)
+        self.save(session)
+        return session
+
+    def get(self, session_id: str) -> Optional[AISession]:
+        """Return a live session and mark it used, or None if unknown or expired."""
+        with self.lock:
+            self._expire()
+            session = self.sessions.get(session_id)
+            if session is not None:
+                session.last_seen = time.monotonic()
+                self.sessions.move_to_end(session_id)
+            return session
+
+    def save(self, session: AISession) -> None:
+        """Store a session after a turn, re-inserting it if it was evicted meanwhile."""
+        size = session.estimate_size()
+
+        with self.lock:
+            previous = self.sessions.pop(session.id, None)
+            if previous is not None:
+                self.total_bytes -= previous.size_at_save
+
+            session.last_seen = time.monotonic()
+            session.size_at_save = size
+            self.sessions[session.id] = session
+            self.total_bytes += size
+
+            self._expire()
+            while len(self.sessions) > 1 and (
+                len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+            ):
+                self._evict(next(iter(self.sessions)), "capacity")
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        # Sessions are ordered by last use, so expired ones are at the front
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._evict(session_id, "idle")
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        session = self.sessions.pop(session_id)
+        self.total_bytes -= session.size_at_save
+        metrics.inc("ask_ai_session_evictions_total", reason=reason)
+
+    def stats(self) -> Dict[str, Any]:
+        """Number of live sessions and their approximate total size."""
+        with self.lock:
+            self._expire()
+            return {"sessions": len(self.sessions), "approx_bytes": self.total_bytes}
+
+
+session_store = SessionStore(SESSION_IDLE_TTL, SESSION_MAX_COUNT, SESSION_MAX_BYTES)
@@ -1,55 +1,142 @@
 import os
-import google.generativeai as genai
-from dotenv import load_dotenv
-from typing import Dict, Any
+import threading
+import logging
+from typing import Dict, Any, List
 import json
 import re
+import hashlib
+from logic.llm_backend import get_llm_backend, estimate_tokens, llm_priority
+from logic import metrics
+from logic.singleflight import SingleFlight
+from logic.intent_batcher import IntentBatcher
+from logic.ai_sessions import session_store
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY must be set in environment variables")
+# Identical concurrent questions share one pipeline run
+ASK_AI_COALESCING = os.getenv("ASK_AI_COALESCING", "True") == "True"
+ask_ai_flight = SingleFlight("ask_ai")
 
-genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Optional micro-batching of intent classification under load
+INTENT_BATCHING = os.getenv("INTENT_BATCHING", "False") == "True"
+INTENT_BATCH_MAX_SIZE = int(os.getenv("INTENT_BATCH_MAX_SIZE", "16"))
+INTENT_BATCH_MAX_WAIT_MS = float(os.getenv("INTENT_BATCH_MAX_WAIT_MS", "10"))
+INTENT_BATCH_WORKERS = int(os.getenv("INTENT_BATCH_WORKERS", "4"))
+
+VALID_INTENTS = ['crop_recommendation', 'nutrition_recommendation', 'explanation', 'general']
+
+INTENT_CATEGORIES = """Categories:
+- crop_recommendation: Questions about which crops to grow, farming suggestions
+- nutrition_recommendation: Questions about diet, food for health conditions, nutrition plans
+- explanation: Questions asking "why", "how", or details about a specific crop or food
+- general: General greetings, unclear questions, or off-topic queries"""
+
+# Follow-up questions that refer back to the previous turn: short turns that
+# open with a connective or with an anaphor in their first three words
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(?:(?:and|also|what about|how about|more|tell me more)\b|(?:\S+\s+){0,2}(?:it|its|that|this|these|those|they|them|there)\b)"
+)
+FOLLOW_UP_MAX_WORDS = 8
+EXPLANATION_FOLLOW_UP_PATTERN = re.compile(r"\b(why|how|explain|more about|details?|tell me more)\b")
+
+# Send only the fields each answer uses to format_response
+PROMPT_COMPACTION = os.getenv("PROMPT_COMPACTION", "True") == "True"
+
+_intent_batcher = None
+_intent_batcher_lock = threading.Lock()
 
 
 def classify_intent(question: str) -> str:
     """
     Use Gemini to classify user question into one of the predefined intents.
+    When INTENT_BATCHING is enabled, the question is classified together with
+    other concurrent questions in a single call.
     Returns: intent category as string
     """
+    if INTENT_BATCHING:
+        return get_intent_batcher().classify(question)
+
+    return classify_single_intent(question)
+
+
+def classify_single_intent(question: str) -> str:
+    """Classify one question with its own Gemini call."""
     prompt = f"""Classify the following user question into EXACTLY ONE category.
 Return ONLY the category name, nothing else.
 
-Categories:
-- crop_recommendation: Questions about which crops to grow, farming suggestions
-- nutrition_recommendation: Questions about diet, food for health conditions, nutrition plans
-- explanation: Questions asking "why", "how", or details about a specific crop or food
-- general: General greetings, unclear questions, or off-topic queries
+{INTENT_CATEGORIES}
 
 Question: "{question}"
 
 Category:"""
 
     try:
-        response = model.generate_content(prompt)
-        intent = response.text.strip().lower()
+        response_text = get_llm_backend().generate(prompt, task="classify_intent")
+        intent = response_text.strip().lower()
         
         # Validate intent
-        valid_intents = ['crop_recommendation', 'nutrition_recommendation', 'explanation', 'general']
-        if intent not in valid_intents:
+        if intent not in VALID_INTENTS:
             # Default to general if invalid
             return 'general'
         
         return intent
     except Exception as e:
-        print(f"Intent classification error: {e}")
+        logger.warning("Intent classification error: %s", e)
         return 'general'
 
 
+def classify_intents(questions: List[str]) -> List[str]:
+    """
+    Classify several questions with one Gemini call returning a JSON array.
+    Falls back to one call per question if the array cannot be parsed.
+    """
+    if len(questions) == 1:
+        return [classify_single_intent(questions[0])]
+
+    numbered = "\n".join(f"{i}. {json.dumps(q)}" for i, q in enumerate(questions, 1))
+    prompt = f"""Classify each of the following user questions into EXACTLY ONE category.
+Return ONLY a JSON array of category names, one per question, in the same order.
+
+{INTENT_CATEGORIES}
+
+Questions:
+{numbered}
+
+Categories (JSON array):"""
+
+    try:
+        response_text = get_llm_backend().generate(prompt, task="classify_intent_batch")
+        cleaned = re.sub(r"^```(?:json)?|```$", "", response_text.strip()).strip()
+        intents = json.loads(cleaned)
+        if not isinstance(intents, list) or len(intents) != len(questions):
+            raise ValueError(f"expected {len(questions)} intents, got {cleaned[:100]}")
+    except Exception as e:
+        logger.warning("Batched intent classification error: %s", e)
+        return [classify_single_intent(q) for q in questions]
+
+    return [
+        intent.strip().lower() if isinstance(intent, str) and intent.strip().lower() in VALID_INTENTS else 'general'
+        for intent in intents
+    ]
+
+
+def get_intent_batcher() -> IntentBatcher:
+    """Return the shared intent batcher, starting it on first use."""
+    global _intent_batcher
+
+    if _intent_batcher is None:
+        with _intent_batcher_lock:
+            if _intent_batcher is None:
+                _intent_batcher = IntentBatcher(
+                    classify_intents,
+                    max_batch=INTENT_BATCH_MAX_SIZE,
+                    max_wait_ms=INTENT_BATCH_MAX_WAIT_MS,
+                    workers=INTENT_BATCH_WORKERS
+                )
+
+    return _intent_batcher
+
+
 def extract_parameters(question: str, context: Dict[str, Any], intent: str) -> Dict[str, Any]:
     """
     Extract relevant parameters from question and context based on intent.
@@ -108,8 +195,8 @@ Question: "{question}"
 Condition:"""
     
     try:
-        response = model.generate_content(prompt)
-        condition = response.text.strip().lower()
+        response_text = get_llm_backend().generate(prompt, task="extract_health_condition")
+        condition = response_text.strip().lower()
         return condition if condition else "general"
     except:
         return "general"
@@ -126,16 +213,84 @@ Question: "{question}"
 Item:"""
     
     try:
-        response = model.generate_content(prompt)
-        subject = response.text.strip()
+        response_text = get_llm_backend().generate(prompt, task="extract_subject")
+        subject = response_text.strip()
         return subject if subject.lower() != "none" else None
     except:
         return None
 
 
+def project_crop_recommendation(data: Dict[str, Any]) -> Dict[str, Any]:
+    diversity = data.get('diversity_score', {})
+    return {
+        'recommended_crops': data.get('recommended_crops', []),
+        'diversity': {'level': diversity.get('level'), 'message': diversity.get('message')}
+    }
+
+
+def project_nutrition_recommendation(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {'recommended_foods': data.get('recommended_foods', [])}
+
+
+def project_explanation(data: Dict[str, Any]) -> Dict[str, Any]:
+    if 'crop_name' in data and 'overall_score' in data:
+        climate = data['climate_match']
+        return {
+            'crop_name': data['crop_name'],
+            'overall_score': data['overall_score'],
+            'suitability': data['suitability'],
+            'climate': {name: {'yours': m['your_value'], 'ideal': m['ideal_value'], 'status': m['status']}
+                        for name, m in climate.items()},
+            'soil': {'yours': data['soil_match']['your_soil'], 'ideal': data['soil_match']['ideal_soil']},
+            'npk': {'yours': data['nutrient_match']['your_npk'], 'ideal': data['nutrient_match']['ideal_npk'],
+                    'status': data['nutrient_match']['status']}
+        }
+
+    if 'food_name' in data and 'overall_match' in data:
+        return {
+            'food_name': data['food_name'],
+            'overall_match': data['overall_match'],
+            'suitability': data['suitability'],
+            'nutrients': {key: data[key] for key in ['calories', 'protein', 'carbs', 'sugars', 'sodium', 'cholesterol']},
+            'suitable_for': data['dietary_info']['suitable_for'],
+            'specific_benefits': data['specific_benefits']
+        }
+
+    # Errors and free-text details are already small
+    return data
+
+
+PROMPT_PROJECTIONS = {
+    'crop_recommendation': project_crop_recommendation,
+    'nutrition_recommendation': project_nutrition_recommendation,
+    'explanation': project_explanation,
+}
+
+
+def prompt_data(structured_data: Dict[str, Any], intent: str) -> str:
+    """
+    Serialize structured output for the format_response prompt.
+
+    With PROMPT_COMPACTION enabled, only the fields the answer uses are kept
+    (see PROMPT_PROJECTIONS) and the JSON is written without whitespace.
+    """
+    if not PROMPT_COMPACTION:
+        return json.dumps(structured_data, indent=2)
+
+    projection = PROMPT_PROJECTIONS.get(intent)
+    if projection is not None:
+        try:
+            structured_data = projection(structured_data)
+        except (KeyError, TypeError):
+            pass
+
+    return json.dumps(structured_data, separators=(',', ':'), ensure_ascii=False)
+
+
 def format_response(structured_data: Dict[str, Any], intent: str, question: str) -> str:
     """
     Use Gemini to convert structured backend output into friendly, conversational language.
+    Prompt and response token estimates are recorded per intent.
     """
     prompt = f"""Convert the following recommendation data into a friendly, conversational response.
 
@@ -143,7 +298,7 @@ Original Question: "{question}"
 Intent: {intent}
 
 Data:
-{json.dumps(structured_data, indent=2)}
+{prompt_data(structured_data, intent)}
 
 Instructions:
 - Be concise and friendly
@@ -157,11 +312,15 @@ Instructions:
 
 Response:"""
     
+    metrics.inc("llm_format_calls_total", intent=intent)
+    metrics.inc("llm_prompt_tokens_total", estimate_tokens(prompt), intent=intent)
+
     try:
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        response_text = get_llm_backend().generate(prompt, task="format_response")
+        metrics.inc("llm_response_tokens_total", estimate_tokens(response_text), intent=intent)
+        return response_text.strip()
     except Exception as e:
-        print(f"Response formatting error: {e}")
+        logger.warning("Response formatting error: %s", e)
         # Fallback to simple formatting
         return format_fallback_response(structured_data, intent)
 
@@ -182,9 +341,40 @@ def format_fallback_response(data: Dict[str, Any], intent: str) -> str:
     return "I've processed your request. Please check the detailed data for more information."
 
 
+def ask_ai_cache_key(question: str, context: Dict[str, Any]) -> str:
+    """
+    Cache key for an AI question.
+
+    Questions differing only in case or whitespace, with the same context,
+    map to the same key.
+    """
+    normalized = " ".join(question.lower().split())
+    payload = json.dumps({"question": normalized, "context": context}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
 def handle_ai_question(question: str, context: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Main handler for AI questions.
+    Main entry point for AI questions.
+
+    Concurrent requests with the same cache key wait on the first in-flight
+    computation and share its result (see logic/singleflight.py). Only
+    requests of the same LLM priority coalesce, so an interactive request
+    never waits on a bulk job's computation at bulk priority.
+    """
+    if not ASK_AI_COALESCING:
+        return answer_ai_question(question, context)
+
+    key = ask_ai_cache_key(question, context)
+    priority = llm_priority.get()
+    if priority != "interactive":
+        key = f"{priority}:{key}"
+    return ask_ai_flight.do(key, answer_ai_question, question, context)
+
+
+def answer_ai_question(question: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the AI question pipeline.
     
     Flow:
     1. Classify intent using Gemini
@@ -199,7 +389,22 @@ def handle_ai_question(question: str, context: Dict[str, Any]) -> Dict[str, Any]
     # Step 2: Extract parameters
     params = extract_parameters(question, context, intent)
     
-    # Step 3: Route to existing logic (imported from other modules)
+    # Step 3: Route to existing logic
+    structured_output = route_intent(intent, params, context)
+    
+    # Step 4: Format response using Gemini
+    friendly_answer = format_response(structured_output, intent, question)
+    
+    # Step 5: Return final response
+    return {
+        'answer': friendly_answer,
+        'source': 'nutrigrow-ai',
+        'intent': intent,
+        'raw_data': structured_output  # Optional: include for debugging
+    }
+
+def route_intent(intent: str, params: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the backend logic for an intent and return its structured output."""
     structured_output = {}
     
     if intent == 'crop_recommendation':
@@ -249,13 +454,79 @@ def handle_ai_question(question: str, context: Dict[str, Any]) -> Dict[str, Any]
             'message': 'Hello! I can help you with crop recommendations, nutrition advice, or explain details about crops and foods. What would you like to know?'
         }
     
-    # Step 4: Format response using Gemini
-    friendly_answer = format_response(structured_output, intent, question)
-    
-    # Step 5: Return final response
+    return structured_output
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    True if the question refers back to an earlier turn. Longer questions
+    are classified on their own even when they contain "it" or "that".
+    """
+    words = re.sub(r"[^\w\s']", " ", question.lower()).split()
+    return len(words) <= FOLLOW_UP_MAX_WORDS and bool(FOLLOW_UP_PATTERN.search(" ".join(words)))
+
+
+def handle_session_question(session, question: str, context_updates: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Answer a question within a conversation session (see logic/ai_sessions.py).
+
+    Follow-up questions are resolved against the session state: the previous
+    intent is reused instead of re-classifying, the subject or condition the
+    question names is extracted as usual, falling back to the session's when
+    it names none ("why?", "what about it?"), and structured outputs are
+    reused when their parameters have not changed.
+    """
+    with session.lock:
+        session.update_context(context_updates)
+        context = session.context
+        follow_up = session.turns > 0 and is_follow_up(question)
+
+        # Step 1: Intent, incrementally when the question refers back
+        if follow_up and session.last_subject and EXPLANATION_FOLLOW_UP_PATTERN.search(question.lower()):
+            intent = 'explanation'
+        elif follow_up and session.last_intent:
+            intent = session.last_intent
+        else:
+            intent = classify_intent(question)
+
+        # Step 2: Parameters, reusing entities resolved in earlier turns
+        params = extract_parameters(question, context, intent)
+        if intent == 'explanation' and follow_up and not params['subject']:
+            params['subject'] = session.last_subject
+        elif intent == 'nutrition_recommendation' and follow_up and 'condition' not in context \
+                and params['condition'] == 'general' and session.entities.get('condition'):
+            params['condition'] = session.entities['condition']
+
+        # Step 3: Structured output, cached per session
+        output_key = json.dumps([intent, {k: v for k, v in params.items() if k != 'context'}, context], sort_keys=True, default=str)
+        structured_output = session.get_output(output_key)
+        cached = structured_output is not None
+        if not cached:
+            structured_output = route_intent(intent, params, context)
+            session.put_output(output_key, structured_output)
+
+        # Remember what this turn resolved
+        session.last_intent = intent
+        if intent == 'nutrition_recommendation':
+            session.entities['condition'] = params.get('condition')
+        subject = params.get('subject')
+        if not subject:
+            subject = next(iter(structured_output.get('recommended_crops') or structured_output.get('recommended_foods') or []), None)
+        if subject:
+            session.last_subject = subject
+        session.turns += 1
+
+        # Step 4: Format response
+        friendly_answer = format_response(structured_output, intent, question)
+
+    session_store.save(session)
+
     return {
         'answer': friendly_answer,
         'source': 'nutrigrow-ai',
         'intent': intent,
-        'raw_data': structured_output  # Optional: include for debugging
-    }
\ No newline at end of file
+        'session_id': session.id,
+        'follow_up': follow_up,
+        'cached': cached,
+        'raw_data': structured_output
+    }
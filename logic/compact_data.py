@@ -0,0 +1,156 @@
+# logic/compact_data.py
+
+"""
+Compact Dataset Representation
+Shrinks the farmer and consumer DataFrames each worker keeps in memory.
+
+- String columns (Soil Type, Crop Type, Fertilizer Name, Food_Item,
+  Category, Meal_Type) are dictionary-encoded as pandas categoricals:
+  one interned name table per column plus integer codes per row.
+- Integer columns get the narrowest integer dtype that holds their range.
+- Float columns stay float64. A float32 copy would change values (30.24
+  is not representable) and NumPy evaluates float32 - float in float32,
+  which would move the engines' tolerance boundaries.
+
+Engines must treat numeric inputs as floats when combining them with
+narrowed integer columns (int8 - 500 overflows), and convert categorical
+columns to str before value_counts (categoricals also count unused names).
+
+    python -m logic.compact_data    # bytes per row before and after
+"""
+
+import os
+import ctypes
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+COMPACT_DATA = os.getenv("COMPACT_DATA", "True") == "True"
+READ_CHUNK_ROWS = 250_000
+# The python parser creates many small objects per row; smaller chunks keep
+# the allocator from holding on to them after parsing
+PYTHON_ENGINE_CHUNK_ROWS = 10_000
+
+
+def _is_string(series: pd.Series) -> bool:
+    return pd.api.types.is_string_dtype(series.dtype) or series.dtype == object
+
+
+def compact_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return a copy with categorical strings and narrowed integer columns."""
+    columns = {}
+    for column in frame.columns:
+        series = frame[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            columns[column] = series
+        elif _is_string(series):
+            columns[column] = series.astype("category")
+        elif pd.api.types.is_integer_dtype(series.dtype) and len(series):
+            columns[column] = pd.to_numeric(series, downcast="integer")
+        else:
+            columns[column] = series
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate frames with a fresh RangeIndex, merging categorical name
+    tables instead of falling back to strings.
+    """
+    columns = {}
+    for column in frames[0].columns:
+        parts = [frame[column] for frame in frames]
+        if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            parts = [part if isinstance(part.dtype, pd.CategoricalDtype) else part.astype("category") for part in parts]
+            columns[column] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def read_compact_csv(path: str, chunk_rows: int = None, **read_options) -> pd.DataFrame:
+    """
+    Read a CSV chunk by chunk, compacting each chunk, so peak memory stays
+    close to the compact size instead of the full object-dtype frame.
+    """
+    if chunk_rows is None:
+        chunk_rows = PYTHON_ENGINE_CHUNK_ROWS if read_options.get("engine") == "python" else READ_CHUNK_ROWS
+
+    chunks = []
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, **read_options):
+        chunk.columns = chunk.columns.str.strip()
+        chunks.append(compact_frame(chunk))
+    frame = chunks[0] if len(chunks) == 1 else compact_frame(concat_frames(chunks))
+    del chunks
+    release_memory()
+    return frame
+
+
+def release_memory() -> None:
+    """
+    Return freed heap pages to the OS (glibc only). Parsing leaves the
+    memory of the temporary string objects cached in the allocator, which
+    would otherwise keep RSS near the uncompacted size.
+    """
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+_lowered_cache = {}
+
+
+def _lowered_names(categories: pd.Index) -> np.ndarray:
+    """Lowercased name table, cached per categories object."""
+    cached = _lowered_cache.get(id(categories))
+    if cached is not None and cached[0] is categories:
+        return cached[1]
+    lowered = np.asarray(categories.str.lower(), dtype=object)
+    if len(_lowered_cache) >= 32:
+        _lowered_cache.clear()
+    _lowered_cache[id(categories)] = (categories, lowered)
+    return lowered
+
+
+def lower_equals(series: pd.Series, value: str) -> pd.Series:
+    """
+    Same as series.str.lower() == value; for categoricals the names are
+    lowercased once per distinct value instead of once per row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        matches = np.flatnonzero(_lowered_names(series.cat.categories) == value)
+        return pd.Series(np.isin(series.cat.codes.to_numpy(), matches), index=series.index)
+    return series.str.lower() == value
+
+
+def memory_report(frame: pd.DataFrame) -> Dict[str, float]:
+    """Total and per-row bytes of a DataFrame, counting string contents and name tables."""
+    total = int(frame.memory_usage(deep=True, index=True).sum())
+    return {
+        "rows": len(frame),
+        "bytes": total,
+        "bytes_per_row": round(total / len(frame), 1) if len(frame) else 0.0,
+    }
+
+
+def main():
+    from logic.crop_logic import FARMER_DATA_PATH
+    from logic.nutrition_logic import CONSUMER_DATA_PATH
+
+    raw = {
+        "farmer": pd.read_csv(FARMER_DATA_PATH),
+        "consumer": pd.read_csv(CONSUMER_DATA_PATH, engine="python", on_bad_lines="skip"),
+    }
+    for name, frame in raw.items():
+        frame.columns = frame.columns.str.strip()
+        before = memory_report(frame)
+        after = memory_report(compact_frame(frame))
+        print(f"{name:<9} {before['rows']:>10} rows  {before['bytes_per_row']:>8.1f} -> "
+              f"{after['bytes_per_row']:>6.1f} bytes/row ({before['bytes'] / max(after['bytes'], 1):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+# logic/crop_ingest.py
+
+"""
+Field Observation Ingestion
+Validation and write-ahead log for new farmer observations.
+
+Accepted observations are appended to a JSON-lines write-ahead log (WAL)
+and fsynced before the request returns, each with the row_id it will have
+in the dataset. Every process serving crop queries tails the log and merges
+new rows into its crop data (see sync_observations in logic/crop_logic.py),
+so uvicorn workers and scoring processes all pick them up without a restart.
+
+Compaction folds the logged rows into the base dataset: they are appended
+to the farmer CSV (in-memory mode) or merged into fewer, larger parts
+(partitioned store), and the log is reset to a checkpoint record.
+
+Usage:
+    python -m logic.crop_ingest add observations.csv   # or .jsonl
+    python -m logic.crop_ingest compact
+"""
+
+import os
+import csv
+import json
+import math
+import time
+import shutil
+import argparse
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no fcntl; fall back to an in-process lock
+    fcntl = None
+
+from logic import metrics
+
+CROP_WAL_PATH = os.getenv("CROP_WAL_PATH", "data/farmer_observations.wal")
+INGEST_MAX_ITEMS = int(os.getenv("INGEST_MAX_ITEMS", "10000"))
+
+# Input field -> dataset column, with the accepted value range for numbers
+OBSERVATION_FIELDS = {
+    "temperature": ("Temperature", (-20.0, 60.0)),
+    "humidity": ("Humidity", (0.0, 100.0)),
+    "moisture": ("Moisture", (0.0, 100.0)),
+    "soil_type": ("Soil Type", None),
+    "crop_type": ("Crop Type", None),
+    "nitrogen": ("Nitrogen", (0, 1000)),
+    "potassium": ("Potassium", (0, 1000)),
+    "phosphorous": ("Phosphorous", (0, 1000)),
+    "fertilizer_name": ("Fertilizer Name", None),
+}
+INTEGER_FIELDS = {"nitrogen", "potassium", "phosphorous"}
+
+
+def validate_observation(observation: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Check one observation and convert it to a dataset row.
+
+    Raises:
+        ValueError: if a field is missing or out of range
+    """
+    row = {}
+    for field, (column, bounds) in OBSERVATION_FIELDS.items():
+        value = observation.get(field)
+        if value is None:
+            raise ValueError(f"Missing field '{field}'")
+
+        if bounds is None:
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError(f"'{field}' must be a non-empty string")
+            row[column] = value.strip()
+            continue
+
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{field}' must be a number")
+        if not math.isfinite(number) or not bounds[0] <= number <= bounds[1]:
+            raise ValueError(f"'{field}' must be between {bounds[0]} and {bounds[1]}")
+        if field in INTEGER_FIELDS:
+            if not number.is_integer():
+                raise ValueError(f"'{field}' must be a whole number")
+            number = int(number)
+        row[column] = number
+    return row
+
+
+def validate_observations(observations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Validate a batch; errors name the offending item."""
+    if not observations:
+        raise ValueError("No observations given")
+    if len(observations) > INGEST_MAX_ITEMS:
+        raise ValueError(f"At most {INGEST_MAX_ITEMS} observations per request")
+
+    rows = []
+    for i, observation in enumerate(observations):
+        try:
+            rows.append(validate_observation(observation))
+        except ValueError as e:
+            raise ValueError(f"Observation {i}: {e}")
+    return rows
+
+
+class ObservationLog:
+    """
+    Append-only JSON-lines log of ingested rows.
+
+    Records are {"row_id", "ts", "row"}; compaction rewrites the log to a
+    single {"checkpoint": next_row_id, "base_bytes": ...} record. Writers in
+    different processes are serialized with an exclusive file lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        # (inode, offset, next row_id) after this process's last append, so
+        # the next append reads only records written since
+        self._tail = None
+
+    def lock(self):
+        return _FileLock(self.path + ".lock", self._thread_lock)
+
+    def identity(self) -> Optional[Tuple[int, int]]:
+        """(inode, size) of the log file, or None if it does not exist."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def read(self, offset: int = 0) -> Tuple[List[dict], int]:
+        """
+        Complete records from a byte offset.
+
+        Returns:
+            (records, offset after the last complete record)
+        """
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return records, offset + end
+
+    def next_row_id(self, records: List[dict], base_rows: int) -> int:
+        next_id = base_rows
+        for record in records:
+            if "checkpoint" in record:
+                next_id = max(next_id, record["checkpoint"])
+            else:
+                next_id = max(next_id, record["row_id"] + 1)
+        return next_id
+
+    def append(self, rows: List[Dict[str, Any]], base_rows: int) -> int:
+        """
+        Durably append rows; call with the lock held.
+
+        Args:
+            base_rows: rows in the base dataset, used when the log is empty
+
+        Returns:
+            row_id of the first appended row
+        """
+        identity = self.identity()
+        tail = self._tail
+        if identity is not None and tail is not None and identity[0] == tail[0] and identity[1] >= tail[1]:
+            records, _ = self.read(tail[1])
+            first_id = self.next_row_id(records, max(base_rows, tail[2]))
+        else:
+            records, _ = self.read()
+            first_id = self.next_row_id(records, base_rows)
+        now = time.time()
+
+        lines = "".join(
+            json.dumps({"row_id": first_id + i, "ts": now, "row": row}, ensure_ascii=False) + "\n"
+            for i, row in enumerate(rows)
+        )
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+            self._tail = (os.fstat(f.fileno()).st_ino, f.tell(), first_id + len(rows))
+
+        metrics.inc("crop_observations_ingested_total", len(rows))
+        return first_id
+
+    def reset(self, next_row_id: int, base_bytes: Optional[int] = None) -> None:
+        """Replace the log with a checkpoint record; call with the lock held."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps({"checkpoint": next_row_id, "base_bytes": base_bytes}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._tail = None
+
+
+class _FileLock:
+    """Exclusive lock across threads and processes."""
+
+    def __init__(self, path: str, thread_lock):
+        self.path = path
+        self.thread_lock = thread_lock
+        self.file = None
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.file = open(self.path, "a")
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+            self.file = None
+        self.thread_lock.release()
+
+
+def pending_rows(records: List[dict], from_row_id: int) -> List[dict]:
+    """Row records with row_id >= from_row_id, in row_id order."""
+    rows = [r for r in records if "row_id" in r and r["row_id"] >= from_row_id]
+    return sorted(rows, key=lambda r: r["row_id"])
+
+
+def compact_into_csv(log: ObservationLog, csv_path: str) -> int:
+    """
+    Append logged rows to the farmer CSV and reset the log.
+
+    A compaction interrupted after appending is rolled back to the size
+    recorded in the last checkpoint before retrying, so rows are never
+    appended twice.
+
+    Returns:
+        number of rows folded into the CSV
+    """
+    with log.lock():
+        records, _ = log.read()
+        checkpoints = [r for r in records if "checkpoint" in r]
+        checkpoint = checkpoints[-1] if checkpoints else {}
+        rows = pending_rows(records, checkpoint.get("checkpoint", 0))
+        if not rows:
+            return 0
+
+        base_bytes = checkpoint.get("base_bytes")
+        with open(csv_path, "rb+") as f:
+            if base_bytes is not None and os.fstat(f.fileno()).st_size > base_bytes:
+                f.truncate(base_bytes)
+            header = f.readline().decode("utf-8").rstrip("\r\n").split(",")
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+            else:
+                needs_newline = False
+
+        with open(csv_path, "a", newline="", encoding="utf-8") as f:
+            if needs_newline:
+                f.write("\n")
+            writer = csv.writer(f, lineterminator="\n")
+            for record in rows:
+                writer.writerow([record["row"][column.strip()] for column in header])
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+
+        log.reset(rows[-1]["row_id"] + 1, base_bytes=size)
+
+    metrics.inc("crop_observations_compacted_total", len(rows))
+    return len(rows)
+
+
+def compact_store(log: ObservationLog, store_dir: str) -> int:
+    """
+    Merge the parts of each partition of a partitioned store into one part
+    and reset the log. Replaced parts are deleted at the next compaction, so
+    readers holding the previous manifest can finish their scans.
+
+    Returns:
+        number of parts merged away
+    """
+    # Imported here: validation and the log are used by main.py, which
+    # should not import pandas before the crop engine is initialized
+    import numpy as np
+    import pandas as pd
+    from logic.crop_store import CropStore, ROW_ID, write_part, _write_manifest
+
+    with log.lock():
+        store = CropStore(store_dir)
+        manifest = store.manifest
+
+        for path in manifest.get("retired", []):
+            shutil.rmtree(os.path.join(store_dir, path), ignore_errors=True)
+        manifest["retired"] = []
+
+        groups = {}
+        for part in manifest["parts"]:
+            groups.setdefault((part["soil"], part["temp_bucket"]), []).append(part)
+
+        merged = 0
+        parts = []
+        for (soil, bucket), group in sorted(groups.items()):
+            if len(group) == 1:
+                parts.append(group[0])
+                continue
+            frame = pd.concat([
+                pd.DataFrame({
+                    ROW_ID: np.asarray(store._column(part, ROW_ID)),
+                    **{column: np.asarray(store._values(part, column)) for column in store.columns}
+                })
+                for part in group
+            ]).sort_values(ROW_ID, kind="stable")
+
+            parts.append(write_part(store_dir, manifest, frame, soil, bucket))
+            manifest["retired"].extend(part["path"] for part in group)
+            merged += len(group) - 1
+
+        # Group parts by partition; scans restore row order from row_id
+        manifest["parts"] = sorted(parts, key=lambda part: (part["soil"], part["temp_bucket"], part["min_row_id"]))
+        _write_manifest(store_dir, manifest)
+
+        # Rows not merged into parts yet stay in the log
+        records, _ = log.read()
+        if not pending_rows(records, manifest["next_row_id"]):
+            log.reset(manifest["next_row_id"])
+
+    metrics.inc("crop_store_parts_compacted_total", merged)
+    return merged
+
+
+def read_observation_file(path: str) -> List[Dict[str, Any]]:
+    """Observations from a CSV (columns named like the input fields) or JSON-lines file."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            return [dict(row) for row in csv.DictReader(f)]
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest new field observations")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Validate and append observations from a CSV or JSON-lines file")
+    add.add_argument("path")
+    commands.add_parser("compact", help="Fold logged observations into the base dataset")
+    args = parser.parse_args()
+
+    # Imported here: loading crop_logic loads the dataset
+    from logic.crop_logic import ingest_observations, compact_observations
+
+    if args.command == "add":
+        try:
+            result = ingest_observations(read_observation_file(args.path))
+        except ValueError as e:
+            print(f"Rejected: {e}")
+            raise SystemExit(1)
+        print(f"Accepted {result['accepted']} observations (row_id {result['first_row_id']}+)")
+    else:
+        print(f"Compacted: {compact_observations()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,262 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
 import pandas as pd
+from logic import metrics
+from logic.engine_core import ENGINE_CORE, ColumnArrays, sorted_prefix, first_sorted, vote
+from logic.compact_data import COMPACT_DATA, compact_frame, concat_frames, lower_equals, read_compact_csv
+from logic.crop_ingest import (
+    CROP_WAL_PATH, ObservationLog, validate_observations, pending_rows, compact_into_csv, compact_store
+)
 
-df = pd.read_csv("data/farmer_data.csv")
-df.columns = df.columns.str.strip()
+logger = logging.getLogger(__name__)
+
+FARMER_DATA_PATH = os.getenv("FARMER_DATA_PATH", "data/farmer_data.csv")
+# "memory" loads the whole CSV; "partitioned" reads an on-disk store (see logic/crop_store.py)
+CROP_STORE = os.getenv("CROP_STORE", "memory")
+CROP_STORE_DIR = os.getenv("CROP_STORE_DIR", "data/crop_store")
+
+# Seconds between checks for observations ingested by other processes
+INGEST_SYNC_INTERVAL = float(os.getenv("INGEST_SYNC_INTERVAL", "1"))
+INGEST_COMPACT_INTERVAL = float(os.getenv("INGEST_COMPACT_INTERVAL", "3600"))
+
+
+def load_farmer_data():
+    if COMPACT_DATA:
+        return read_compact_csv(FARMER_DATA_PATH)
+    data = pd.read_csv(FARMER_DATA_PATH)
+    data.columns = data.columns.str.strip()
+    return data
+
+
+if CROP_STORE == "partitioned":
+    from logic.crop_store import open_store, write_rows, _write_manifest, ROW_ID
+    store = open_store(CROP_STORE_DIR, FARMER_DATA_PATH)
+    df = None
+else:
+    store = None
+    df = load_farmer_data()
+
+# Observations merged in memory since the last compaction; folded into df
+# at compaction, so a merge does not rebuild the whole dataset
+delta = pd.DataFrame(columns=df.columns) if df is not None else None
+
+observation_log = ObservationLog(CROP_WAL_PATH)
+_sync_lock = threading.Lock()
+_sync_state = {"checked": 0.0, "inode": None, "offset": 0}
+
+
+def dataset_rows():
+    """Number of rows in the crop dataset, including merged observations."""
+    return len(df) + len(delta) if store is None else store.manifest["next_row_id"]
+
+
+def sync_observations(force=False):
+    """
+    Merge observations appended to the log (by any process) into the crop data.
+
+    Checks at most every INGEST_SYNC_INTERVAL seconds unless forced. In
+    memory the new rows are appended to `delta`; the partitioned store gets
+    one new part per touched partition.
+    """
+    global df, delta
+
+    now = time.monotonic()
+    if not force and now - _sync_state["checked"] < INGEST_SYNC_INTERVAL:
+        return
+    _sync_state["checked"] = now
+
+    if store is not None:
+        store.refresh()
+        identity = observation_log.identity()
+        if identity is None or identity == (_sync_state["inode"], _sync_state["offset"]):
+            return
+        with observation_log.lock():
+            store.reload()
+            records, offset = observation_log.read()
+            rows = pending_rows(records, store.manifest["next_row_id"])
+            if rows:
+                manifest = dict(store.manifest, parts=list(store.manifest["parts"]))
+                frame = pd.DataFrame([r["row"] for r in rows], columns=store.columns)
+                frame[ROW_ID] = [r["row_id"] for r in rows]
+                write_rows(store.store_dir, manifest, frame)
+                manifest["next_row_id"] = rows[-1]["row_id"] + 1
+                _write_manifest(store.store_dir, manifest)
+                store.reload()
+            _sync_state["inode"], _sync_state["offset"] = identity[0], offset
+        return
+
+    with _sync_lock:
+        identity = observation_log.identity()
+        if identity is None:
+            return
+        inode, size = identity
+        if inode != _sync_state["inode"] or size < _sync_state["offset"]:
+            # The log was compacted: read the new one from the start
+            _sync_state["inode"], _sync_state["offset"] = inode, 0
+        elif size == _sync_state["offset"]:
+            return
+
+        records, _sync_state["offset"] = observation_log.read(_sync_state["offset"])
+        checkpoints = [r["checkpoint"] for r in records if "checkpoint" in r]
+        if checkpoints and checkpoints[-1] > dataset_rows():
+            # Rows were folded into the CSV before this process merged them
+            df = load_farmer_data()
+            delta = pd.DataFrame(columns=df.columns)
+
+        rows = pending_rows(records, dataset_rows())
+        if rows:
+            frame = pd.DataFrame([r["row"] for r in rows], columns=df.columns)
+            delta = frame if delta.empty else pd.concat([delta, frame], ignore_index=True)
+
+
+def _fold_delta():
+    """Fold the merged observations into df, compacting it once."""
+    global df, delta
+
+    with _sync_lock:
+        if delta.empty:
+            return
+        merged = concat_frames([df, delta])
+        df = compact_frame(merged) if COMPACT_DATA else merged
+        delta = pd.DataFrame(columns=df.columns)
+
+
+def ingest_observations(observations):
+    """
+    Validate observations, append them to the log and merge them.
+
+    Raises:
+        ValueError: if any observation is invalid (nothing is stored)
+    """
+    rows = validate_observations(observations)
+    with observation_log.lock():
+        base_rows = dataset_rows()
+        if observation_log.identity() is None:
+            # Record where the base dataset ends, so compaction can never fold rows twice
+            base_bytes = os.path.getsize(FARMER_DATA_PATH) if store is None else None
+            observation_log.reset(base_rows, base_bytes=base_bytes)
+        first_row_id = observation_log.append(rows, base_rows)
+
+    sync_observations(force=True)
+    return {"accepted": len(rows), "first_row_id": first_row_id, "total_rows": dataset_rows()}
+
+
+def compact_observations():
+    """Fold logged observations into the base dataset (CSV or partitioned store)."""
+    sync_observations(force=True)
+    if store is None:
+        folded = compact_into_csv(observation_log, FARMER_DATA_PATH)
+        _fold_delta()
+        return {"rows_folded": folded}
+    merged = compact_store(observation_log, store.store_dir)
+    store.reload()
+    return {"parts_merged": merged}
+
+
+_compaction_stop = threading.Event()
+_compaction_thread = None
+
+
+def _compaction_loop():
+    while not _compaction_stop.wait(INGEST_COMPACT_INTERVAL):
+        try:
+            compact_observations()
+        except Exception as e:
+            logger.error("Observation compaction error: %s", e)
+
+
+def start_observation_compaction():
+    """Start periodic compaction of ingested observations (INGEST_COMPACT_INTERVAL > 0)."""
+    global _compaction_thread
+
+    if INGEST_COMPACT_INTERVAL <= 0 or _compaction_thread is not None:
+        return
+    _compaction_stop.clear()
+    _compaction_thread = threading.Thread(target=_compaction_loop, name="observation-compaction", daemon=True)
+    _compaction_thread.start()
+
+
+def stop_observation_compaction():
+    global _compaction_thread
+
+    _compaction_stop.set()
+    if _compaction_thread is not None:
+        _compaction_thread.join(timeout=5)
+        _compaction_thread = None
+
+
+def crop_rows(soil_type=None, near=None, crop_name=None):
+    """
+    Candidate rows for a query, in dataset order.
+
+    With the partitioned store only rows matching the given conditions are
+    read; in memory the whole DataFrame is returned, or with merged
+    observations pending compaction, the matching rows of df and delta.
+    Callers apply their filters either way.
+
+    Args:
+        soil_type: soil type (case-insensitive)
+        near: column -> (center, tolerance)
+        crop_name: crop type (case-insensitive)
+    """
+    sync_observations()
+    if store is None:
+        base, merged = df, delta
+        if merged.empty:
+            return base
+        return concat_frames([_matching(frame, soil_type, near, crop_name) for frame in (base, merged)])
+    return store.scan(
+        soil_type=soil_type,
+        near=near,
+        equals={"Crop Type": crop_name} if crop_name is not None else None
+    )
+
+
+def _matching(frame, soil_type, near, crop_name):
+    mask = np.ones(len(frame), dtype=bool)
+    if soil_type is not None:
+        mask &= lower_equals(frame["Soil Type"], soil_type.lower()).to_numpy()
+    if crop_name is not None:
+        mask &= lower_equals(frame["Crop Type"], crop_name.lower()).to_numpy()
+    for column, (center, tolerance) in (near or {}).items():
+        mask &= (np.abs(frame[column].to_numpy(dtype=float) - center) <= tolerance)
+    return frame[mask]
+
+
+_arrays = (None, None, None)
+_arrays_lock = threading.Lock()
+
+
+def crop_arrays():
+    """
+    The in-memory crop data as ColumnArrays; rows merged into `delta` are
+    appended to it, and it is rebuilt when df is replaced (compaction).
+    None when queries run on pandas (ENGINE_CORE=pandas or the partitioned
+    store).
+    """
+    global _arrays
+
+    sync_observations()
+    if store is not None or ENGINE_CORE != "numpy":
+        return None
+    base, merged, arrays = _arrays
+    if base is df and merged is delta:
+        return arrays
+    with _arrays_lock:
+        base, merged, arrays = _arrays
+        current_df, current_delta = df, delta
+        if base is not current_df:
+            arrays = ColumnArrays(current_df, group_by=("Soil Type", "Crop Type"))
+            merged_rows = 0
+        else:
+            merged_rows = arrays.rows - len(base)
+        if merged is not current_delta and len(current_delta) > merged_rows:
+            arrays = arrays.extend(current_delta.iloc[merged_rows:])
+        _arrays = (current_df, current_delta, arrays)
+    return arrays
 
 
 def calculate_diversity_score(recommended_crops):
@@ -86,28 +341,30 @@ def categorize_crops(crop_names):
     return result
 
 
+DIVERSITY_BENEFITS = {
+    "LOW": [
+        "High risk of total crop failure",
+        "Soil nutrient depletion from monoculture",
+        "Limited nutrition diversity in diet"
+    ],
+    "MEDIUM": [
+        "Reduced risk compared to single crop",
+        "Some soil health benefits",
+        "Moderate income stability"
+    ],
+    "HIGH": [
+        "Reduced risk of total crop failure",
+        "Improved soil health through varied root systems",
+        "Better nutrition diversity for family",
+        "Income stability from multiple sources",
+        "Natural pest management through diversity"
+    ]
+}
+
+
 def get_diversity_benefits(level):
     """Return specific benefits based on diversity level"""
-    benefits = {
-        "LOW": [
-            "High risk of total crop failure",
-            "Soil nutrient depletion from monoculture",
-            "Limited nutrition diversity in diet"
-        ],
-        "MEDIUM": [
-            "Reduced risk compared to single crop",
-            "Some soil health benefits",
-            "Moderate income stability"
-        ],
-        "HIGH": [
-            "Reduced risk of total crop failure",
-            "Improved soil health through varied root systems",
-            "Better nutrition diversity for family",
-            "Income stability from multiple sources",
-            "Natural pest management through diversity"
-        ]
-    }
-    return benefits.get(level, [])
+    return list(DIVERSITY_BENEFITS.get(level, []))
 
 
 def recommend_crop(input_data):
@@ -122,30 +379,58 @@ def recommend_crop(input_data):
     p = input_data["phosphorous"]
     k = input_data["potassium"]
 
-    filtered = df[
-        (abs(df["Temperature"] - temp) <= 3) &
-        (abs(df["Humidity"] - humidity) <= 10) &
-        (abs(df["Moisture"] - moisture) <= 10) &
-        (df["Soil Type"].str.lower() == soil_type.lower())
-    ]
+    arrays = crop_arrays()
+    if arrays is not None:
+        with metrics.stage("crop_filter"):
+            soil_rows = arrays.group("Soil Type", soil_type.lower())
+            values = arrays.values
+            matches = soil_rows[
+                (np.abs(values["Temperature"][soil_rows] - temp) <= 3) &
+                (np.abs(values["Humidity"][soil_rows] - humidity) <= 10) &
+                (np.abs(values["Moisture"][soil_rows] - moisture) <= 10)
+            ]
+            if not len(matches):
+                matches = soil_rows
 
-    if filtered.empty:
-        filtered = df[df["Soil Type"].str.lower() == soil_type.lower()]
+        with metrics.stage("crop_rank"):
+            npk_score = (
+                np.abs(values["Nitrogen"][matches] - float(n)) +
+                np.abs(values["Phosphorous"][matches] - float(p)) +
+                np.abs(values["Potassium"][matches] - float(k))
+            )
+            top_matches = matches[sorted_prefix(npk_score, 15)]
+            recommended_crops_list = vote(arrays.codes["Crop Type"][top_matches], arrays.names["Crop Type"], limit)
+    else:
+        with metrics.stage("crop_filter"):
+            rows = crop_rows(soil_type, near={"Temperature": (temp, 3), "Humidity": (humidity, 10), "Moisture": (moisture, 10)})
+            filtered = rows[
+                (abs(rows["Temperature"] - temp) <= 3) &
+                (abs(rows["Humidity"] - humidity) <= 10) &
+                (abs(rows["Moisture"] - moisture) <= 10) &
+                lower_equals(rows["Soil Type"], soil_type.lower())
+            ]
 
-    filtered = filtered.copy()
-    filtered["npk_score"] = (
-        abs(filtered["Nitrogen"] - n) +
-        abs(filtered["Phosphorous"] - p) +
-        abs(filtered["Potassium"] - k)
-    )
+            if filtered.empty:
+                rows = crop_rows(soil_type)
+                filtered = rows[lower_equals(rows["Soil Type"], soil_type.lower())]
 
-    top_matches = filtered.sort_values("npk_score").head(15)
+        with metrics.stage("crop_rank"):
+            filtered = filtered.copy()
+            # Inputs as floats: NPK columns may be stored as narrow integers
+            filtered["npk_score"] = (
+                abs(filtered["Nitrogen"] - float(n)) +
+                abs(filtered["Phosphorous"] - float(p)) +
+                abs(filtered["Potassium"] - float(k))
+            )
+
+            top_matches = filtered.sort_values("npk_score").head(15)
+
+            crops = top_matches["Crop Type"].astype(str).value_counts().head(limit)
+            recommended_crops_list = crops.index.tolist()
 
-    crops = top_matches["Crop Type"].value_counts().head(limit)
-    recommended_crops_list = crops.index.tolist()
-    
     # Calculate diversity score
-    diversity_analysis = calculate_diversity_score(recommended_crops_list)
+    with metrics.stage("diversity_scoring"):
+        diversity_analysis = calculate_diversity_score(recommended_crops_list)
 
     return {
         "recommended_crops": recommended_crops_list,
@@ -168,28 +453,59 @@ def get_crop_details(input_data):
     p = input_data["phosphorous"]
     k = input_data["potassium"]
 
-    # Filter for this specific crop
-    crop_data = df[df["Crop Type"].str.lower() == crop_name].copy()
-
-    if crop_data.empty:
-        return {
-            "error": f"Crop '{crop_name}' not found in database",
-            "crop_name": crop_name
-        }
-
-    # Calculate scores for all instances of this crop
-    crop_data["temp_diff"] = abs(crop_data["Temperature"] - temp)
-    crop_data["humidity_diff"] = abs(crop_data["Humidity"] - humidity)
-    crop_data["moisture_diff"] = abs(crop_data["Moisture"] - moisture)
-    crop_data["npk_score"] = (
-        abs(crop_data["Nitrogen"] - n) +
-        abs(crop_data["Phosphorous"] - p) +
-        abs(crop_data["Potassium"] - k)
-    )
-    crop_data["soil_match"] = crop_data["Soil Type"].str.lower() == soil_type.lower()
+    arrays = crop_arrays()
+    if arrays is not None:
+        with metrics.stage("crop_details_filter"):
+            crop_data = arrays.group("Crop Type", crop_name)
+
+        if not len(crop_data):
+            return {
+                "error": f"Crop '{crop_name}' not found in database",
+                "crop_name": crop_name
+            }
+
+        with metrics.stage("crop_details_rank"):
+            values = arrays.values
+            npk_score = (
+                np.abs(values["Nitrogen"][crop_data] - float(n)) +
+                np.abs(values["Phosphorous"][crop_data] - float(p)) +
+                np.abs(values["Potassium"][crop_data] - float(k))
+            )
+            best = first_sorted(npk_score)
+            best_match = arrays.row(crop_data[best])
+            best_match["temp_diff"] = abs(best_match["Temperature"] - temp)
+            best_match["humidity_diff"] = abs(best_match["Humidity"] - humidity)
+            best_match["moisture_diff"] = abs(best_match["Moisture"] - moisture)
+            best_match["npk_score"] = npk_score[best]
+            best_match["soil_match"] = (
+                isinstance(best_match["Soil Type"], str) and best_match["Soil Type"].lower() == soil_type.lower()
+            )
+    else:
+        # Filter for this specific crop
+        with metrics.stage("crop_details_filter"):
+            rows = crop_rows(crop_name=crop_name)
+            crop_data = rows[lower_equals(rows["Crop Type"], crop_name)].copy()
+
+        if crop_data.empty:
+            return {
+                "error": f"Crop '{crop_name}' not found in database",
+                "crop_name": crop_name
+            }
+
+        with metrics.stage("crop_details_rank"):
+            # Calculate scores for all instances of this crop
+            crop_data["temp_diff"] = abs(crop_data["Temperature"] - temp)
+            crop_data["humidity_diff"] = abs(crop_data["Humidity"] - humidity)
+            crop_data["moisture_diff"] = abs(crop_data["Moisture"] - moisture)
+            crop_data["npk_score"] = (
+                abs(crop_data["Nitrogen"] - float(n)) +
+                abs(crop_data["Phosphorous"] - float(p)) +
+                abs(crop_data["Potassium"] - float(k))
+            )
+            crop_data["soil_match"] = lower_equals(crop_data["Soil Type"], soil_type.lower())
 
-    # Get the best match for this crop
-    best_match = crop_data.sort_values("npk_score").iloc[0]
+            # Get the best match for this crop
+            best_match = crop_data.sort_values("npk_score").iloc[0]
 
     # Calculate match percentages
     temp_match = max(0, 100 - (best_match["temp_diff"] / 3 * 100))
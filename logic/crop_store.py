@@ -0,0 +1,291 @@
+# logic/crop_store.py
+
+"""
+Partitioned Crop Store
+On-disk columnar storage for the farmer dataset, for datasets that do not
+fit in memory.
+
+Rows are partitioned by soil type (lowercased, as queries compare it) and
+temperature bucket. Each partition holds one or more parts; a part is a
+directory with one .npy file per column plus a row_id column that records
+the row's position in the source CSV. manifest.json lists every part with
+its row count, min/max statistics of the numeric columns and the distinct
+values of the string columns.
+
+Queries prune parts by soil type and statistics, memory-map the columns of
+the remaining parts, and return only matching rows in source order, so the
+engines produce exactly the same results as with the in-memory DataFrame.
+
+Build a store with:
+    python -m logic.crop_store build --csv data/farmer_data.csv --out data/crop_store
+"""
+
+import os
+import re
+import json
+import shutil
+import logging
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+ROW_ID = "row_id"
+SOIL_COLUMN = "Soil Type"
+TEMPERATURE_COLUMN = "Temperature"
+DEFAULT_TEMP_BUCKET = 5.0
+BUILD_CHUNK_ROWS = 1_000_000
+# String columns with more distinct values than this get no distinct-value stats
+MAX_DISTINCT_STATS = 64
+# Slack on min/max pruning so float rounding can never drop a matching part
+PRUNE_EPSILON = 1e-9
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_") or "_"
+
+
+def _write_manifest(store_dir: str, manifest: dict) -> None:
+    path = os.path.join(store_dir, MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def part_stats(frame: pd.DataFrame, columns: Dict[str, str]) -> Tuple[dict, dict]:
+    """Min/max of numeric columns and distinct lowercased values of string columns."""
+    ranges = {}
+    distinct = {}
+    for column, dtype in columns.items():
+        values = frame[column]
+        if np.dtype(dtype).kind in "iuf":
+            ranges[column] = [float(values.min()), float(values.max())]
+        else:
+            unique = sorted(set(values.astype(str).str.lower()))
+            if len(unique) <= MAX_DISTINCT_STATS:
+                distinct[column] = unique
+    return ranges, distinct
+
+
+def write_part(store_dir: str, manifest: dict, frame: pd.DataFrame, soil: str, bucket: int) -> dict:
+    """
+    Write rows of one partition as a new part and add it to the manifest (not saved).
+
+    Args:
+        frame: rows with the manifest's columns and a row_id column
+    """
+    columns = manifest["columns"]
+    part_id = manifest["next_part"]
+    manifest["next_part"] += 1
+
+    relative = os.path.join(f"soil={_slug(soil)}", f"temp={bucket}", f"part-{part_id:06d}")
+    part_dir = os.path.join(store_dir, relative)
+    os.makedirs(part_dir, exist_ok=True)
+
+    np.save(os.path.join(part_dir, f"{ROW_ID}.npy"), frame[ROW_ID].to_numpy(dtype=np.int64))
+    for index, (column, dtype) in enumerate(columns.items()):
+        values = frame[column].to_numpy()
+        values = values.astype(str) if np.dtype(dtype).kind not in "iuf" else values.astype(dtype)
+        np.save(os.path.join(part_dir, f"c{index}.npy"), values)
+
+    ranges, distinct = part_stats(frame, columns)
+    part = {
+        "id": part_id,
+        "path": relative,
+        "soil": soil,
+        "temp_bucket": bucket,
+        "rows": len(frame),
+        "min_row_id": int(frame[ROW_ID].min()),
+        "ranges": ranges,
+        "distinct": distinct,
+    }
+    manifest["parts"].append(part)
+    return part
+
+
+def write_rows(store_dir: str, manifest: dict, frame: pd.DataFrame) -> List[dict]:
+    """Split rows (with row_id) into partitions and write one part per partition."""
+    soils = frame[SOIL_COLUMN].astype(str).str.lower()
+    buckets = np.floor(frame[TEMPERATURE_COLUMN].to_numpy(dtype=float) / manifest["temp_bucket"]).astype(int)
+
+    parts = []
+    for (soil, bucket), rows in frame.groupby([soils, buckets], sort=True):
+        parts.append(write_part(store_dir, manifest, rows, soil, int(bucket)))
+    return parts
+
+
+def build_store(csv_path: str, store_dir: str, temp_bucket: float = DEFAULT_TEMP_BUCKET,
+                chunk_rows: int = BUILD_CHUNK_ROWS) -> dict:
+    """
+    Build a partitioned store from a farmer CSV, reading it in chunks.
+
+    Returns:
+        the manifest
+    """
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.makedirs(store_dir)
+
+    manifest = None
+    row_offset = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        chunk.columns = chunk.columns.str.strip()
+        if manifest is None:
+            manifest = {
+                "version": 1,
+                "columns": {column: str(chunk[column].dtype) for column in chunk.columns},
+                "temp_bucket": temp_bucket,
+                "next_part": 0,
+                "next_row_id": 0,
+                "parts": [],
+            }
+        chunk[ROW_ID] = np.arange(row_offset, row_offset + len(chunk))
+        row_offset += len(chunk)
+        write_rows(store_dir, manifest, chunk)
+
+    manifest["next_row_id"] = row_offset
+    _write_manifest(store_dir, manifest)
+    return manifest
+
+
+class CropStore:
+    """Read access to a partitioned crop store."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self._arrays = {}
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> None:
+        """Re-read the manifest (after parts were added or compacted)."""
+        path = os.path.join(self.store_dir, MANIFEST)
+        self.manifest_mtime = os.stat(path).st_mtime_ns
+        with open(path) as f:
+            manifest = json.load(f)
+        live = {part["path"] for part in manifest["parts"]}
+        with self._lock:
+            self.manifest = manifest
+            self.columns = list(manifest["columns"])
+            self.dtypes = manifest["columns"]
+            self._arrays = {key: value for key, value in self._arrays.items() if key[0] in live}
+
+    def refresh(self) -> bool:
+        """Reload the manifest if another process changed it; returns True if it did."""
+        if os.stat(os.path.join(self.store_dir, MANIFEST)).st_mtime_ns == self.manifest_mtime:
+            return False
+        self.reload()
+        return True
+
+    @property
+    def row_count(self) -> int:
+        return sum(part["rows"] for part in self.manifest["parts"])
+
+    def _column(self, part: dict, name: str) -> np.ndarray:
+        key = (part["path"], name)
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.load(os.path.join(self.store_dir, part["path"], f"{name}.npy"), mmap_mode="r")
+            self._arrays[key] = array
+        return array
+
+    def _values(self, part: dict, column: str) -> np.ndarray:
+        return self._column(part, f"c{self.columns.index(column)}")
+
+    @staticmethod
+    def _may_match(part: dict, soil_type, near, equals) -> bool:
+        if soil_type is not None and part["soil"] != soil_type.lower():
+            return False
+        for column, (center, tolerance) in (near or {}).items():
+            low, high = part["ranges"][column]
+            slack = tolerance + PRUNE_EPSILON * max(1.0, abs(center))
+            if high < center - slack or low > center + slack:
+                return False
+        for column, value in (equals or {}).items():
+            distinct = part["distinct"].get(column)
+            if distinct is not None and value.lower() not in distinct:
+                return False
+        return True
+
+    def parts_for(self, soil_type: Optional[str] = None, near: Optional[dict] = None,
+                  equals: Optional[dict] = None) -> List[dict]:
+        """Parts that may hold matching rows."""
+        return [part for part in self.manifest["parts"] if self._may_match(part, soil_type, near, equals)]
+
+    def scan(self, soil_type: Optional[str] = None, near: Optional[dict] = None,
+             equals: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Matching rows, in source order, indexed by row_id.
+
+        Args:
+            soil_type: soil type (case-insensitive)
+            near: column -> (center, tolerance); keeps rows with abs(value - center) <= tolerance
+            equals: column -> string; keeps rows equal to it (case-insensitive)
+        """
+        row_ids = []
+        selected = {column: [] for column in self.columns}
+
+        for part in self.parts_for(soil_type, near, equals):
+            mask = None
+            for column, (center, tolerance) in (near or {}).items():
+                condition = np.abs(self._values(part, column) - center) <= tolerance
+                mask = condition if mask is None else mask & condition
+            for column, value in (equals or {}).items():
+                condition = np.char.lower(np.asarray(self._values(part, column))) == value.lower()
+                mask = condition if mask is None else mask & condition
+
+            if mask is None:
+                row_ids.append(np.asarray(self._column(part, ROW_ID)))
+                for column in self.columns:
+                    selected[column].append(np.asarray(self._values(part, column)))
+            elif mask.any():
+                row_ids.append(self._column(part, ROW_ID)[mask])
+                for column in self.columns:
+                    selected[column].append(self._values(part, column)[mask])
+
+        if not row_ids:
+            return pd.DataFrame({
+                column: pd.Series([], dtype=dtype if np.dtype(dtype).kind in "iuf" else str)
+                for column, dtype in self.dtypes.items()
+            })
+
+        ids = np.concatenate(row_ids)
+        order = np.argsort(ids, kind="stable")
+        return pd.DataFrame(
+            {column: np.concatenate(values)[order] for column, values in selected.items()},
+            index=pd.Index(ids[order], name=None)
+        )
+
+
+def open_store(store_dir: str, csv_path: str) -> CropStore:
+    """Open the store, building it from the CSV first if it does not exist."""
+    if not os.path.exists(os.path.join(store_dir, MANIFEST)):
+        logger.info("Building crop store in %s from %s", store_dir, csv_path)
+        build_store(csv_path, store_dir)
+    return CropStore(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the partitioned crop store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build a store from a farmer CSV")
+    build.add_argument("--csv", default="data/farmer_data.csv")
+    build.add_argument("--out", default="data/crop_store")
+    build.add_argument("--temp-bucket", type=float, default=DEFAULT_TEMP_BUCKET, help="Temperature bucket width (°C)")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        manifest = build_store(args.csv, args.out, args.temp_bucket)
+        rows = sum(part["rows"] for part in manifest["parts"])
+        print(f"Wrote {rows} rows in {len(manifest['parts'])} parts to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
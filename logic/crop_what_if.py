@@ -0,0 +1,246 @@
+# logic/crop_what_if.py
+
+"""
+Crop What-If Sweeps
+Evaluates recommend_crop's ranking and get_crop_details' overall_score
+over a grid of inputs ("what if I add 20 N?") in one request.
+
+The grid is the product of the varied parameters' values, flattened in
+row-major order (the last parameter varies fastest). Scores for all grid
+points are computed together on the crop arrays (see logic/engine_core.py):
+- points that share a climate share their candidate rows, so the climate
+  filter runs once per distinct climate;
+- NPK distances for a block of points are one matrix, sorted row by row
+  with the same argsort as recommend_crop, so ties resolve identically;
+- the best row for a crop depends only on NPK, so it is found once per
+  distinct NPK value and the remaining scores are array arithmetic.
+
+Every grid point gives the same top crops and score as the single-query
+engines. Without crop arrays (ENGINE_CORE=pandas or the partitioned store)
+the grid is evaluated by calling those engines once per point.
+"""
+
+import os
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from logic import metrics
+from logic import crop_logic
+from logic.engine_core import first_sorted, sorted_prefix, vote
+
+WHAT_IF_PARAMETERS = ("temperature", "humidity", "moisture", "nitrogen", "phosphorous", "potassium")
+WHAT_IF_MAX_POINTS = int(os.getenv("WHAT_IF_MAX_POINTS", "2500"))
+# Cells of a points x rows score matrix computed at once; bounds memory on large datasets
+WHAT_IF_BLOCK_CELLS = int(os.getenv("WHAT_IF_BLOCK_CELLS", "2000000"))
+
+TOP_MATCHES = 15  # rows recommend_crop votes over
+
+
+def _axis_values(name: str, spec: dict) -> List[float]:
+    if spec.get("values") is not None:
+        values = [float(v) for v in spec["values"]]
+    else:
+        start, stop, step = spec.get("start"), spec.get("stop"), spec.get("step", 1.0)
+        if start is None or stop is None:
+            raise ValueError(f"'{name}' needs either 'values' or 'start' and 'stop'")
+        if step is None or step <= 0:
+            raise ValueError(f"'{name}' step must be positive")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if count > WHAT_IF_MAX_POINTS:
+            raise ValueError(f"'{name}' has more than {WHAT_IF_MAX_POINTS} values")
+        # Rounded, so 0.1 steps give 0.3 rather than 0.30000000000000004
+        values = [round(float(start + i * step), 6) for i in range(count)]
+    if not values:
+        raise ValueError(f"'{name}' has no values")
+    return values
+
+
+def what_if_grid(vary: Dict[str, dict]) -> Tuple[List[str], List[List[float]]]:
+    """
+    Varied parameters and the values of each.
+
+    Raises:
+        ValueError: for unknown parameters, empty ranges or too many grid points
+    """
+    if not vary:
+        raise ValueError(f"'vary' must name at least one of: {', '.join(WHAT_IF_PARAMETERS)}")
+    parameters, axes = [], []
+    for name, spec in vary.items():
+        if name not in WHAT_IF_PARAMETERS:
+            raise ValueError(f"Cannot vary '{name}'; expected one of: {', '.join(WHAT_IF_PARAMETERS)}")
+        parameters.append(name)
+        axes.append(_axis_values(name, spec))
+    points = math.prod(len(values) for values in axes)
+    if points > WHAT_IF_MAX_POINTS:
+        raise ValueError(f"Grid has {points} points; at most {WHAT_IF_MAX_POINTS} are allowed")
+    return parameters, axes
+
+
+def _blocks(count: int, row_count: int):
+    size = max(1, WHAT_IF_BLOCK_CELLS // max(row_count, 1))
+    for start in range(0, count, size):
+        yield slice(start, start + size)
+
+
+def _npk_columns(arrays, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    values = arrays.values
+    return values["Nitrogen"][rows], values["Phosphorous"][rows], values["Potassium"][rows]
+
+
+def _npk_distances(columns, points: Dict[str, np.ndarray], ids) -> np.ndarray:
+    """|N - n| + |P - p| + |K - k| for each point in ids (matrix rows) and each data row."""
+    nitrogen, phosphorous, potassium = columns
+    distances = np.abs(nitrogen - points["nitrogen"][ids, None])
+    distances += np.abs(phosphorous - points["phosphorous"][ids, None])
+    distances += np.abs(potassium - points["potassium"][ids, None])
+    return distances
+
+
+def _top_crops(arrays, soil_type: str, points: Dict[str, np.ndarray], limit: int) -> List[List[str]]:
+    """recommend_crop's recommended_crops for every point."""
+    values = arrays.values
+    soil_rows = arrays.group("Soil Type", soil_type.lower())
+    temperature = values["Temperature"][soil_rows]
+    humidity = values["Humidity"][soil_rows]
+    moisture = values["Moisture"][soil_rows]
+    codes = arrays.codes["Crop Type"]
+    names = arrays.names["Crop Type"]
+
+    climate = np.column_stack([points["temperature"], points["humidity"], points["moisture"]])
+    climates, climate_of_point = np.unique(climate, axis=0, return_inverse=True)
+    climate_of_point = climate_of_point.ravel()
+
+    top = [None] * len(climate)
+    for block in _blocks(len(climates), len(soil_rows)):
+        near = (
+            (np.abs(temperature - climates[block, 0, None]) <= 3) &
+            (np.abs(humidity - climates[block, 1, None]) <= 10) &
+            (np.abs(moisture - climates[block, 2, None]) <= 10)
+        )
+        for offset, mask in enumerate(near):
+            matches = soil_rows[mask]
+            if not len(matches):
+                matches = soil_rows
+            point_ids = np.flatnonzero(climate_of_point == block.start + offset)
+            columns = _npk_columns(arrays, matches)
+            for ids in _blocks(len(point_ids), len(matches)):
+                ids = point_ids[ids]
+                scores = _npk_distances(columns, points, ids)
+                if np.isnan(scores).any():
+                    order = np.array([sorted_prefix(row, TOP_MATCHES) for row in scores])
+                else:
+                    # Each row is sorted exactly like recommend_crop's 1-D argsort
+                    order = np.argsort(scores, axis=1, kind="quicksort")[:, :TOP_MATCHES]
+                top_codes = codes[matches[order]]
+                for point, row_codes in zip(ids.tolist(), top_codes):
+                    top[point] = vote(row_codes, names, limit)
+    return top
+
+
+def _overall_scores(arrays, crop_rows: np.ndarray, soil_type: str, points: Dict[str, np.ndarray]) -> np.ndarray:
+    """get_crop_details' overall_score for every point."""
+    values = arrays.values
+    npk = np.column_stack([points["nitrogen"], points["phosphorous"], points["potassium"]])
+    npks, npk_of_point = np.unique(npk, axis=0, return_inverse=True)
+    npk_of_point = npk_of_point.ravel()
+    distinct = {"nitrogen": npks[:, 0], "phosphorous": npks[:, 1], "potassium": npks[:, 2]}
+
+    best = np.empty(len(npks), dtype=np.intp)
+    best_score = np.empty(len(npks))
+    columns = _npk_columns(arrays, crop_rows)
+    for ids in _blocks(len(npks), len(crop_rows)):
+        scores = _npk_distances(columns, distinct, ids)
+        first = np.argmin(scores, axis=1)
+        lowest = scores[np.arange(len(scores)), first]
+        unique = ~np.isnan(lowest) & (np.count_nonzero(scores == lowest[:, None], axis=1) == 1)
+        for row in np.flatnonzero(~unique):
+            first[row] = first_sorted(scores[row])
+        best[ids] = first
+        best_score[ids] = scores[np.arange(len(scores)), first]
+
+    best_rows = crop_rows[best][npk_of_point]
+    npk_score = best_score[npk_of_point]
+    soil_names = [name.lower() if isinstance(name, str) else None for name in arrays.names["Soil Type"]]
+    soil_match = np.array([name == soil_type.lower() for name in soil_names])[arrays.codes["Soil Type"][best_rows]]
+
+    # Same operations, in the same order, as get_crop_details
+    temp_match = np.maximum(0, 100 - (np.abs(values["Temperature"][best_rows] - points["temperature"]) / 3 * 100))
+    humidity_match = np.maximum(0, 100 - (np.abs(values["Humidity"][best_rows] - points["humidity"]) / 10 * 100))
+    moisture_match = np.maximum(0, 100 - (np.abs(values["Moisture"][best_rows] - points["moisture"]) / 10 * 100))
+    npk_match = np.maximum(0, 100 - (npk_score / 150 * 100))
+    overall_score = (
+        temp_match * 0.25 +
+        humidity_match * 0.25 +
+        moisture_match * 0.20 +
+        npk_match * 0.20 +
+        np.where(soil_match, 100, 50) * 0.10
+    )
+    return np.round(overall_score, 1)
+
+
+def crop_what_if(input_data):
+    """
+    Top crops, and optionally one crop's overall score, at every point of
+    a grid around a base input.
+
+    Args:
+        input_data: recommend_crop's input, plus `vary` (parameter ->
+            {"start", "stop", "step"} or {"values"}) and optional `crop_name`
+
+    Returns:
+        dict with the grid (parameters, values, shape), a crop name table,
+        top_crops per point as indexes into it and overall_score per point;
+        get_crop_details' error dict if crop_name is unknown
+
+    Raises:
+        ValueError: if the grid is invalid (see what_if_grid)
+    """
+    parameters, axes = what_if_grid(input_data["vary"])
+    limit = input_data.get("limit", 3)
+    crop_name = input_data.get("crop_name")
+    soil_type = input_data["soil_type"]
+
+    size = math.prod(len(values) for values in axes)
+    points = {name: np.full(size, float(input_data[name])) for name in WHAT_IF_PARAMETERS}
+    for name, grid in zip(parameters, np.meshgrid(*[np.asarray(values, dtype=float) for values in axes], indexing="ij")):
+        points[name] = grid.ravel()
+
+    arrays = crop_logic.crop_arrays()
+    scores = None
+    if arrays is not None:
+        crop_rows = None
+        if crop_name is not None:
+            crop_rows = arrays.group("Crop Type", crop_name.lower())
+            if not len(crop_rows):
+                return crop_logic.get_crop_details(dict(input_data, crop_name=crop_name))
+        with metrics.stage("what_if_rank"):
+            top = _top_crops(arrays, soil_type, points, limit)
+        if crop_rows is not None:
+            with metrics.stage("what_if_scores"):
+                scores = _overall_scores(arrays, crop_rows, soil_type, points).tolist()
+    else:
+        top, scores = [], [] if crop_name is not None else None
+        for point in range(size):
+            query = dict(input_data, limit=limit, **{name: float(points[name][point]) for name in WHAT_IF_PARAMETERS})
+            top.append(crop_logic.recommend_crop(query)["recommended_crops"])
+            if crop_name is not None:
+                details = crop_logic.get_crop_details(dict(query, crop_name=crop_name))
+                if "error" in details:
+                    return details
+                scores.append(float(details["overall_score"]))
+
+    crops = {}
+    top_crops = [[crops.setdefault(name, len(crops)) for name in names] for names in top]
+    result = {
+        "parameters": parameters,
+        "values": axes,
+        "shape": [len(values) for values in axes],
+        "crops": list(crops),
+        "top_crops": top_crops,
+    }
+    if scores is not None:
+        result["crop_name"] = crop_name.lower().capitalize()
+        result["overall_score"] = scores
+    return result
@@ -0,0 +1,234 @@
+# logic/engine_core.py
+
+"""
+NumPy Execution Core
+Plain NumPy arrays and the few primitives the engines need on the hot path,
+so small queries do not pay pandas' per-operation overhead.
+
+pandas is still used to load the datasets (and by offline tooling); each
+engine converts its DataFrame once with ColumnArrays, and appended rows are
+added with ColumnArrays.extend instead of a rebuild. Strings become integer codes plus a name table, and rows
+are pre-grouped by the lowercased value of the columns queries match on.
+
+The primitives reproduce pandas exactly, including the order of ties:
+- sort_values() on one column is np.argsort(kind="quicksort"), which is
+  not stable. The order of equal values depends on the whole array, so a
+  top-k selection (argpartition) cannot reproduce it; sorted_prefix runs
+  the same argsort on the already filtered candidates instead. Crop scores
+  are whole numbers, so the top 15 practically always contain ties.
+- value_counts() orders equal counts by first appearance.
+- sort_values() on several columns is a stable lexsort.
+
+ENGINE_CORE=pandas switches the engines back to their DataFrame code, the
+reference the NumPy core is checked against:
+    ENGINE_CORE=pandas python -m benchmarks.bench_engines --check-golden
+"""
+
+import os
+import copy
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+ENGINE_CORE = os.getenv("ENGINE_CORE", "numpy")  # numpy | pandas
+
+_EMPTY_ROWS = np.empty(0, dtype=np.intp)
+
+
+class ColumnArrays:
+    """
+    Columns of a DataFrame as NumPy arrays.
+
+    Attributes:
+        values: numeric column -> array
+        codes: string column -> int array of positions in names
+        names: string column -> list of names (missing values as NaN)
+        groups: grouped column -> {lowercased name: ascending row positions}
+    """
+
+    def __init__(self, frame: pd.DataFrame, group_by: Sequence[str] = ()):
+        self.rows = len(frame)
+        self.columns = list(frame.columns)
+        self.values: Dict[str, np.ndarray] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.names: Dict[str, List] = {}
+        self.groups: Dict[str, Dict[str, np.ndarray]] = {}
+
+        for column in self.columns:
+            series = frame[column]
+            if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+                self.values[column] = series.to_numpy()
+                continue
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                names = series.cat.categories.tolist()
+            else:
+                codes, uniques = pd.factorize(series)
+                names = uniques.tolist()
+            if (codes < 0).any():
+                codes = np.where(codes < 0, len(names), codes)
+                names = names + [np.nan]
+            self.codes[column] = codes
+            self.names[column] = names
+
+        for column in group_by:
+            self.groups[column] = self._group(column)
+        # Growable copies of the arrays, shared with the arrays extend() returns
+        self._buffers = {}
+
+    def _group(self, column: str) -> Dict[str, np.ndarray]:
+        # Names that differ only in case share a group, as in str.lower() == value
+        lowered = {}
+        name_groups = np.full(len(self.names[column]), -1)
+        for code, name in enumerate(self.names[column]):
+            if isinstance(name, str):
+                name_groups[code] = lowered.setdefault(name.lower(), len(lowered))
+
+        row_groups = name_groups[self.codes[column]]
+        # intp: gathering with other index types converts the index on every query
+        order = np.argsort(row_groups, kind="stable").astype(np.intp)
+        bounds = np.searchsorted(row_groups[order], np.arange(len(lowered) + 1), side="left")
+        return {name: order[bounds[group]:bounds[group + 1]] for name, group in lowered.items()}
+
+    def extend(self, frame: pd.DataFrame) -> "ColumnArrays":
+        """
+        These arrays with the rows of `frame` (same columns) appended.
+
+        Returns a new ColumnArrays; this one is unchanged. Values, codes and
+        group positions are written into spare capacity after the current
+        rows (doubled when full), so appending costs the appended rows, not
+        a rebuild of the whole dataset.
+        """
+        extended = copy.copy(self)
+        extended.rows = self.rows + len(frame)
+        extended.values = dict(self.values)
+        extended.codes = dict(self.codes)
+        extended.names = dict(self.names)
+        extended.groups = dict(self.groups)
+
+        for column, values in self.values.items():
+            extended.values[column] = _appended(self._buffers, ("values", column), values, frame[column].to_numpy())
+
+        for column, codes in self.codes.items():
+            names = list(self.names[column])
+            code_of = {name: code for code, name in enumerate(names) if isinstance(name, str)}
+            missing = next((code for code, name in enumerate(names) if not isinstance(name, str)), None)
+            new_codes = np.empty(len(frame), dtype=np.intp)
+            for i, name in enumerate(frame[column].tolist()):
+                if not isinstance(name, str):
+                    if missing is None:
+                        missing = len(names)
+                        names.append(np.nan)
+                    new_codes[i] = missing
+                    continue
+                code = code_of.get(name)
+                if code is None:
+                    code = code_of[name] = len(names)
+                    names.append(name)
+                new_codes[i] = code
+            extended.codes[column] = _appended(self._buffers, ("codes", column), codes, new_codes)
+            extended.names[column] = names
+
+            if column in self.groups:
+                groups = extended.groups[column] = dict(self.groups[column])
+                lowered = np.array([name.lower() if isinstance(name, str) else "" for name in names], dtype=object)
+                new_lowered = lowered[new_codes]
+                for name in dict.fromkeys(new_lowered.tolist()):
+                    if not name:
+                        continue
+                    positions = self.rows + np.flatnonzero(new_lowered == name).astype(np.intp)
+                    groups[name] = _appended(
+                        self._buffers, ("groups", column, name), groups.get(name, _EMPTY_ROWS), positions
+                    )
+        return extended
+
+    def group(self, column: str, lowered: str) -> np.ndarray:
+        """Row positions whose value lowercases to `lowered`, in dataset order."""
+        return self.groups[column].get(lowered, _EMPTY_ROWS)
+
+    def row(self, position: int) -> dict:
+        """One row as column -> value, like DataFrame.iloc[position]."""
+        row = {}
+        for column in self.columns:
+            if column in self.values:
+                row[column] = self.values[column][position]
+            else:
+                row[column] = self.names[column][self.codes[column][position]]
+        return row
+
+
+def _appended(buffers: dict, key, current: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """
+    `current` followed by `new`. Written in place after `current` when it is
+    the used part of its buffer and there is room; otherwise copied into a
+    buffer twice the size. Views handed out earlier never change.
+    """
+    size = len(current) + len(new)
+    dtype = np.result_type(current, new)
+    buffer, used = buffers.get(key, (None, 0))
+    if (buffer is None or current.base is not buffer or used != len(current)
+            or buffer.dtype != dtype or len(buffer) < size):
+        buffer = np.empty(max(2 * size, 16), dtype=dtype)
+        buffer[:len(current)] = current
+    buffer[len(current):size] = new
+    buffers[key] = (buffer, size)
+    return buffer[:size]
+
+
+def sorted_prefix(values: np.ndarray, count: int) -> np.ndarray:
+    """Positions of the first `count` values in pandas sort_values() order."""
+    missing = np.isnan(values)
+    if missing.any():
+        # pandas sorts the non-missing values on their own, then appends the missing ones
+        present = np.flatnonzero(~missing)
+        order = present[np.argsort(values[present], kind="quicksort")]
+        return np.concatenate([order, np.flatnonzero(missing)])[:count]
+    return np.argsort(values, kind="quicksort")[:count]
+
+
+def first_sorted(values: np.ndarray) -> int:
+    """Position of the first value in pandas sort_values() order."""
+    position = int(np.argmin(values))
+    if not np.isnan(values[position]) and np.count_nonzero(values == values[position]) == 1:
+        return position
+    return int(sorted_prefix(values, 1)[0])
+
+
+def vote(codes: np.ndarray, names: List, limit: int) -> List[str]:
+    """Names by descending count, like value_counts().head(limit).index.tolist() on str values."""
+    counts = np.bincount(codes, minlength=len(names)).tolist()
+    # Python's sort is stable: equal counts keep first-appearance order, as in value_counts
+    ranked = sorted(dict.fromkeys(codes.tolist()), key=lambda code: -counts[code])
+    return [str(names[code]) for code in ranked][:limit]
+
+
+def descending_order(primary: np.ndarray, secondary: np.ndarray) -> np.ndarray:
+    """
+    Row positions sorted by primary, then secondary, both descending, ties
+    in row order; same as sort_values(by=[primary, secondary], ascending=False).
+    """
+    return np.lexsort((-secondary.astype(float), -primary.astype(float)))
+
+
+def first_occurrences(positions: np.ndarray, codes: np.ndarray, limit: int = None) -> np.ndarray:
+    """
+    Positions whose code was not seen earlier in `positions`, like
+    drop_duplicates().head(limit); stops scanning once `limit` are found.
+    """
+    if limit is None or limit < 0:
+        _, first = np.unique(codes[positions], return_index=True)
+        return positions[np.sort(first)][:limit]
+
+    found = {}
+    start, chunk = 0, 256
+    while len(found) < limit and start < len(positions):
+        block = positions[start:start + chunk]
+        for position, code in zip(block.tolist(), codes[block].tolist()):
+            if code not in found:
+                found[code] = position
+                if len(found) == limit:
+                    break
+        start += chunk
+        chunk *= 4
+    return np.array(list(found.values()), dtype=np.intp)
@@ -0,0 +1,111 @@
+# logic/executors.py
+
+"""
+Execution Layer
+Dispatches CPU-heavy scoring work to a process pool.
+
+The pandas code behind the crop and nutrition engines holds the GIL, so on
+a multi-core host threads cannot run it in parallel. Batches at or above
+CPU_POOL_MIN_BATCH items are split into chunks and scored in worker
+processes; smaller requests stay in the calling thread, where the IPC
+round-trip would cost more than it saves.
+
+Workers are forked from the server process after the datasets have been
+loaded, so they start with the DataFrames already in memory and share
+their numeric buffers with the parent copy-on-write instead of re-reading
+the CSV files.
+
+The pool is opt-in: CPU_POOL_WORKERS defaults to 1 (no pool). Setting it
+above 1 takes precedence over STARTUP_PRELOAD for the crop and nutrition
+engines, which are then loaded before the server accepts requests, in
+every uvicorn worker; the other subsystems still follow STARTUP_PRELOAD.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from logic import metrics
+
+CPU_POOL_WORKERS = int(os.getenv("CPU_POOL_WORKERS", "1"))  # > 1 enables the pool
+CPU_POOL_MIN_BATCH = int(os.getenv("CPU_POOL_MIN_BATCH", "32"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker() -> None:
+    """Make sure the engines (and their datasets) are loaded in the worker."""
+    import logic.crop_logic  # noqa: F401
+    import logic.nutrition_logic  # noqa: F401
+
+
+def _run_chunk(func: Callable[[Dict[str, Any]], Any], chunk: List[Dict[str, Any]]) -> List[Any]:
+    return [func(item) for item in chunk]
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def start_cpu_pool() -> None:
+    """
+    Create the process pool and launch its workers.
+
+    Call this at startup, before background threads are started, so the
+    workers are forked from a process that holds no locks.
+    """
+    global _pool
+
+    if CPU_POOL_WORKERS <= 1:
+        return
+
+    with _pool_lock:
+        if _pool is not None:
+            return
+
+        _init_worker()
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        _pool = ProcessPoolExecutor(max_workers=CPU_POOL_WORKERS, mp_context=context, initializer=_init_worker)
+        # Forked pools launch every worker on the first submit
+        _pool.submit(_ping).result()
+
+
+def stop_cpu_pool() -> None:
+    """Shut the process pool down."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def run_batch(func: Callable[[Dict[str, Any]], Any], items: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Apply an engine function to every item, in order.
+
+    Args:
+        func: module-level engine function (e.g. recommend_crop)
+        items: input dicts
+
+    Returns:
+        list of results, one per item
+    """
+    pool = _pool
+    if pool is None or len(items) < CPU_POOL_MIN_BATCH:
+        metrics.inc("cpu_batch_items_total", len(items), executor="thread")
+        return [func(item) for item in items]
+
+    # A few chunks per worker keeps them busy when item costs differ
+    chunk_size = max(1, -(-len(items) // (CPU_POOL_WORKERS * 4)))
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+    metrics.inc("cpu_batch_items_total", len(items), executor="process")
+    results = []
+    for chunk_result in pool.map(_run_chunk, [func] * len(chunks), chunks):
+        results.extend(chunk_result)
+    return results
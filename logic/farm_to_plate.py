@@ -0,0 +1,283 @@
+# logic/farm_to_plate.py
+
+"""
+Farm to Plate
+Crops to grow and the household diet they enable, in one request.
+
+recommend_crop, nutrition_plan and the regional advisories describe crops,
+foods and deficiencies by name, in different vocabularies ("Paddy", "White
+Rice (1 cup cooked)", "Rice (Fortified)"). Joining them means matching
+names across datasets, so it is done once, at import, into CropIndex:
+
+- crop -> category, from categorize_crops (CROP_CATEGORIES covers the
+  dataset's group names and the advisories' vegetables it does not know);
+- crop -> consumer foods made from it: the foods whose name, before the
+  serving size, is listed for the crop in CROP_FOODS, kept as positions
+  in nutrition_plan's ranking order. Condiments and garnish-sized
+  servings ("Sage (in beans)", "Lime Wedge (garnish)") are left out;
+- region -> the deficiencies and recommended crops of its advisory. The
+  recommended crops are compared with the advisory's by canonical name
+  (CROP_ALIASES, CROP_FAMILIES), so "Paddy" counts as the advisory's
+  "Rice" and "Pulses" as its "Lentil". The consumer data has no
+  micronutrient columns, so no per-crop deficiency claims are made.
+
+A request is then dict lookups and array indexing: the recommended crops'
+food positions are merged, filtered with the user's profile mask (see
+nutrition_logic.profile_mask) and cut at the first distinct names. Crops
+that first appear later (ingested observations) are indexed on first use.
+"""
+
+import re
+import threading
+from typing import List
+
+import numpy as np
+
+from logic import metrics
+from logic import crop_logic
+from logic import nutrition_logic
+from logic.nutrition_advisory import REGIONAL_NUTRITION_DATA, DEFAULT_ADVISORY
+from logic.compact_data import lower_equals
+from logic.engine_core import ColumnArrays, descending_order, first_occurrences
+
+# Crop names that refer to the same crop as another entry, for food matching
+CROP_ALIASES = {
+    "paddy": "rice",
+    "rice (fortified)": "rice",
+    "corn": "maize",
+    "ground nuts": "groundnut",
+    "peanut": "groundnut",
+    "millets": "millet",
+    "pearl millet": "millet",
+    "finger millet": "millet",
+    "bajra": "millet",
+    "soybean": "oil seeds",
+}
+
+# Crop names that cover several of the advisories' crops
+CROP_FAMILIES = {
+    "pulses": {"lentil", "chickpea"},
+}
+
+# Categories for crop names categorize_crops does not know
+CROP_CATEGORIES = {
+    "millets": "Cereal", "pearl millet": "Cereal", "finger millet": "Cereal", "bajra": "Cereal",
+    "rice (fortified)": "Cereal",
+    "pulses": "Pulse",
+    "ground nuts": "Oilseed", "oil seeds": "Oilseed",
+    "spinach": "Vegetable", "amaranth": "Vegetable", "fenugreek": "Vegetable",
+    "mustard greens": "Vegetable", "carrot": "Vegetable", "radish": "Vegetable",
+    "cucumber": "Vegetable", "beans": "Vegetable", "cluster beans": "Vegetable",
+}
+
+# Consumer foods made from each crop, by food name without the serving size
+# ("White Rice" for "White Rice (1 cup cooked)"). Curated rather than matched
+# on keywords, which also catch drinks and dishes where the crop is a minor
+# ingredient; only vegetarian foods are listed, profile_mask applies the rest
+# of the household's diet. Crops not listed (barley, millets, sugarcane,
+# amaranth, ...) have no foods in the nutrition dataset.
+CROP_FOODS = {
+    "rice": ["White Rice", "Brown Rice", "Jasmine Rice", "Yellow Rice", "Congee", "Risotto", "Risotto alla Milanese"],
+    "wheat": ["Whole Wheat Toast", "White Bread", "French Bread", "Pita Bread", "Naan Bread", "Bagel", "Baguette",
+              "English Muffin", "Crackers", "Spaghetti", "Bulgur", "Tabouli", "Seitan"],
+    "maize": ["Corn", "Corn on the Cob", "Corn Tortilla", "Polenta", "Grits", "Popcorn", "Corn Flakes"],
+    "pulses": ["Lentil Soup", "Split Pea Soup", "Black Beans", "White Beans", "Refried Beans", "Chickpeas", "Hummus",
+               "Falafel", "Green Peas"],
+    "lentil": ["Lentil Soup"],
+    "chickpea": ["Chickpeas", "Hummus", "Falafel", "Hummus Wrap"],
+    "groundnut": ["Peanut Butter"],
+    "oil seeds": ["Tofu", "Tofu Scramble", "Tofu Stir-fry", "Tempeh", "Edamame", "Soy Milk", "Soyrizo"],
+    "spinach": ["Creamed Spinach"],
+    "carrot": ["Carrot Sticks"],
+    "tomato": ["Tomato", "Tomato Soup", "Gazpacho"],
+    "cucumber": ["Cucumber", "Cucumber Slices", "Cucumber Salad"],
+    "radish": ["Pickled Radish"],
+    "beans": ["Green Beans"],
+}
+
+# Foods never joined to a crop: condiments (Category "Condiment", "Condiment/Dairy", ...)
+# and servings that are a garnish or an ingredient of another dish
+EXCLUDED_CATEGORY_PREFIX = "condiment"
+GARNISH_SERVING = re.compile(r"\b(?:garnish|filling|topping|dipping|dash|pinch)\b|\bin (?!pod\b)", re.IGNORECASE)
+
+# Crops grown for fiber or leaf, not food
+NON_FOOD_CROPS = {"cotton", "tobacco", "jute"}
+
+FOODS_PER_CROP = 3
+
+
+class CropIndex:
+    """Crops joined to their category and consumer foods, and the regional advisories."""
+
+    def __init__(self, frame, arrays: ColumnArrays = None, crops: List[str] = ()):
+        if arrays is None:
+            arrays = ColumnArrays(frame[["Food_Item", "Category", "Protein (g)", "Calories (kcal)"]])
+        self.arrays = arrays
+        # nutrition_plan's ranking; crops keep their foods as positions in it
+        self.rank_order = descending_order(arrays.values["Protein (g)"], arrays.values["Calories (kcal)"])
+        rank_of_row = np.empty(len(self.rank_order), dtype=np.intp)
+        rank_of_row[self.rank_order] = np.arange(len(self.rank_order))
+        self._rank_of_row = rank_of_row
+
+        # Food name without the serving size, and whether the serving is a garnish
+        self._food_names, garnish = [], []
+        for name in arrays.names["Food_Item"]:
+            base, _, serving = name.partition(" (") if isinstance(name, str) else ("", "", "")
+            self._food_names.append(base.strip().lower())
+            garnish.append(bool(GARNISH_SERVING.search(serving)))
+        condiment = np.array([
+            isinstance(name, str) and name.lower().startswith(EXCLUDED_CATEGORY_PREFIX)
+            for name in arrays.names["Category"]
+        ], dtype=bool)
+        self._joinable = ~np.array(garnish, dtype=bool)[arrays.codes["Food_Item"]] & ~condiment[arrays.codes["Category"]]
+        self._foods = {}
+        self._lock = threading.Lock()
+        self.crops = {}
+
+        self.regions = {}
+        for region, advisory in list(REGIONAL_NUTRITION_DATA.items()) + [(None, DEFAULT_ADVISORY)]:
+            self.regions[region] = {
+                "deficiencies": list(advisory["deficiencies"]),
+                "crops": [(crop, self.entry(crop)["kinds"]) for crop in advisory["recommended_crops"]],
+            }
+        for crop in crops:
+            self.entry(crop)
+
+    def _food_ranks(self, crop: str) -> np.ndarray:
+        """Ranking positions of the foods made from a crop, in ranking order."""
+        ranks = self._foods.get(crop)
+        if ranks is None:
+            foods = {food.lower() for food in CROP_FOODS.get(crop, ())}
+            codes = [code for code, name in enumerate(self._food_names) if name in foods]
+            rows = np.flatnonzero(np.isin(self.arrays.codes["Food_Item"], codes) & self._joinable)
+            ranks = np.sort(self._rank_of_row[rows])
+            ranks.flags.writeable = False
+            self._foods[crop] = ranks
+        return ranks
+
+    def entry(self, crop_name: str) -> dict:
+        """Index entry of a crop, built on first use."""
+        key = crop_name.strip().lower()
+        found = self.crops.get(key)
+        if found is not None:
+            return found
+        with self._lock:
+            found = self.crops.get(key)
+            if found is None:
+                canonical = CROP_ALIASES.get(key, key)
+                category = crop_logic.categorize_crops([key])[key]
+                if category == "Other":
+                    category = CROP_CATEGORIES.get(key, crop_logic.categorize_crops([canonical])[canonical])
+                foods = self._food_ranks(canonical)
+                if key in NON_FOOD_CROPS:
+                    note = "Not grown for food"
+                elif not len(foods):
+                    note = "No foods made from this crop in the nutrition dataset"
+                else:
+                    note = None
+                found = self.crops[key] = {
+                    "category": category,
+                    "foods": foods,
+                    "kinds": frozenset({canonical} | CROP_FAMILIES.get(canonical, set())),
+                    "note": note,
+                }
+        return found
+
+    def has_soil(self, soil_type: str) -> bool:
+        """
+        Whether the crop data, including ingested observations, has the soil
+        type (case-insensitive). The partitioned store answers from its
+        manifest, without reading rows.
+        """
+        arrays = crop_logic.crop_arrays()  # also merges ingested observations
+        if arrays is not None:
+            return len(arrays.group("Soil Type", soil_type.lower())) > 0
+        if crop_logic.store is not None:
+            return bool(crop_logic.store.parts_for(soil_type))
+        return any(
+            lower_equals(frame["Soil Type"], soil_type.lower()).any() for frame in (crop_logic.df, crop_logic.delta)
+        )
+
+    def region(self, region: str) -> dict:
+        """Deficiencies and advisory crops of a region; the national default for unknown regions."""
+        return self.regions.get(region.strip().lower(), self.regions[None])
+
+    def foods(self, ranks: np.ndarray, keep: np.ndarray, limit: int) -> List[str]:
+        """First `limit` distinct food names at the given ranking positions that pass `keep`."""
+        rows = self.rank_order[ranks]
+        rows = rows[keep[rows]]
+        codes = self.arrays.codes["Food_Item"]
+        names = self.arrays.names["Food_Item"]
+        return [names[code] for code in codes[first_occurrences(rows, codes, limit)].tolist()]
+
+
+def _dataset_crops() -> List[str]:
+    arrays = crop_logic.crop_arrays()
+    if arrays is not None:
+        return [name for name in arrays.names["Crop Type"] if isinstance(name, str)]
+    if crop_logic.df is not None:
+        return crop_logic.df["Crop Type"].dropna().astype(str).unique().tolist()
+    return []
+
+
+index = CropIndex(nutrition_logic.df, nutrition_logic.arrays, _dataset_crops())
+
+
+def farm_to_plate(input_data):
+    """
+    Crops recommended for a farm and the household diet they enable.
+
+    Args:
+        input_data: recommend_crop's input, the household's age, bmi,
+            condition and diet, and optional `region` and `food_limit`
+
+    Returns:
+        dict with each recommended crop's category and its foods that fit
+        the household, the combined household diet, the diversity score,
+        and with a region, its advisory's deficiencies and crops: those
+        the recommendation already includes and the ones to add
+
+    Raises:
+        ValueError: if the soil type is not in the crop data
+    """
+    if not index.has_soil(input_data["soil_type"]):
+        raise ValueError(f"Unknown soil type '{input_data['soil_type']}'")
+    recommendation = crop_logic.recommend_crop(input_data)
+    food_limit = input_data.get("food_limit", 4)
+    region = input_data.get("region")
+
+    with metrics.stage("farm_to_plate_join"):
+        keep = nutrition_logic.profile_mask(
+            input_data["age"], input_data["bmi"], input_data["condition"], input_data["diet"]
+        )
+        regional = index.region(region) if region else None
+
+        crops, ranks, kinds = [], [], set()
+        for crop in recommendation["recommended_crops"]:
+            entry = index.entry(crop)
+            ranks.append(entry["foods"])
+            kinds.update(entry["kinds"])
+            crops.append({
+                "crop": crop,
+                "category": entry["category"],
+                "foods": index.foods(entry["foods"], keep, FOODS_PER_CROP),
+                "note": entry["note"],
+            })
+        household_diet = index.foods(np.unique(np.concatenate(ranks)) if ranks else np.empty(0, dtype=np.intp),
+                                     keep, food_limit)
+
+    result = {
+        "crops": crops,
+        "household_diet": household_diet,
+        "shown": food_limit,
+        "diversity_score": recommendation["diversity_score"],
+        "note": "Foods made from the recommended crops that fit the household's age, BMI, health condition, and diet",
+    }
+    if regional is not None:
+        result["region"] = {
+            "region": region.title(),
+            "deficiencies": list(regional["deficiencies"]),
+            "advisory_crops_grown": [crop for crop, crop_kinds in regional["crops"] if crop_kinds & kinds],
+            "suggested_crops": [crop for crop, crop_kinds in regional["crops"] if not crop_kinds & kinds],
+        }
+    return result
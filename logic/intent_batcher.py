@@ -0,0 +1,151 @@
+# logic/intent_batcher.py
+
+"""
+Micro-Batching Scheduler
+Collects concurrent intent classification requests for a short window and
+classifies them with a single LLM call.
+
+The window adapts to the observed arrival rate: when requests arrive slower
+than one per window, they are dispatched immediately so low-load latency is
+unchanged; under load the scheduler waits just long enough to fill a batch.
+Questions of different LLM priorities (interactive, bulk) are never batched
+together, and each batch is classified at its questions' priority.
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from logic import metrics
+from logic.llm_backend import llm_priority
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """A question waiting for its classification."""
+
+    def __init__(self, question: str):
+        self.question = question
+        # LLM priority of the caller; batches only mix questions of one priority
+        self.priority = llm_priority.get()
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+
+
+class IntentBatcher:
+    """
+    Batch classify calls.
+
+    Args:
+        classify_batch: function(list of questions) -> list of intents, one LLM call
+        max_batch: maximum questions per batch
+        max_wait_ms: upper bound on how long the first question of a batch waits
+        workers: number of batches that may be in flight at once
+        rate_window_s: time constant of the arrival-rate estimate
+    """
+
+    def __init__(
+        self,
+        classify_batch: Callable[[List[str]], List[str]],
+        max_batch: int = 16,
+        max_wait_ms: float = 10,
+        workers: int = 4,
+        rate_window_s: float = 1.0
+    ):
+        self.classify_batch = classify_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="intent-batch")
+
+        # Exponentially decaying arrival rate (questions per second) as of last_arrival
+        self.rate_window = max(rate_window_s, 1e-3)
+        self.rate = 0.0
+        self.last_arrival = None
+
+        self.thread = threading.Thread(target=self._run, name="intent-batcher", daemon=True)
+        self.thread.start()
+
+    def classify(self, question: str) -> str:
+        """Queue a question and block until its batch has been classified."""
+        item = _Pending(question)
+
+        with self.cond:
+            self._observe_arrival(item.enqueued)
+            self.queue.append(item)
+            self.cond.notify()
+
+        item.done.wait()
+        return item.result
+
+    def _rate_at(self, now: float) -> float:
+        # Decays with elapsed time, not per arrival: after an idle gap of a few
+        # rate windows the estimate is near zero, whatever the burst before it
+        if self.last_arrival is None:
+            return 0.0
+        return self.rate * math.exp(-max(now - self.last_arrival, 0.0) / self.rate_window)
+
+    def _observe_arrival(self, now: float) -> None:
+        # Each arrival adds 1/window; at a steady rate the sum settles at that rate
+        self.rate = self._rate_at(now) + 1 / self.rate_window
+        self.last_arrival = now
+
+    def current_window(self) -> float:
+        """Seconds the scheduler should wait for more questions."""
+        rate = self._rate_at(time.monotonic())
+        if rate * self.max_wait < 1:
+            return 0.0
+        return min(self.max_wait, (self.max_batch - 1) / rate)
+
+    def _run(self) -> None:
+        while True:
+            with self.cond:
+                while not self.queue:
+                    self.cond.wait()
+
+                deadline = self.queue[0].enqueued + self.current_window()
+                while len(self.queue) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+
+                priority = self.queue[0].priority
+                batch, rest = [], deque()
+                while self.queue:
+                    item = self.queue.popleft()
+                    if item.priority == priority and len(batch) < self.max_batch:
+                        batch.append(item)
+                    else:
+                        rest.append(item)
+                self.queue = rest
+
+            self.executor.submit(self._dispatch, batch, priority)
+
+    def _dispatch(self, batch: List[_Pending], priority: str) -> None:
+        metrics.inc("intent_batches_total")
+        metrics.inc("intent_batched_questions_total", len(batch))
+
+        # Executor threads do not inherit the callers' context
+        token = llm_priority.set(priority)
+        try:
+            intents = self.classify_batch([item.question for item in batch])
+        except Exception as e:
+            logger.warning("Batched intent classification error: %s", e)
+            intents = ['general'] * len(batch)
+        finally:
+            llm_priority.reset(token)
+
+        if len(intents) != len(batch):
+            intents = ['general'] * len(batch)
+
+        for item, intent in zip(batch, intents):
+            item.result = intent
+            item.done.set()
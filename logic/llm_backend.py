@@ -0,0 +1,351 @@
+# logic/llm_backend.py
+
+"""
+LLM Backend Providers
+Pluggable text-generation backends used by the AI question pipeline.
+
+The backend is selected with the LLM_BACKEND environment variable:
+- "gemini" (default): Google Gemini through google.generativeai
+- "stub": local deterministic backend for offline runs and load testing
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from logic import metrics
+
+load_dotenv()
+
+
+class LLMBackend(ABC):
+    """Interface every backend implements."""
+
+    name = "base"
+
+    @abstractmethod
+    def generate(self, prompt: str, task: str = "generate") -> str:
+        """
+        Generate a text completion for a prompt.
+
+        Args:
+            prompt: Full prompt text
+            task: Pipeline step issuing the call (e.g. "classify_intent").
+                  Backends may use it for routing or accounting.
+
+        Returns:
+            str: Raw model output text
+        """
+
+    def warm_up(self) -> None:
+        """Open connections ahead of the first call, without generating anything."""
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini backend."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY must be set in environment variables")
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name or os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+
+    def warm_up(self) -> None:
+        # Token counting goes through the same client as generate_content and is not billed
+        self.model.count_tokens("ping")
+
+    def generate(self, prompt: str, task: str = "generate") -> str:
+        response = self.model.generate_content(prompt)
+        return response.text
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for a piece of text.
+
+    Uses the common ~4 characters per token heuristic for English text,
+    counting non-ASCII characters (symbols, Indic scripts) as one token each.
+    """
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+# Keywords used by the stub to imitate the Gemini prompts in ask_ai_logic
+STUB_EXPLANATION_WORDS = ["why", "how", "explain", "details", "tell me about", "what is"]
+STUB_CROP_WORDS = ["crop", "grow", "farm", "plant", "sow", "harvest", "soil", "field"]
+STUB_NUTRITION_WORDS = [
+    "diet", "food", "eat", "nutrition", "meal", "anemia", "anaemia", "diabetes",
+    "deficiency", "hypertension", "protein", "weight"
+]
+STUB_CONDITIONS = [
+    "iron deficiency", "anemia", "anaemia", "diabetes", "hypertension",
+    "obesity", "malnutrition", "vitamin a deficiency", "zinc deficiency"
+]
+STUB_SUBJECTS = [
+    "rice", "paddy", "wheat", "maize", "barley", "millets", "cotton", "sugarcane",
+    "tobacco", "pulses", "ground nuts", "oil seeds", "spinach", "lentil", "chickpea"
+]
+
+
+def parse_latency_spec(spec: str):
+    """
+    Parse a latency distribution spec (milliseconds) into a sampler.
+
+    Supported forms:
+        "0" or "fixed:50"          - constant latency
+        "uniform:20:80"            - uniform between min and max
+        "normal:60:15"             - normal with mean and stddev (clipped at 0)
+        "lognormal:60:0.5"         - lognormal with median and sigma
+
+    Returns:
+        callable(random.Random) -> latency in seconds
+    """
+    parts = spec.strip().lower().split(":")
+    kind = parts[0]
+
+    try:
+        if len(parts) == 1:
+            value = float(kind)
+            return lambda rng: value / 1000
+        args = [float(p) for p in parts[1:]]
+    except ValueError:
+        raise ValueError(f"Invalid LLM_STUB_LATENCY spec: '{spec}'")
+
+    if kind == "fixed" and len(args) == 1:
+        return lambda rng: args[0] / 1000
+    if kind == "uniform" and len(args) == 2:
+        return lambda rng: rng.uniform(args[0], args[1]) / 1000
+    if kind == "normal" and len(args) == 2:
+        return lambda rng: max(0.0, rng.gauss(args[0], args[1])) / 1000
+    if kind == "lognormal" and len(args) == 2:
+        mu = math.log(args[0]) if args[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, args[1]) / 1000
+
+    raise ValueError(f"Invalid LLM_STUB_LATENCY spec: '{spec}'")
+
+
+class StubBackend(LLMBackend):
+    """
+    Local deterministic backend.
+
+    Imitates the Gemini calls made by the pipeline with rule-based outputs,
+    so the rest of the system can be exercised without a network.
+
+    Environment:
+        LLM_STUB_LATENCY: latency distribution spec (see parse_latency_spec), default "0"
+        LLM_STUB_SEED: seed for latency/error sampling, default 0
+        LLM_STUB_ERROR_RATE: fraction of calls that raise, default 0
+        LLM_STUB_RESPONSES: optional JSON file mapping task name -> canned output
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        latency: Optional[str] = None,
+        seed: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        responses: Optional[Dict[str, str]] = None
+    ):
+        self.sample_latency = parse_latency_spec(latency or os.getenv("LLM_STUB_LATENCY", "0"))
+        self.rng = random.Random(seed if seed is not None else int(os.getenv("LLM_STUB_SEED", "0")))
+        self.error_rate = error_rate if error_rate is not None else float(os.getenv("LLM_STUB_ERROR_RATE", "0"))
+        self.lock = threading.Lock()
+
+        if responses is None:
+            responses = {}
+            responses_path = os.getenv("LLM_STUB_RESPONSES")
+            if responses_path:
+                with open(responses_path) as f:
+                    responses = json.load(f)
+        self.responses = responses
+
+    def generate(self, prompt: str, task: str = "generate") -> str:
+        with self.lock:
+            delay = self.sample_latency(self.rng)
+            fail = self.error_rate > 0 and self.rng.random() < self.error_rate
+
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError("Stub LLM backend simulated failure")
+
+        if task in self.responses:
+            return self.responses[task]
+
+        question = extract_prompt_question(prompt).lower()
+
+        if task == "classify_intent":
+            return stub_classify(question)
+        if task == "classify_intent_batch":
+            questions = [json.loads(q).lower() for q in re.findall(r'^\d+\. (".*")$', prompt, re.M)]
+            return json.dumps([stub_classify(q) for q in questions])
+        if task == "extract_health_condition":
+            return next((c for c in STUB_CONDITIONS if c in question), "general")
+        if task == "extract_subject":
+            return next((s.title() for s in STUB_SUBJECTS if s in question), "none")
+        if task == "format_response":
+            return stub_answer(prompt)
+
+        return "OK"
+
+
+def extract_prompt_question(prompt: str) -> str:
+    """Pull the quoted user question out of a pipeline prompt."""
+    match = re.search(r'Question: "(.*)"', prompt)
+    return match.group(1) if match else ""
+
+
+def contains_word(text: str, words) -> bool:
+    """True if any of the words starts a word in text."""
+    return any(re.search(r"\b" + re.escape(word), text) for word in words)
+
+
+def stub_classify(question: str) -> str:
+    """Keyword-based imitation of the intent classification prompt."""
+    if contains_word(question, STUB_EXPLANATION_WORDS):
+        return "explanation"
+    if contains_word(question, STUB_CROP_WORDS):
+        return "crop_recommendation"
+    if contains_word(question, STUB_NUTRITION_WORDS):
+        return "nutrition_recommendation"
+    return "general"
+
+
+def stub_answer(prompt: str) -> str:
+    """Deterministic friendly answer built from the prompt's data block."""
+    intent_match = re.search(r"Intent: (\w+)", prompt)
+    intent = intent_match.group(1) if intent_match else "general"
+
+    names = re.findall(r'"(?:crop_name|food_name)":\s*"([^"]+)"', prompt)
+    lists = re.findall(r'"recommended_(?:crops|foods)":\s*\[([^\]]*)\]', prompt)
+    if lists:
+        names = re.findall(r'"([^"]+)"', lists[0])
+
+    if names:
+        return f"Here is what I found for your {intent.replace('_', ' ')} question: {', '.join(names[:3])}. These match the details you shared."
+    return "Hello! I can help you with crop recommendations, nutrition advice, or explain details about crops and foods."
+
+
+# Priority of LLM calls made from the current thread/task:
+# "interactive" for request handlers, "bulk" for background jobs
+llm_priority = contextvars.ContextVar("llm_priority", default="interactive")
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_BULK_MAX_CONCURRENCY = int(os.getenv("LLM_BULK_MAX_CONCURRENCY", "4"))
+
+
+class PriorityLimiter:
+    """
+    Bound concurrent LLM calls, giving interactive calls precedence.
+
+    At most `limit` calls run at once. Bulk calls are further limited to
+    `bulk_limit` and only start when no interactive call is waiting.
+    """
+
+    def __init__(self, limit: int, bulk_limit: int):
+        self.limit = max(1, limit)
+        self.bulk_limit = max(1, min(bulk_limit, self.limit))
+        self.active = 0
+        self.active_bulk = 0
+        self.waiting_interactive = 0
+        self.cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, priority: str):
+        bulk = priority == "bulk"
+
+        with self.cond:
+            if bulk:
+                while (self.active >= self.limit or self.active_bulk >= self.bulk_limit
+                       or self.waiting_interactive > 0):
+                    self.cond.wait()
+                self.active_bulk += 1
+            else:
+                self.waiting_interactive += 1
+                while self.active >= self.limit:
+                    self.cond.wait()
+                self.waiting_interactive -= 1
+            self.active += 1
+
+        try:
+            yield
+        finally:
+            with self.cond:
+                self.active -= 1
+                if bulk:
+                    self.active_bulk -= 1
+                self.cond.notify_all()
+
+
+class LimitedBackend(LLMBackend):
+    """Wrap a backend so every call goes through a PriorityLimiter."""
+
+    def __init__(self, backend: LLMBackend, limiter: PriorityLimiter):
+        self.backend = backend
+        self.limiter = limiter
+        self.name = backend.name
+
+    def generate(self, prompt: str, task: str = "generate") -> str:
+        with self.limiter.slot(llm_priority.get()):
+            with metrics.stage(f"llm_{task}"):
+                return self.backend.generate(prompt, task=task)
+
+    def warm_up(self) -> None:
+        self.backend.warm_up()
+
+
+LLM_BACKENDS = {
+    "gemini": GeminiBackend,
+    "stub": StubBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_llm_backend() -> LLMBackend:
+    """
+    Return the process-wide LLM backend, creating it on first use.
+
+    The backend is created lazily so that importing the pipeline never
+    requires network credentials.
+    """
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = os.getenv("LLM_BACKEND", "gemini").strip().lower()
+                if name not in LLM_BACKENDS:
+                    raise ValueError(f"Unknown LLM_BACKEND '{name}'. Choose from: {', '.join(LLM_BACKENDS)}")
+                limiter = PriorityLimiter(LLM_MAX_CONCURRENCY, LLM_BULK_MAX_CONCURRENCY)
+                _backend = LimitedBackend(LLM_BACKENDS[name](), limiter)
+
+    return _backend
+
+
+def set_llm_backend(backend: Optional[LLMBackend]) -> None:
+    """Replace the process-wide backend (None resets to env-based selection)."""
+    global _backend
+
+    with _backend_lock:
+        _backend = backend
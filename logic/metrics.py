@@ -0,0 +1,214 @@
+# logic/metrics.py
+
+"""
+Metrics Registry
+Thread-safe in-process counters, histograms and gauges shared by the
+backend modules, rendered in Prometheus text format by /metrics.
+
+Recording a value is a dict lookup and an addition under a lock, cheap
+enough to leave enabled in production.
+"""
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds, from sub-millisecond engine stages to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], List] = {}
+_gauges: Dict[str, Callable[[], object]] = {}
+_help: Dict[str, str] = {}
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def describe(name: str, text: str) -> None:
+    """Set the HELP text shown for a metric."""
+    _help[name] = text
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    """
+    Increment a counter.
+
+    Args:
+        name: Metric name (e.g. "ask_ai_coalesced_total")
+        amount: Value to add
+        **labels: Optional label values identifying the series
+    """
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def get(name: str, **labels) -> float:
+    """Current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(_key(name, labels), 0)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one observation (in seconds for durations) in a histogram."""
+    key = _key(name, labels)
+    index = bisect_left(DEFAULT_BUCKETS, value)
+    with _lock:
+        series = _histograms.get(key)
+        if series is None:
+            # Per-bucket counts (last slot is +Inf), sum, count
+            series = _histograms[key] = [[0] * (len(DEFAULT_BUCKETS) + 1), 0.0, 0]
+        series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the enclosed block in a histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def stage(name: str):
+    """Time a named pipeline stage into the stage_duration_seconds histogram."""
+    return timer("stage_duration_seconds", stage=name)
+
+
+def register_gauge(name: str, callback: Callable[[], object], help_text: str = None) -> None:
+    """
+    Register a gauge computed when metrics are rendered.
+
+    The callback returns either a number or a list of (labels dict, number).
+    """
+    _gauges[name] = callback
+    if help_text:
+        _help[name] = help_text
+
+
+describe("stage_duration_seconds", "Time spent in internal pipeline stages")
+describe("http_request_duration_seconds", "HTTP request latency by route template")
+
+
+def snapshot() -> dict:
+    """
+    Copy of all counters.
+
+    Returns:
+        dict mapping metric name -> list of {"labels": dict, "value": float}
+    """
+    with _lock:
+        items = list(_counters.items())
+
+    result = {}
+    for (name, labels), value in sorted(items):
+        result.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return result
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in _histograms.items())
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in counters:
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for (name, labels), (buckets, total, count) in histograms:
+        header(name, "histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(DEFAULT_BUCKETS + ("+Inf",), buckets):
+            cumulative += bucket_count
+            le = bound if bound == "+Inf" else _format_value(float(bound))
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    for name, callback in sorted(_gauges.items()):
+        try:
+            value = callback()
+        except Exception as e:
+            logger.warning("Gauge %s error: %s", name, e)
+            continue
+        header(name, "gauge")
+        series = value if isinstance(value, list) else [({}, value)]
+        for labels, series_value in series:
+            lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(series_value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route.
+
+    Requests are labelled with the route's path template (e.g.
+    "/ask-ai/jobs/{job_id}") so path parameters do not create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            observe("http_request_duration_seconds", elapsed, route=route_path, method=scope["method"])
+            inc("http_requests_total", route=route_path, method=scope["method"], status=str(status["code"]))
@@ -1,11 +1,83 @@
+import os
+import re
+from functools import lru_cache
+import numpy as np
 import pandas as pd
+from logic import metrics
+from logic.engine_core import ENGINE_CORE, ColumnArrays, descending_order, first_occurrences
+from logic.compact_data import COMPACT_DATA, lower_equals, read_compact_csv
 
-df = pd.read_csv(
-    "data/consumer_data.csv",
-    engine="python",
-    on_bad_lines="skip"
-)
-df.columns = df.columns.str.strip()
+CONSUMER_DATA_PATH = os.getenv("CONSUMER_DATA_PATH", "data/consumer_data.csv")
+
+if COMPACT_DATA:
+    df = read_compact_csv(CONSUMER_DATA_PATH, engine="python", on_bad_lines="skip")
+else:
+    df = pd.read_csv(
+        CONSUMER_DATA_PATH,
+        engine="python",
+        on_bad_lines="skip"
+    )
+    df.columns = df.columns.str.strip()
+
+if ENGINE_CORE == "numpy":
+    arrays = ColumnArrays(df, group_by=("Food_Item",))
+    # Ranking order of nutrition_plan over the whole dataset; a stable sort
+    # of any subset is this order restricted to the subset
+    food_rank_order = descending_order(arrays.values["Protein (g)"], arrays.values["Calories (kcal)"])
+    non_vegetarian_names = np.array([
+        isinstance(name, str) and re.search("meat|fish|chicken", name, re.IGNORECASE) is not None
+        for name in arrays.names["Category"]
+    ])
+else:
+    arrays = None
+
+
+def _profile_class(age, bmi, condition, diet):
+    # The filters only look at which band each input falls in
+    return (
+        diet == "vegetarian",
+        "youth" if age < 18 else "senior" if age > 40 else "adult",
+        "underweight" if bmi < 18.5 else "overweight" if bmi >= 25 else "normal",
+        condition if condition in ("diabetes", "anemia") else "other",
+    )
+
+
+@lru_cache(maxsize=64)
+def _class_mask(profile_class):
+    vegetarian, age_band, bmi_band, condition = profile_class
+    if arrays is not None:
+        values = arrays.values
+        keep = np.ones(arrays.rows, dtype=bool)
+        if vegetarian:
+            keep &= ~non_vegetarian_names[arrays.codes["Category"]]
+    else:
+        values = {column: df[column].to_numpy() for column in df.columns}
+        keep = np.ones(len(df), dtype=bool)
+        if vegetarian:
+            keep &= ~df["Category"].str.contains("meat|fish|chicken", case=False, na=False).to_numpy(dtype=bool)
+    if age_band == "youth":
+        keep &= (values["Sodium (mg)"] <= 200) & (values["Cholesterol (mg)"] <= 100)
+    elif age_band == "senior":
+        keep &= (values["Sodium (mg)"] <= 150) & (values["Sugars (g)"] <= 10)
+    if bmi_band == "underweight":
+        keep &= values["Calories (kcal)"] >= 150
+    elif bmi_band == "overweight":
+        keep &= values["Calories (kcal)"] <= 300
+    if condition == "diabetes":
+        keep &= values["Sugars (g)"] <= 5
+    elif condition == "anemia":
+        keep &= values["Protein (g)"] >= 5
+    keep.flags.writeable = False
+    return keep
+
+
+def profile_mask(age, bmi, condition, diet):
+    """
+    Rows of the dataset that pass nutrition_plan's diet, age, BMI and
+    condition filters, as a read-only boolean array. Cached per
+    combination of bands, since the filters only depend on those.
+    """
+    return _class_mask(_profile_class(age, bmi, condition.lower(), diet.lower()))
 
 
 def nutrition_plan(input_data):
@@ -14,53 +86,68 @@ def nutrition_plan(input_data):
     condition = input_data["condition"].lower()
     diet = input_data["diet"].lower()
 
-    filtered = df.copy()
+    if arrays is not None:
+        with metrics.stage("food_filter"):
+            keep = profile_mask(age, bmi, condition, diet)
 
-    # 1️⃣ Diet preference
-    if diet == "vegetarian":
-        filtered = filtered[~filtered["Category"].str.contains(
-            "meat|fish|chicken", case=False, na=False)]
+        limit = input_data.get("limit", 4)
 
-    # 2️⃣ Age-based filtering (safety)
-    if age < 18:
-        filtered = filtered[
-            (filtered["Sodium (mg)"] <= 200) &
-            (filtered["Cholesterol (mg)"] <= 100)
-        ]
-    elif age > 40:
-        filtered = filtered[
-            (filtered["Sodium (mg)"] <= 150) &
-            (filtered["Sugars (g)"] <= 10)
-        ]
+        with metrics.stage("food_rank"):
+            ranked = food_rank_order[keep[food_rank_order]]
+            top_foods = first_occurrences(ranked, arrays.codes["Food_Item"], limit)
+            names = arrays.names["Food_Item"]
+            recommended_foods = [names[code] for code in arrays.codes["Food_Item"][top_foods].tolist()]
+    else:
+        with metrics.stage("food_filter"):
+            filtered = df.copy()
 
-    # 3️⃣ BMI-based logic (main nutrition driver)
-    if bmi < 18.5:
-        filtered = filtered[filtered["Calories (kcal)"] >= 150]
-    elif bmi >= 25:
-        filtered = filtered[filtered["Calories (kcal)"] <= 300]
+            # 1️⃣ Diet preference
+            if diet == "vegetarian":
+                filtered = filtered[~filtered["Category"].str.contains(
+                    "meat|fish|chicken", case=False, na=False)]
 
-    # 4️⃣ Health condition fine-tuning
-    if condition == "diabetes":
-        filtered = filtered[filtered["Sugars (g)"] <= 5]
-    elif condition == "anemia":
-        filtered = filtered[filtered["Protein (g)"] >= 5]
+            # 2️⃣ Age-based filtering (safety)
+            if age < 18:
+                filtered = filtered[
+                    (filtered["Sodium (mg)"] <= 200) &
+                    (filtered["Cholesterol (mg)"] <= 100)
+                ]
+            elif age > 40:
+                filtered = filtered[
+                    (filtered["Sodium (mg)"] <= 150) &
+                    (filtered["Sugars (g)"] <= 10)
+                ]
 
-    # 5️⃣ Ranking logic
-    filtered = filtered.sort_values(
-        by=["Protein (g)", "Calories (kcal)"],
-        ascending=False
-        )
+            # 3️⃣ BMI-based logic (main nutrition driver)
+            if bmi < 18.5:
+                filtered = filtered[filtered["Calories (kcal)"] >= 150]
+            elif bmi >= 25:
+                filtered = filtered[filtered["Calories (kcal)"] <= 300]
 
-    limit = input_data.get("limit", 4)
+            # 4️⃣ Health condition fine-tuning
+            if condition == "diabetes":
+                filtered = filtered[filtered["Sugars (g)"] <= 5]
+            elif condition == "anemia":
+                filtered = filtered[filtered["Protein (g)"] >= 5]
 
-    top_foods = (
-        filtered
-        .drop_duplicates(subset=["Food_Item"])
-        .head(limit)
-    )
+        # 5️⃣ Ranking logic
+        limit = input_data.get("limit", 4)
+
+        with metrics.stage("food_rank"):
+            filtered = filtered.sort_values(
+                by=["Protein (g)", "Calories (kcal)"],
+                ascending=False
+                )
+
+            top_foods = (
+                filtered
+                .drop_duplicates(subset=["Food_Item"])
+                .head(limit)
+            )
+            recommended_foods = top_foods["Food_Item"].tolist()
 
     return {
-        "recommended_foods": top_foods["Food_Item"].tolist(),
+        "recommended_foods": recommended_foods,
         "shown": limit,
         "note": "Recommendations personalized using age, BMI, and health condition"
     }
@@ -73,16 +160,22 @@ def get_food_details(input_data):
     diet = input_data["diet"].lower()
 
     # Filter dataset for the selected food
-    food_data = df[df["Food_Item"].str.lower() == food_name].copy()
+    with metrics.stage("food_details_filter"):
+        if arrays is not None:
+            matches = arrays.group("Food_Item", food_name)
+            found = len(matches) > 0
+        else:
+            food_data = df[lower_equals(df["Food_Item"], food_name)].copy()
+            found = not food_data.empty
 
-    if food_data.empty:
+    if not found:
         return {
             "error": f"Food item '{food_name}' not found in dataset",
             "food_name": food_name
         }
 
     # Use first matching row
-    food = food_data.iloc[0]
+    food = arrays.row(matches[0]) if arrays is not None else food_data.iloc[0]
 
     explanations = []
     specific_benefits = []
@@ -0,0 +1,274 @@
+# logic/profiling.py
+
+"""
+Per-Request Profiling
+Opt-in profiling of individual HTTP requests in production.
+
+A request is profiled when it carries a valid signed X-Profile-Request
+header (see sign_profile_request) or is picked by PROFILING_SAMPLE_RATE.
+Its endpoint runs under either a sampling profiler, which writes collapsed
+stacks ("frame;frame;frame count", the input format of flamegraph.pl and
+speedscope), or cProfile, which writes a .prof file for snakeviz or
+gprof2dot. The response carries the profile ID in X-Profile-Id and the
+file is written to PROFILING_DIR as <id>.collapsed or <id>.prof.
+
+Sync endpoints run in the threadpool, so the profiler is attached inside
+the endpoint call by ProfiledRoute rather than in the middleware. When
+neither a secret nor a sample rate is configured, main.py installs neither
+the middleware nor the route class, so requests pay nothing.
+"""
+
+import os
+import sys
+import hmac
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+import cProfile
+import threading
+import functools
+import contextvars
+from collections import Counter
+from typing import Optional
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from logic import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_MODE = os.getenv("PROFILING_MODE", "sampling")  # sampling | cprofile
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_DIR = os.getenv("PROFILING_DIR", "data/profiles")
+PROFILING_MAX_CONCURRENT = int(os.getenv("PROFILING_MAX_CONCURRENT", "2"))
+# Signed headers are accepted until their expiry, at most this far ahead
+PROFILING_MAX_TOKEN_TTL = int(os.getenv("PROFILING_MAX_TOKEN_TTL", "3600"))
+
+PROFILING_ENABLED = bool(PROFILING_SECRET) or PROFILING_SAMPLE_RATE > 0
+
+PROFILE_HEADER = b"x-profile-request"
+
+# Profile of the request being handled, copied into threadpool calls
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+def _signature(expires: int, method: str, path: str) -> str:
+    message = f"{expires}:{method.upper()}:{path}".encode()
+    return hmac.new(PROFILING_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_profile_request(method: str, path: str, ttl: int = 300) -> str:
+    """
+    Value of the X-Profile-Request header that asks for one request shape to be profiled.
+
+    Args:
+        method: HTTP method, e.g. "POST"
+        path: request path, e.g. "/recommend-crop"
+        ttl: seconds the header stays valid
+    """
+    if not PROFILING_SECRET:
+        raise ValueError("PROFILING_SECRET is not set")
+    expires = int(time.time()) + ttl
+    return f"{expires}:{_signature(expires, method, path)}"
+
+
+def verify_profile_request(value: str, method: str, path: str) -> bool:
+    """Check a X-Profile-Request header against the method and path it was signed for."""
+    if not PROFILING_SECRET:
+        return False
+    expires, _, signature = value.partition(":")
+    try:
+        expires = int(expires)
+    except ValueError:
+        return False
+    now = time.time()
+    if not now <= expires <= now + PROFILING_MAX_TOKEN_TTL:
+        return False
+    return hmac.compare_digest(signature, _signature(expires, method, path))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class RequestProfile:
+    """Profiler state for one request."""
+
+    def __init__(self, trigger: str, mode: str = PROFILING_MODE):
+        self.id = uuid.uuid4().hex[:16]
+        self.trigger = trigger
+        self.mode = mode
+        self.threads = set()
+        self.stacks = Counter()
+        self.cprofile = cProfile.Profile() if mode == "cprofile" else None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self) -> None:
+        if self.mode == "sampling":
+            self.sampler = threading.Thread(target=self.sample, name=f"profiler-{self.id}", daemon=True)
+            self.sampler.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def sample(self) -> None:
+        """Record the stacks of the threads running this request's endpoint."""
+        interval = PROFILING_INTERVAL_MS / 1000
+        while not self.stopped.wait(interval):
+            with self.lock:
+                threads = list(self.threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def attach(self) -> None:
+        """Start profiling the calling thread."""
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        else:
+            with self.lock:
+                self.threads.add(threading.get_ident())
+
+    def detach(self) -> None:
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        else:
+            with self.lock:
+                self.threads.discard(threading.get_ident())
+
+    def write(self, directory: str = PROFILING_DIR) -> str:
+        """Write the profile and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        if self.cprofile is not None:
+            path = os.path.join(directory, f"{self.id}.prof")
+            self.cprofile.dump_stats(path)
+        else:
+            path = os.path.join(directory, f"{self.id}.collapsed")
+            with open(path, "w") as f:
+                for stack, count in sorted(self.stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        return path
+
+
+def profiled_endpoint(endpoint):
+    """Wrap an endpoint so it runs under the request's profiler, if there is one."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            profile = current_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.attach()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.detach()
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        profile.attach()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            profile.detach()
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint can be profiled in the thread that runs it."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, profiled_endpoint(endpoint), **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that decides which requests to profile and writes the profiles.
+
+    At most PROFILING_MAX_CONCURRENT requests are profiled at once; others
+    run normally even if they asked to be profiled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+
+    def trigger(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER:
+                if verify_profile_request(value.decode("latin-1"), scope["method"], scope["path"]):
+                    return "header"
+                metrics.inc("profiling_rejected_total")
+                return None
+        if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self.trigger(scope)
+        if trigger is None or self.active >= PROFILING_MAX_CONCURRENT:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(trigger)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-id", profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        self.active += 1
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            current_profile.reset(token)
+            self.active -= 1
+            await run_in_threadpool(self.finish, profile)
+
+    @staticmethod
+    def finish(profile: RequestProfile) -> None:
+        profile.stop()
+        try:
+            profile.write()
+            metrics.inc("profiles_recorded_total", trigger=profile.trigger, mode=profile.mode)
+        except OSError as e:
+            logger.warning("Profile write error: %s", e)
+
+
+if __name__ == "__main__":
+    # python -m logic.profiling POST /recommend-crop [ttl]
+    if len(sys.argv) < 3:
+        print("Usage: python -m logic.profiling METHOD PATH [TTL_SECONDS]")
+        sys.exit(1)
+    print(sign_profile_request(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 300))
@@ -0,0 +1,209 @@
+# logic/response_models.py
+
+"""
+Response Models
+Shapes of the engine routes' responses, used as the routes' response_model
+for the OpenAPI schema and, with VALIDATE_RESPONSES=True, to check results
+before they are encoded (see logic/serialization.py).
+"""
+
+from typing import Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+
+class DiversityScore(BaseModel):
+    level: str
+    unique_crops: int
+    total_recommendations: int
+    diversity_percentage: float
+    unique_categories: int
+    message: str
+    recommendation: str
+    benefits: List[str]
+
+
+class CropRecommendation(BaseModel):
+    recommended_crops: List[str]
+    shown: int
+    note: str
+    diversity_score: DiversityScore
+
+
+class ClimateMatch(BaseModel):
+    your_value: float
+    ideal_value: float
+    match_percentage: float
+    status: str
+
+
+class CropClimateMatch(BaseModel):
+    temperature: ClimateMatch
+    humidity: ClimateMatch
+    moisture: ClimateMatch
+
+
+class SoilMatch(BaseModel):
+    your_soil: str
+    ideal_soil: str
+    is_perfect_match: bool
+    compatibility: str
+
+
+class NutrientMatch(BaseModel):
+    your_npk: Dict[str, float]
+    ideal_npk: Dict[str, int]
+    match_percentage: float
+    status: str
+
+
+class CropDetails(BaseModel):
+    crop_name: str
+    overall_score: float
+    suitability: str
+    climate_match: CropClimateMatch
+    soil_match: SoilMatch
+    nutrient_match: NutrientMatch
+    explanations: List[str]
+    recommendations: List[str]
+
+
+class CropNotFound(BaseModel):
+    error: str
+    crop_name: str
+
+
+class NutritionPlan(BaseModel):
+    recommended_foods: List[str]
+    shown: int
+    note: str
+
+
+class MatchBreakdown(BaseModel):
+    diet_compatibility: int
+    condition_suitability: int
+    bmi_alignment: int
+    age_appropriateness: int
+
+
+class DietaryInfo(BaseModel):
+    diet_type: str
+    age_group: str
+    bmi_category: str
+    suitable_for: str
+
+
+class FoodDetails(BaseModel):
+    food_name: str
+    serving_size: str
+    overall_match: int
+    match_breakdown: MatchBreakdown
+    calories: float
+    protein: float
+    carbs: float
+    sugars: float
+    sodium: float
+    cholesterol: float
+    recommendation_reason: str
+    suitability: str
+    dietary_info: DietaryInfo
+    specific_benefits: List[str]
+    explanations: List[str]
+    note: str
+
+
+class FoodNotFound(BaseModel):
+    error: str
+    food_name: str
+
+
+class FoodSubstitute(BaseModel):
+    food: str
+    category: Optional[str]
+    distance: float
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    fiber: float
+    sugars: float
+    sodium: float
+    cholesterol: float
+
+
+class FoodSubstitutes(BaseModel):
+    food_name: str
+    substitutes: List[FoodSubstitute]
+    shown: int
+    note: str
+
+
+class RegionalAdvisory(BaseModel):
+    region: str
+    deficiencies: List[str]
+    severity: str
+    message: str
+    recommended_crops: List[str]
+    statistics: str
+    awareness_note: str
+
+
+class CropWhatIf(BaseModel):
+    parameters: List[str]
+    values: List[List[float]]
+    shape: List[int]
+    crops: List[str]
+    top_crops: List[List[int]]
+    crop_name: Optional[str] = None
+    overall_score: Optional[List[float]] = None
+
+
+class FarmCrop(BaseModel):
+    crop: str
+    category: str
+    foods: List[str]
+    note: Optional[str] = None
+
+
+class RegionalCoverage(BaseModel):
+    region: str
+    deficiencies: List[str]
+    advisory_crops_grown: List[str]
+    suggested_crops: List[str]
+
+
+class FarmToPlate(BaseModel):
+    crops: List[FarmCrop]
+    household_diet: List[str]
+    shown: int
+    diversity_score: DiversityScore
+    note: str
+    region: Optional[RegionalCoverage] = None
+
+
+CropDetailsResponse = Union[CropDetails, CropNotFound]
+CropWhatIfResponse = Union[CropWhatIf, CropNotFound]
+FoodDetailsResponse = Union[FoodDetails, FoodNotFound]
+FoodSubstitutesResponse = Union[FoodSubstitutes, FoodNotFound]
+
+
+class CropRecommendationBatch(BaseModel):
+    results: List[CropRecommendation]
+
+
+class CropDetailsBatch(BaseModel):
+    results: List[CropDetailsResponse]
+
+
+class NutritionPlanBatch(BaseModel):
+    results: List[NutritionPlan]
+
+
+class FoodDetailsBatch(BaseModel):
+    results: List[FoodDetailsResponse]
+
+
+class ObservationsAccepted(BaseModel):
+    accepted: int
+    first_row_id: int
+    total_rows: int
@@ -0,0 +1,84 @@
+# logic/serialization.py
+
+"""
+Fast JSON Responses
+Encodes route results straight to bytes. Returning a dict from a route
+makes FastAPI walk it with jsonable_encoder before json.dumps, and that
+walk costs several times the encoding itself; routes on the hot path
+return FastJSONResponse(result) instead, which skips it.
+
+orjson is used when installed (FAST_JSON=False forces the standard
+library); both produce the same bytes as Starlette's JSONResponse for the
+engines' results. Numpy scalars from the NumPy core are encoded as plain
+numbers.
+
+Response shapes are declared in logic/response_models.py. They document
+the routes; VALIDATE_RESPONSES=True also checks every result against them
+before encoding.
+
+Pre-encoding the constant parts of responses (notes, benefit and
+recommendation lists) and splicing them in was measured and not adopted:
+substituting even one value costs more than orjson takes to encode it.
+See benchmarks/bench_serialization.py.
+"""
+
+import os
+import json
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+
+from logic import metrics
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+FAST_JSON = os.getenv("FAST_JSON", "True") == "True" and orjson is not None
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "False") == "True"
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _plain(value: Any) -> Any:
+    # Numpy scalars and arrays; anything else is a caller bug, as with json.dumps
+    tolist = getattr(value, "tolist", None)
+    if tolist is None:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return tolist()
+
+
+def dumps(content: Any) -> bytes:
+    """Encode content as compact UTF-8 JSON."""
+    if FAST_JSON:
+        return orjson.dumps(content, default=_plain, option=_ORJSON_OPTIONS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_plain
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with dumps(); encoding time is recorded as the serialization stage."""
+
+    def render(self, content: Any) -> bytes:
+        with metrics.stage("serialization"):
+            return dumps(content)
+
+
+_adapters = {}
+
+
+def json_response(content: Any, model: Optional[type] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Response for a route result, checked against its response model when
+    VALIDATE_RESPONSES is set.
+    """
+    if VALIDATE_RESPONSES and model is not None:
+        from pydantic import TypeAdapter
+
+        adapter = _adapters.get(model)
+        if adapter is None:
+            adapter = _adapters[model] = TypeAdapter(model)
+        adapter.validate_python(content)
+    return FastJSONResponse(content, status_code=status_code)
@@ -0,0 +1,79 @@
+# logic/singleflight.py
+
+"""
+Single-Flight Request Coalescing
+Concurrent calls that share a key wait on the first in-flight computation
+and receive a copy of its result instead of repeating the work.
+"""
+
+import copy
+import threading
+from typing import Any, Callable, Hashable
+
+from logic import metrics
+
+
+class _Call:
+    """State of one in-flight computation."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce duplicate concurrent calls by key.
+
+    Metrics (labelled with group=<name>):
+        singleflight_calls_total: computations actually executed
+        singleflight_coalesced_total: callers that shared another caller's result
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is in flight,
+        in which case wait for it and return a deep copy of its result.
+        Exceptions raised by the leader are re-raised in every waiter.
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = _Call()
+                self.calls[key] = call
+                leader = True
+            else:
+                call.waiters += 1
+                leader = False
+
+        if not leader:
+            metrics.inc("singleflight_coalesced_total", group=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        metrics.inc("singleflight_calls_total", group=self.name)
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+        return call.result
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being computed."""
+        with self.lock:
+            return len(self.calls)
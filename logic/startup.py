@@ -0,0 +1,185 @@
+# logic/startup.py
+
+"""
+Lazy Subsystem Initialization
+Keeps importing the app cheap: the crop and nutrition engines (pandas plus
+their datasets), the regional advisory and the LLM client are initialized
+on first use or by a background thread after startup, not at import time.
+
+STARTUP_PRELOAD selects when subsystems are initialized:
+- "background" (default): in a background thread once the server started
+- "eager": before the server accepts requests
+- "lazy": only when a request first needs them
+With warm-up enabled (see logic/warmup.py), warm-up initializes them instead.
+An enabled CPU pool (CPU_POOL_WORKERS > 1, see logic/executors.py) loads
+the crop and nutrition engines before serving regardless of this setting.
+
+Initialization times are exported as subsystem_init_seconds (and logged
+at INFO on the logic.startup logger); the import time of main.py as
+app_import_seconds. To measure import and
+initialization costs from fresh interpreters:
+
+    python -m logic.startup
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+import subprocess
+from typing import Any, Callable, Dict, List, Optional
+
+from logic import metrics
+
+STARTUP_PRELOAD = os.getenv("STARTUP_PRELOAD", "background")  # background | eager | lazy
+
+logger = logging.getLogger(__name__)
+
+
+class Subsystem:
+    """A part of the app that is initialized once, on first use or by preload()."""
+
+    def __init__(self, name: str, init: Callable[[], Any]):
+        self.name = name
+        self._init = init
+        self._lock = threading.Lock()
+        self.value = None
+        self.state = "pending"  # pending | initializing | ready | failed
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def get(self) -> Any:
+        """Return the initialized subsystem, initializing it first if needed."""
+        if self.state != "ready":
+            with self._lock:
+                if self.state != "ready":
+                    self._initialize()
+        return self.value
+
+    def _initialize(self) -> None:
+        self.state = "initializing"
+        start = time.perf_counter()
+        try:
+            value = self._init()
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            metrics.inc("subsystem_init_failures_total", subsystem=self.name)
+            raise
+        self.value = value
+        self.seconds = time.perf_counter() - start
+        self.error = None
+        self.state = "ready"
+        logger.info("Initialized %s in %.2fs", self.name, self.seconds)
+
+
+_subsystems: Dict[str, Subsystem] = {}
+
+
+def subsystem(name: str, init: Callable[[], Any]) -> Subsystem:
+    """Register a subsystem; init runs once and its result is returned by get()."""
+    _subsystems[name] = Subsystem(name, init)
+    return _subsystems[name]
+
+
+def subsystem_states() -> Dict[str, dict]:
+    """State, initialization time and last error of every subsystem."""
+    return {
+        name: {"state": s.state, "seconds": s.seconds, "error": s.error}
+        for name, s in _subsystems.items()
+    }
+
+
+def _initialize_all(names: List[str]) -> None:
+    for name in names:
+        try:
+            _subsystems[name].get()
+        except Exception as e:
+            # Requests retry the initialization and report the error themselves
+            logger.warning("Initialization of %s failed: %s", name, e)
+
+
+def preload(names: Optional[List[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+    """
+    Initialize subsystems (all by default), in registration order.
+
+    Returns:
+        the background thread, or None when initialized in the caller
+    """
+    names = list(_subsystems) if names is None else names
+    if not background:
+        _initialize_all(names)
+        return None
+    thread = threading.Thread(target=_initialize_all, args=(names,), name="subsystem-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+metrics.register_gauge(
+    "subsystem_init_seconds",
+    lambda: [({"subsystem": s.name}, s.seconds) for s in _subsystems.values() if s.seconds is not None],
+    "Time taken to initialize each subsystem"
+)
+metrics.register_gauge(
+    "subsystem_ready",
+    lambda: [({"subsystem": s.name}, 1 if s.ready else 0) for s in _subsystems.values()],
+    "Whether each subsystem is initialized"
+)
+
+
+IMPORT_TARGETS = [
+    "main",
+    "logic.crop_logic",
+    "logic.nutrition_logic",
+    "logic.nutrition_advisory",
+    "logic.ask_ai_logic",
+    "logic.crop_ingest",
+    "logic.profiling",
+]
+
+_IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+_INIT_SNIPPET = """
+import json, main
+from logic.startup import preload, subsystem_states
+preload(background=False)
+print(json.dumps({"import": main.IMPORT_SECONDS, "subsystems": subsystem_states()}))
+"""
+
+
+def _run_python(code: str) -> str:
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=os.environ)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed")
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    import json
+
+    print("Import time (fresh interpreter each)")
+    for module in IMPORT_TARGETS:
+        try:
+            seconds = float(_run_python(_IMPORT_SNIPPET.format(module=module)))
+            print(f"  {module:<28} {seconds * 1000:8.1f} ms")
+        except RuntimeError as e:
+            print(f"  {module:<28} error: {e}")
+
+    print("Subsystem initialization after importing main")
+    try:
+        report = json.loads(_run_python(_INIT_SNIPPET))
+    except RuntimeError as e:
+        print(f"  error: {e}")
+        return
+    for name, state in report["subsystems"].items():
+        seconds = f"{state['seconds'] * 1000:8.1f} ms" if state["seconds"] is not None else " " * 11
+        print(f"  {name:<28} {seconds}  {state['state']}{'  ' + state['error'] if state['error'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# logic/warmup.py
+
+"""
+Warm-up and Readiness
+Runs once after startup, so the first real requests do not pay for cold
+code paths, empty indexes or an unopened LLM connection.
+
+main.py registers the steps: initializing the subsystems, building the
+engine indexes, running REPRESENTATIVE_QUERIES through every engine route
+(covering each filter branch), replaying a recorded query log if
+WARMUP_QUERY_LOG is set, warming the scoring process pool, and opening the
+LLM client connection. /ready returns 200 only after every required step
+has finished, together with the time each step took.
+
+The query log is JSON lines of {"path": "/recommend-crop", "body": {...}}.
+Only the deterministic engine routes are replayed; /ask-ai entries are
+skipped, since replaying them would spend LLM calls.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from logic import metrics
+
+logger = logging.getLogger(__name__)
+
+WARMUP = os.getenv("WARMUP", "True") == "True"
+WARMUP_QUERY_LOG = os.getenv("WARMUP_QUERY_LOG", "")
+WARMUP_QUERY_LOG_MAX = int(os.getenv("WARMUP_QUERY_LOG_MAX", "1000"))
+WARMUP_LLM = os.getenv("WARMUP_LLM", "True") == "True"
+
+_CLIMATE = {"temperature": 28.0, "humidity": 60.0, "moisture": 45.0, "nitrogen": 30.0, "phosphorous": 20.0, "potassium": 10.0}
+
+# Request bodies by route; together they take every branch of the engines'
+# filters, and each must return a found (non-error) result
+REPRESENTATIVE_QUERIES = {
+    "/recommend-crop": [
+        {**_CLIMATE, "soil_type": soil} for soil in ["Sandy", "Loamy", "Black", "Red", "Clayey"]
+    ] + [
+        {**_CLIMATE, "temperature": 60.0, "soil_type": "Loamy", "limit": 5}
+    ],
+    "/crop-details": [
+        {**_CLIMATE, "soil_type": "Loamy", "crop_name": crop} for crop in ["Maize", "Paddy", "Cotton"]
+    ],
+    "/nutrition-plan": [
+        {"age": age, "bmi": bmi, "condition": condition, "diet": diet}
+        for age, bmi, condition, diet in [
+            (12, 17.0, "anemia", "vegetarian"),
+            (30, 22.0, "none", "non-vegetarian"),
+            (55, 28.0, "diabetes", "vegetarian"),
+            (45, 31.0, "hypertension", "non-vegetarian"),
+        ]
+    ],
+    "/food-details": [
+        {"food_name": food, "age": age, "bmi": bmi, "condition": condition, "diet": "vegetarian"}
+        for food, age, bmi, condition in [
+            ("Lentil Soup (1 can)", 12, 17.0, "anemia"),
+            ("Club Sandwich", 30, 22.0, "none"),
+            ("Greek Yogurt (plain 1 cup)", 55, 28.0, "diabetes"),
+            ("Baked Potato (medium)", 45, 31.0, "hypertension"),
+        ]
+    ],
+    "/food-substitutes": [
+        {"food_name": food, "age": 30, "bmi": 22.0, "condition": "none", "diet": diet}
+        for food, diet in [("Lentil Soup (1 can)", "vegetarian"), ("Club Sandwich", "non-vegetarian")]
+    ],
+    "/region-nutrition-advisory": [{"region": region} for region in ["bihar", "punjab", "unknown"]],
+    "/crop-what-if": [
+        {**_CLIMATE, "soil_type": "Loamy", "crop_name": "Maize",
+         "vary": {"nitrogen": {"start": 0, "stop": 60, "step": 10}, "moisture": {"values": [30.0, 45.0, 60.0]}}}
+    ],
+    "/farm-to-plate": [
+        {**_CLIMATE, "soil_type": soil, "age": 30, "bmi": 22.0, "condition": condition, "diet": "vegetarian", "region": region}
+        for soil, condition, region in [("Loamy", "anemia", "bihar"), ("Black", "none", None)]
+    ],
+}
+
+# Unknown names, for the engines' not-found responses
+NOT_FOUND_QUERIES = {
+    "/crop-details": [{**_CLIMATE, "soil_type": "Loamy", "crop_name": "Unknown Crop"}],
+    "/food-details": [{"food_name": "Unknown Food", "age": 30, "bmi": 22.0, "condition": "none", "diet": "vegetarian"}],
+    "/food-substitutes": [{"food_name": "Unknown Food", "age": 30, "bmi": 22.0, "condition": "none", "diet": "vegetarian"}],
+}
+
+
+def read_query_log(path: str, routes, limit: int = WARMUP_QUERY_LOG_MAX) -> List[Tuple[str, dict]]:
+    """(path, body) pairs for the given routes from a JSON-lines query log, at most `limit`."""
+    queries = []
+    skipped = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if len(queries) >= limit:
+                break
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if isinstance(entry, dict) and entry.get("path") in routes and isinstance(entry.get("body"), dict):
+                queries.append((entry["path"], entry["body"]))
+            elif line.strip():
+                skipped += 1
+    if skipped:
+        logger.warning("Warm-up query log: skipped %d entries", skipped)
+    return queries
+
+
+def run_queries(queries: List[Tuple[str, dict]], handlers: Dict[str, Tuple[type, Callable]],
+                skip_errors: bool = False, expect_found: bool = False) -> int:
+    """
+    Validate each body with the route's input model and call its endpoint.
+
+    Args:
+        skip_errors: count failing queries instead of raising (recorded logs)
+        expect_found: raise if a response is an engine error dict, so a
+            representative query that stopped matching the data is noticed
+
+    Returns:
+        number of queries that ran successfully
+    """
+    failed = 0
+    for path, body in queries:
+        model, endpoint = handlers[path]
+        try:
+            response = endpoint(model(**body))
+            if expect_found:
+                content = json.loads(response.body)
+                if isinstance(content, dict) and "error" in content:
+                    raise RuntimeError(f"Warm-up query for {path} returned an error: {content['error']}")
+        except Exception:
+            if not skip_errors:
+                raise
+            failed += 1
+    if failed:
+        logger.warning("Warm-up: %d of %d logged queries failed", failed, len(queries))
+    return len(queries) - failed
+
+
+class WarmUp:
+    """Ordered warm-up steps, run once in a background thread."""
+
+    def __init__(self, enabled: bool = WARMUP):
+        self.enabled = enabled
+        self.steps = OrderedDict()
+        self.state = "pending" if enabled else "disabled"  # pending | running | done | failed | disabled
+        self.seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def step(self, name: str, run: Callable[[], Any], required: bool = True) -> None:
+        """
+        Add a step. A failed required step leaves the worker not ready; a
+        failed optional one is only reported.
+        """
+        self.steps[name] = {"run": run, "required": required, "state": "pending", "seconds": None, "error": None}
+
+    @property
+    def ready(self) -> bool:
+        return self.state in ("done", "disabled")
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def run(self) -> None:
+        started = time.perf_counter()
+        with self._lock:
+            self.state = "running"
+
+        failed = False
+        for name, step in self.steps.items():
+            with self._lock:
+                step["state"] = "running"
+            step_started = time.perf_counter()
+            try:
+                step["run"]()
+                outcome, error = "done", None
+            except Exception as e:
+                outcome, error = "failed", f"{type(e).__name__}: {e}"
+                logger.error("Warm-up step %s failed: %s", name, error)
+            with self._lock:
+                step.update(state=outcome, seconds=time.perf_counter() - step_started, error=error)
+            if error and step["required"]:
+                failed = True
+                break
+
+        with self._lock:
+            self.seconds = time.perf_counter() - started
+            self.state = "failed" if failed else "done"
+        logger.info("Warm-up %s in %.2fs", self.state, self.seconds)
+
+    def status(self) -> dict:
+        """Readiness, overall state and per-step timings."""
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "state": self.state,
+                "seconds": self.seconds,
+                "steps": {
+                    name: {key: step[key] for key in ("state", "seconds", "error", "required")}
+                    for name, step in self.steps.items()
+                },
+            }
+
+
+warmup = WarmUp()
+
+metrics.register_gauge("warmup_ready", lambda: 1 if warmup.ready else 0, "Whether warm-up has finished (the /ready state)")
+metrics.register_gauge(
+    "warmup_step_seconds",
+    lambda: [({"step": name}, step["seconds"]) for name, step in warmup.steps.items() if step["seconds"] is not None],
+    "Time taken by each warm-up step"
+)
@@ -1,22 +1,112 @@
+import time
+_import_started = time.perf_counter()
+
 import os
+import json
+import threading
+import importlib
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI
-from pydantic import BaseModel
-from logic.crop_logic import recommend_crop, get_crop_details
-from logic.nutrition_logic import nutrition_plan, get_food_details
-from logic.nutrition_advisory import get_regional_nutrition_advisory
-from logic.ask_ai_logic import handle_ai_question
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from logic.crop_ingest import INGEST_MAX_ITEMS
+from logic.ask_ai_logic import ask_ai_flight, handle_ai_question, handle_session_question
+from logic.ai_sessions import session_store
+from logic.ai_jobs import job_queue
+from logic.admission import AdmissionControlMiddleware, ENDPOINT_CLASSES, admission_controller, admission_stats
+from logic.executors import CPU_POOL_WORKERS, CPU_POOL_MIN_BATCH, run_batch, start_cpu_pool, stop_cpu_pool
+from logic.llm_backend import get_llm_backend
+from logic.profiling import PROFILING_ENABLED, ProfiledRoute, ProfilingMiddleware
+from logic.startup import STARTUP_PRELOAD, subsystem, subsystem_states, preload
+from logic.warmup import (
+    WARMUP_QUERY_LOG, WARMUP_LLM, REPRESENTATIVE_QUERIES, NOT_FOUND_QUERIES, warmup, read_query_log, run_queries
+)
+from logic.serialization import FastJSONResponse, json_response
+from logic.response_models import (
+    CropRecommendation, CropDetailsResponse, NutritionPlan, FoodDetailsResponse, RegionalAdvisory,
+    CropWhatIfResponse, FoodSubstitutesResponse, FarmToPlate, CropRecommendationBatch, CropDetailsBatch, NutritionPlanBatch, FoodDetailsBatch, ObservationsAccepted
+)
+from logic import metrics
 from fastapi.middleware.cors import CORSMiddleware
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Set once scoring workers are forked; background threads may start after that
+_serving = threading.Event()
+
+
+def _init_crop_engine():
+    from logic import crop_logic
+    # Build the NumPy index now, so forked scoring workers share it
+    crop_logic.crop_arrays()
+    if _serving.is_set():
+        # Fold ingested field observations into the base dataset periodically
+        crop_logic.start_observation_compaction()
+    return crop_logic
+
+
+def _init_what_if():
+    crop_engine.get()
+    return importlib.import_module("logic.crop_what_if")
+
+
+def _init_farm_to_plate():
+    crop_engine.get()
+    return importlib.import_module("logic.farm_to_plate")
+
+
+# Initialized on first use or preloaded after startup (see logic/startup.py)
+crop_engine = subsystem("crop_engine", _init_crop_engine)
+nutrition_engine = subsystem("nutrition_engine", lambda: importlib.import_module("logic.nutrition_logic"))
+advisory = subsystem("advisory", lambda: importlib.import_module("logic.nutrition_advisory"))
+what_if = subsystem("what_if", _init_what_if)
+food_index = subsystem("food_index", lambda: importlib.import_module("logic.food_substitutes"))
+farm_index = subsystem("farm_index", _init_farm_to_plate)
+ai_pipeline = subsystem("ai_pipeline", get_llm_backend)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if CPU_POOL_WORKERS > 1:
+        # Scoring workers share the datasets copy-on-write only if they are loaded before
+        # forking, so an enabled pool overrides STARTUP_PRELOAD for the two engines
+        preload(["crop_engine", "nutrition_engine"], background=False)
+    # Fork scoring workers before any background thread exists
+    start_cpu_pool()
+    _serving.set()
+    if crop_engine.ready:
+        crop_engine.get().start_observation_compaction()
+    # Background workers for bulk /ask-ai jobs
+    job_queue.start()
+    if warmup.enabled:
+        # Initializes every subsystem; /ready flips when it is done
+        warmup.start()
+    elif STARTUP_PRELOAD != "lazy":
+        preload(background=STARTUP_PRELOAD == "background")
+    yield
+    if crop_engine.ready:
+        crop_engine.get().stop_observation_compaction()
+    job_queue.stop()
+    stop_cpu_pool()
+
+
 app = FastAPI(
     title="NutriGrow AI Backend",
     description="Smart Crop-to-Nutrition Recommendation System",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Opt-in request profiling (see logic/profiling.py); nothing is installed when disabled
+if PROFILING_ENABLED:
+    app.router.route_class = ProfiledRoute
+
 # Get environment variables with fallback defaults
 DEBUG = os.getenv("DEBUG", "False") == "True"
 PORT = int(os.getenv("PORT", "8001"))
@@ -28,6 +118,41 @@ ALLOWED_ORIGINS = os.getenv(
     "http://localhost:3000,http://127.0.0.1:3000"
 ).split(",")
 
+# Inside admission control, so profiles cover only admitted requests
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Separate admission pools per endpoint class (see logic/admission.py)
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "True") == "True"
+ADMISSION_ROUTES = {
+    "/": "deterministic",
+    "/recommend-crop": "deterministic",
+    "/crop-details": "deterministic",
+    "/nutrition-plan": "deterministic",
+    "/food-details": "deterministic",
+    "/food-substitutes": "deterministic",
+    "/region-nutrition-advisory": "deterministic",
+    "/farm-to-plate": "deterministic",
+    "/crop-what-if": "batch",
+    "/recommend-crop/batch": "batch",
+    "/crop-details/batch": "batch",
+    "/nutrition-plan/batch": "batch",
+    "/food-details/batch": "batch",
+    "/crop-observations": "batch",
+    "/ask-ai": "llm",
+    # Submitting a job is bulk work; polling its status and results is a cheap read
+    "/ask-ai/jobs": "bulk",
+    "/ask-ai/jobs/": "deterministic",
+}
+
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionControlMiddleware, classes=ENDPOINT_CLASSES, routes=ADMISSION_ROUTES)
+
+# Outside admission control, so latency includes admission queueing
+app.add_middleware(metrics.RequestMetricsMiddleware)
+
+# Outermost: preflights are answered before admission control, and shed
+# (503) responses still carry the CORS headers browsers need to read them
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
@@ -79,44 +204,289 @@ class FoodDetailsInput(BaseModel):
     diet: str
 
 
+class FoodSubstitutesInput(BaseModel):
+    food_name: str
+    age: int
+    bmi: float
+    condition: str
+    diet: str
+    limit: int = Field(5, ge=1, le=50)
+
+
 class RegionInput(BaseModel):
     region: str
 
 
+class FarmToPlateInput(BaseModel):
+    temperature: float
+    humidity: float
+    moisture: float
+    soil_type: str
+    nitrogen: float
+    phosphorous: float
+    potassium: float
+    limit: int = 3
+    age: int
+    bmi: float
+    condition: str
+    diet: str
+    food_limit: int = Field(4, ge=1, le=50)
+    region: Optional[str] = None
+
+
+class WhatIfRange(BaseModel):
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: float = 1.0
+    values: Optional[List[float]] = None
+
+
+class CropWhatIfInput(BaseModel):
+    temperature: float
+    humidity: float
+    moisture: float
+    soil_type: str
+    nitrogen: float
+    phosphorous: float
+    potassium: float
+    limit: int = 3
+    crop_name: Optional[str] = None
+    vary: Dict[str, WhatIfRange]
+
+
+# Batch endpoints accept up to this many items per request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+
+class FarmerBatchInput(BaseModel):
+    items: List[FarmerInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
+
+class CropDetailsBatchInput(BaseModel):
+    items: List[CropDetailsInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
+
+class ConsumerBatchInput(BaseModel):
+    items: List[ConsumerInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
+
+class FoodDetailsBatchInput(BaseModel):
+    items: List[FoodDetailsInput] = Field(..., max_length=BATCH_MAX_ITEMS)
+
+
+class CropObservationInput(BaseModel):
+    temperature: float
+    humidity: float
+    moisture: float
+    soil_type: str
+    crop_type: str
+    nitrogen: float
+    potassium: float
+    phosphorous: float
+    fertilizer_name: str
+
+
+class CropObservationBatchInput(BaseModel):
+    items: List[CropObservationInput] = Field(..., max_length=INGEST_MAX_ITEMS)
+
+
 class AskAIInput(BaseModel):
     question: str
     context: dict
 
 
+class AskAIJobInput(BaseModel):
+    questions: List[AskAIInput]
+    metadata: dict = {}
+
+
+def hit_ratio(hits: float, misses: float) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def threadpool_stats():
+    # Must run on the event loop: the default limiter is per loop
+    stats = anyio.to_thread.current_default_thread_limiter().statistics()
+    return [
+        ({"state": "busy"}, stats.borrowed_tokens),
+        ({"state": "total"}, stats.total_tokens),
+        ({"state": "waiting"}, stats.tasks_waiting),
+    ]
+
+
+metrics.register_gauge("threadpool_threads", threadpool_stats, "Worker threadpool usage and queue depth")
+metrics.register_gauge(
+    "admission_queue_depth",
+    lambda: [({"endpoint_class": name}, s["queued"]) for name, s in admission_stats().items()],
+    "Requests waiting for an admission slot"
+)
+metrics.register_gauge(
+    "admission_active_requests",
+    lambda: [({"endpoint_class": name}, s["active"]) for name, s in admission_stats().items()],
+    "Requests holding an admission slot"
+)
+metrics.register_gauge(
+    "ask_ai_session_output_cache_hit_ratio",
+    lambda: hit_ratio(
+        metrics.get("ask_ai_session_output_cache_total", result="hit"),
+        metrics.get("ask_ai_session_output_cache_total", result="miss")
+    ),
+    "Share of session turns answered from cached structured output"
+)
+metrics.register_gauge(
+    "ask_ai_coalesced_ratio",
+    lambda: hit_ratio(
+        metrics.get("singleflight_coalesced_total", group="ask_ai"),
+        metrics.get("singleflight_calls_total", group="ask_ai")
+    ),
+    "Share of /ask-ai requests served by another in-flight request"
+)
+
+
+def dataset_sizes():
+    frames = []
+    if crop_engine.ready:
+        frames.append(("farmer", crop_engine.get().df))
+    if nutrition_engine.ready:
+        frames.append(("consumer", nutrition_engine.get().df))
+    if not frames:
+        return []
+    from logic.compact_data import memory_report
+    return [({"dataset": name}, memory_report(frame)["bytes_per_row"]) for name, frame in frames if frame is not None]
+
+
+metrics.register_gauge("dataset_bytes_per_row", dataset_sizes, "In-memory size of the crop and nutrition datasets per row")
+metrics.register_gauge("ask_ai_sessions", lambda: session_store.stats()["sessions"], "Live /ask-ai sessions")
+metrics.register_gauge("ask_ai_in_flight", ask_ai_flight.in_flight, "Distinct /ask-ai computations in flight")
+
+
 @app.get("/")
 def root():
     return {"message": "NutriGrow AI backend is running"}
 
 
-@app.post("/recommend-crop")
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once warm-up has finished, 503 until then or if it failed"""
+    status = warmup.status()
+    status["subsystems"] = subsystem_states()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics: route latency, pipeline stages, caches and queues"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# Engine routes return json_response(...) rather than a dict, which skips
+# FastAPI's jsonable_encoder pass (see logic/serialization.py)
+@app.post("/recommend-crop", response_model=CropRecommendation)
 def crop_recommendation(data: FarmerInput):
-    return recommend_crop(data.dict())
+    return json_response(crop_engine.get().recommend_crop(data.model_dump()), CropRecommendation)
 
 
-@app.post("/crop-details")
+@app.post("/crop-details", response_model=CropDetailsResponse)
 def crop_details(data: CropDetailsInput):
-    return get_crop_details(data.dict())
+    return json_response(crop_engine.get().get_crop_details(data.model_dump()), CropDetailsResponse)
 
 
-@app.post("/nutrition-plan")
+@app.post("/nutrition-plan", response_model=NutritionPlan)
 def nutrition_recommendation(data: ConsumerInput):
-    return nutrition_plan(data.dict())
+    return json_response(nutrition_engine.get().nutrition_plan(data.model_dump()), NutritionPlan)
 
 
-@app.post("/food-details")
+@app.post("/food-details", response_model=FoodDetailsResponse)
 def food_details(data: FoodDetailsInput):
-    return get_food_details(data.dict())
+    return json_response(nutrition_engine.get().get_food_details(data.model_dump()), FoodDetailsResponse)
+
 
+@app.post("/food-substitutes", response_model=FoodSubstitutesResponse)
+def food_substitutes(data: FoodSubstitutesInput):
+    """Foods with the closest nutrient profile that also fit the user's diet, age, BMI and condition"""
+    return json_response(food_index.get().food_substitutes(data.model_dump()), FoodSubstitutesResponse)
 
-@app.post("/region-nutrition-advisory")
+
+@app.post("/recommend-crop/batch", response_model=CropRecommendationBatch)
+def crop_recommendation_batch(data: FarmerBatchInput):
+    """Crop recommendations for many inputs; large batches are scored in worker processes"""
+    results = run_batch(crop_engine.get().recommend_crop, [item.model_dump() for item in data.items])
+    return json_response({"results": results}, CropRecommendationBatch)
+
+
+@app.post("/crop-details/batch", response_model=CropDetailsBatch)
+def crop_details_batch(data: CropDetailsBatchInput):
+    """Crop details for many inputs; large batches are scored in worker processes"""
+    results = run_batch(crop_engine.get().get_crop_details, [item.model_dump() for item in data.items])
+    return json_response({"results": results}, CropDetailsBatch)
+
+
+@app.post("/nutrition-plan/batch", response_model=NutritionPlanBatch)
+def nutrition_recommendation_batch(data: ConsumerBatchInput):
+    """Nutrition plans for many profiles; large batches are scored in worker processes"""
+    results = run_batch(nutrition_engine.get().nutrition_plan, [item.model_dump() for item in data.items])
+    return json_response({"results": results}, NutritionPlanBatch)
+
+
+@app.post("/food-details/batch", response_model=FoodDetailsBatch)
+def food_details_batch(data: FoodDetailsBatchInput):
+    """Food details for many inputs; large batches are scored in worker processes"""
+    results = run_batch(nutrition_engine.get().get_food_details, [item.model_dump() for item in data.items])
+    return json_response({"results": results}, FoodDetailsBatch)
+
+
+@app.post("/region-nutrition-advisory", response_model=RegionalAdvisory)
 def region_nutrition_advisory(data: RegionInput):
     """Get nutrition advisory for a specific region"""
-    return get_regional_nutrition_advisory(data.region)
+    return json_response(advisory.get().get_regional_nutrition_advisory(data.region), RegionalAdvisory)
+
+
+@app.post("/farm-to-plate", response_model=FarmToPlate)
+def farm_to_plate(data: FarmToPlateInput):
+    """
+    Crops to grow and the household diet they enable: the recommended
+    crops with their category and their foods that fit the household;
+    with a region, its deficiencies and which of its advisory's crops the
+    recommendation includes or should add.
+    """
+    try:
+        result = farm_index.get().farm_to_plate(data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(result, FarmToPlate)
+
+
+@app.post("/crop-what-if", response_model=CropWhatIfResponse)
+def crop_what_if(data: CropWhatIfInput):
+    """
+    Top crops, and optionally a crop's overall score, over a grid of inputs.
+
+    `vary` maps parameters (temperature, humidity, moisture, nitrogen,
+    phosphorous, potassium) to a range {"start", "stop", "step"} or to
+    {"values": [...]}; the others keep their base value. Results are flat
+    lists in row-major order of the grid (last parameter fastest), with
+    top crops as indexes into `crops`.
+    """
+    try:
+        result = what_if.get().crop_what_if(data.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(result, CropWhatIfResponse)
+
+
+@app.post("/crop-observations", status_code=201, response_model=ObservationsAccepted)
+def add_crop_observations(data: CropObservationBatchInput):
+    """
+    Add labelled field observations to the crop dataset.
+
+    Observations are written to the ingestion log and used by crop
+    recommendations right away; compaction later folds them into the base dataset.
+    """
+    try:
+        result = crop_engine.get().ingest_observations([item.model_dump() for item in data.items])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(result, ObservationsAccepted, status_code=201)
 
 
 @app.post("/ask-ai")
@@ -131,4 +501,146 @@ def ask_ai(data: AskAIInput):
     
     Returns friendly, conversational responses.
     """
-    return handle_ai_question(data.question, data.context)
\ No newline at end of file
+    return handle_ai_question(data.question, data.context)
+
+
+@app.post("/ask-ai/jobs", status_code=202)
+def submit_ask_ai_job(data: AskAIJobInput):
+    """
+    Submit many AI questions for background processing.
+
+    Returns the job summary; poll /ask-ai/jobs/{job_id} for progress and
+    fetch answers from /ask-ai/jobs/{job_id}/results.
+    """
+    try:
+        return job_queue.submit([q.model_dump() for q in data.questions], data.metadata)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/ask-ai/jobs/{job_id}")
+def ask_ai_job_status(job_id: str):
+    """Get status and progress of a bulk AI job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.get("/ask-ai/jobs/{job_id}/results")
+def ask_ai_job_results(job_id: str, offset: int = 0, limit: int = 100):
+    """Get answers of a bulk AI job, in submission order (paginated)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return {
+        "job": job,
+        "offset": offset,
+        "results": job_queue.results(job_id, offset, min(max(limit, 1), 1000))
+    }
+
+
+# Route -> (input model, endpoint) run by warm-up (see logic/warmup.py)
+WARMUP_ROUTES = {
+    "/recommend-crop": (FarmerInput, crop_recommendation),
+    "/crop-details": (CropDetailsInput, crop_details),
+    "/nutrition-plan": (ConsumerInput, nutrition_recommendation),
+    "/food-details": (FoodDetailsInput, food_details),
+    "/region-nutrition-advisory": (RegionInput, region_nutrition_advisory),
+    "/crop-what-if": (CropWhatIfInput, crop_what_if),
+    "/food-substitutes": (FoodSubstitutesInput, food_substitutes),
+    "/farm-to-plate": (FarmToPlateInput, farm_to_plate),
+}
+
+
+def warm_queries():
+    run_queries([(path, body) for path, bodies in REPRESENTATIVE_QUERIES.items() for body in bodies], WARMUP_ROUTES,
+                expect_found=True)
+    run_queries([(path, body) for path, bodies in NOT_FOUND_QUERIES.items() for body in bodies], WARMUP_ROUTES)
+
+
+def warm_cpu_pool():
+    # Enough items to reach the pool and give every worker a chunk
+    count = max(CPU_POOL_MIN_BATCH, CPU_POOL_WORKERS * 4)
+    for endpoint, batch_model, path in [
+        (crop_recommendation_batch, FarmerBatchInput, "/recommend-crop"),
+        (crop_details_batch, CropDetailsBatchInput, "/crop-details"),
+        (nutrition_recommendation_batch, ConsumerBatchInput, "/nutrition-plan"),
+        (food_details_batch, FoodDetailsBatchInput, "/food-details"),
+    ]:
+        bodies = REPRESENTATIVE_QUERIES[path]
+        endpoint(batch_model(items=[bodies[i % len(bodies)] for i in range(count)]))
+
+
+warmup.step("engines", lambda: [s.get() for s in (crop_engine, nutrition_engine, advisory, what_if, food_index, farm_index)])
+warmup.step("queries", warm_queries)
+if WARMUP_QUERY_LOG:
+    warmup.step("query_log", lambda: run_queries(read_query_log(WARMUP_QUERY_LOG, WARMUP_ROUTES), WARMUP_ROUTES, skip_errors=True),
+                 required=False)
+if CPU_POOL_WORKERS > 1:
+    warmup.step("cpu_pool", warm_cpu_pool)
+if WARMUP_LLM:
+    warmup.step("llm", lambda: ai_pipeline.get().warm_up(), required=False)
+
+
+async def answer_session_turn(session, question: str, context: dict) -> Optional[dict]:
+    """One session turn under the "llm" admission class, like /ask-ai; None if shed."""
+    if not ADMISSION_CONTROL:
+        return await run_in_threadpool(handle_session_question, session, question, context)
+    async with admission_controller.admit(ENDPOINT_CLASSES[ADMISSION_ROUTES["/ask-ai"]]) as wait:
+        if wait is None:
+            return None
+        return await run_in_threadpool(handle_session_question, session, question, context)
+
+
+@app.websocket("/ws/ask-ai")
+async def ask_ai_session(websocket: WebSocket):
+    """
+    Conversational AI question handler with server-side session state.
+
+    Connect with an optional `session_id` query parameter to resume a session.
+    The server first sends {"type": "session", "session_id": ...}; each client
+    message {"question": "...", "context": {...}} is answered with the same
+    payload as /ask-ai plus `session_id`, `follow_up` and `cached`. Context
+    only needs to be sent when it changes.
+    """
+    await websocket.accept()
+
+    session_id = websocket.query_params.get("session_id")
+    session = session_store.get(session_id) if session_id else None
+    if session is None:
+        session = session_store.create()
+
+    await websocket.send_json({"type": "session", "session_id": session.id})
+
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            try:
+                message = json.loads(frame["text"] if frame.get("text") is not None else frame.get("bytes") or b"")
+            except (ValueError, UnicodeDecodeError):
+                await websocket.send_json({"type": "error", "error": "Message must be a JSON object"})
+                continue
+            question = message.get("question") if isinstance(message, dict) else None
+            if not isinstance(question, str) or not question.strip():
+                await websocket.send_json({"type": "error", "error": "Message must include a non-empty 'question'"})
+                continue
+
+            context = message.get("context") or {}
+            if not isinstance(context, dict):
+                await websocket.send_json({"type": "error", "error": "'context' must be an object"})
+                continue
+
+            result = await answer_session_turn(session, question, context)
+            if result is None:
+                await websocket.send_json({"type": "error", "error": "Server busy (llm requests), please retry later"})
+                continue
+            await websocket.send_json({"type": "answer", **result})
+    except WebSocketDisconnect:
+        pass
+
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+metrics.register_gauge("app_import_seconds", lambda: IMPORT_SECONDS, "Time taken to import the application module")